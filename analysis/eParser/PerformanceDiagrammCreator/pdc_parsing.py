@@ -1,4 +1,9 @@
-import xml.etree.ElementTree as ET
+import numpy as np
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET   # lxml is optional, the results are identical
 
 def parse_performance_report(file_path) -> dict:
     # Parse the XML file
@@ -45,4 +50,65 @@ def parse_timestamp_messages(path: str) -> list:
             'difference': difference,
         })
 
-    return records
\ No newline at end of file
+    return records
+
+
+def parse_latency_histogram(file_path) -> dict:
+    '''
+    Parses a latency histogram file (latency_histogram.npz) written by eParser and returns it as a
+    dictionary with the following keys: 'counts', 'lower', 'upper' (int64 arrays, latencies in
+    nanoseconds).
+
+            Parameters:
+                    file_path (str): Path to the latency histogram file
+
+            Returns:
+                    histogram (dict): Dictionary containing the histogram
+    '''
+    with np.load(file_path) as data:
+        return {
+            'counts': data['counts'].astype(np.int64),
+            'lower': data['lower'],
+            'upper': data['upper'],
+        }
+
+
+def merge_latency_histograms(histograms: list) -> dict:
+    '''
+    Merges latency histograms of several scenarios (or campaigns) into one histogram.
+
+            Parameters:
+                    histograms (list): List of histograms (see parse_latency_histogram)
+
+            Returns:
+                    histogram (dict): Dictionary containing the merged histogram
+    '''
+    merged = {'counts': histograms[0]['counts'].copy(), 'lower': histograms[0]['lower'], 'upper': histograms[0]['upper']}
+    for histogram in histograms[1:]:
+        if not np.array_equal(histogram['lower'], merged['lower']):
+            raise ValueError('Latency histograms with different bucket layouts cannot be merged.')
+        merged['counts'] += histogram['counts']
+
+    return merged
+
+
+def latency_percentile(histogram: dict, percentile: float) -> float:
+    '''
+    Returns the latency at the given percentile (in seconds) of a latency histogram.
+
+            Parameters:
+                    histogram (dict): Histogram (see parse_latency_histogram)
+                    percentile (float): Percentile between 0 and 100
+
+            Returns:
+                    value (float): Latency at the percentile in seconds (-1 if the histogram is empty)
+    '''
+    cumulative_counts = np.cumsum(histogram['counts'])
+    total = int(cumulative_counts[-1]) if cumulative_counts.size > 0 else 0
+    if total == 0:
+        return -1
+
+    rank = max(int(np.ceil(percentile / 100 * total)), 1)
+    index = int(np.searchsorted(cumulative_counts, rank, side='left'))
+
+    return int(histogram['upper'][index]) / 1000000000
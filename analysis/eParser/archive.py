@@ -0,0 +1,397 @@
+import os
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import zipfile
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None        # optional, the 7z command line tool is used instead
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None    # optional, only needed for .tar.zst archives
+
+# Archives in the results folder are read like folders. A path inside an archive is given as the
+# path of the archive followed by the path of the member, e.g. raw/campaign.7z/campaign/client/...
+archive_extensions = ('.7z', '.zip', '.tar.zst', '.tzst')
+
+# Member lists of the opened archives by path (with size and modification time of the archive)
+archive_indexes = dict()
+
+# Archives that cannot be read member by member (tar.zst, 7z without the 7z command line tool) are
+# extracted once into this folder, the worker processes use the same extraction
+extraction_folder = os.path.join(tempfile.gettempdir(), 'eParser_archives')
+
+
+def is_archive(path: str) -> bool:
+    '''
+    Checks if the given path is a supported archive file (7z, zip or tar.zst).
+
+            Parameters:
+                    path (str): Path to the file
+
+            Returns:
+                    result (bool): True if the path is an archive, False otherwise
+    '''
+    return path.lower().endswith(archive_extensions) and os.path.isfile(path)
+
+
+def archive_name(name: str) -> str:
+    '''
+    Returns the name of an archive without its extension (e.g. the name of the campaign).
+
+            Parameters:
+                    name (str): File name of the archive
+
+            Returns:
+                    name (str): Name without the archive extension
+    '''
+    for extension in archive_extensions:
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def campaign_root(path: str) -> str:
+    '''
+    Returns the folder of a campaign that contains the client and server folders. For an archive
+    this is the root of the archive or, if the archive contains a single folder (e.g. the packed
+    campaign folder), this folder.
+
+            Parameters:
+                    path (str): Path to the campaign folder or archive
+
+            Returns:
+                    path (str): Path to the folder containing the client and server folders
+    '''
+    if not is_archive(path) or is_folder(os.path.join(path, 'client')):
+        return path
+
+    entries = list_folder(path)
+    if len(entries) == 1 and is_folder(os.path.join(path, entries[0])):
+        return os.path.join(path, entries[0])
+    return path
+
+
+def split_path(path: str) -> tuple:
+    '''
+    Splits a path into the path of the archive and the path of the member in the archive.
+
+            Parameters:
+                    path (str): Path to a file or folder (possibly inside an archive)
+
+            Returns:
+                    archive (str): Path to the archive (None if the path is not inside an archive)
+                    member (str): Path of the member ('' for the root of the archive, the given path
+                                  if it is not inside an archive)
+    '''
+    if os.path.exists(path) and not is_archive(path):
+        return None, path
+
+    parent = path
+    while parent and not os.path.exists(parent):
+        parent = os.path.dirname(parent)
+
+    if not is_archive(parent):
+        return None, path
+
+    member = os.path.relpath(path, parent).replace(os.sep, '/')
+    return parent, '' if member == '.' else member
+
+
+def path_exists(path: str) -> bool:
+    '''
+    Checks if a file or folder exists (os.path.exists, also inside archives).
+    '''
+    archive, member = split_path(path)
+    if archive is None:
+        return os.path.exists(path)
+
+    index = __archive_index(archive)
+    return member == '' or member in index['files'] or member in index['folders']
+
+
+def is_folder(path: str) -> bool:
+    '''
+    Checks if a path is a folder (os.path.isdir, also inside archives).
+    '''
+    archive, member = split_path(path)
+    if archive is None:
+        return os.path.isdir(path)
+
+    return member == '' or member in __archive_index(archive)['folders']
+
+
+def list_folder(path: str) -> list:
+    '''
+    Returns the names of the entries of a folder (os.listdir, also inside archives).
+
+            Parameters:
+                    path (str): Path to the folder
+
+            Returns:
+                    entries (list): List of names of the files and folders
+    '''
+    archive, member = split_path(path)
+    if archive is None:
+        return os.listdir(path)
+
+    index = __archive_index(archive)
+    if member != '' and member not in index['folders']:
+        raise NotADirectoryError(f'No folder {member} in archive {archive}.')
+
+    return sorted(index['folders'][member])
+
+
+def file_stat(path: str) -> dict:
+    '''
+    Returns the size and the modification time of a file. For a member of an archive, the size of
+    the uncompressed member and the modification time of the archive are returned.
+
+            Parameters:
+                    path (str): Path to the file
+
+            Returns:
+                    stat (dict): Dictionary containing the 'size' and the 'mtime' (nanoseconds)
+    '''
+    archive, member = split_path(path)
+    if archive is None:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    index = __archive_index(archive)
+    if member not in index['files']:
+        raise FileNotFoundError(f'No file {member} in archive {archive}.')
+
+    return {'size': index['files'][member], 'mtime': index['mtime']}
+
+
+@contextmanager
+def open_file(path: str):
+    '''
+    Opens a file for reading in binary mode. Members of zip archives (zipfile) and of 7z archives
+    read with the 7z command line tool (7z x -so) are decompressed while they are read and never
+    written to disk. A tar.zst archive (zstandard and tarfile) can only be read from the start and
+    py7zr cannot stream a member, so these archives are extracted once into a temporary folder
+    when they are opened first (see remove_extracted_archives), which costs the disk space of the
+    extracted archive.
+
+            Parameters:
+                    path (str): Path to the file
+
+            Yields:
+                    file (file object): Binary file object
+    '''
+    archive, member = split_path(path)
+    if archive is None:
+        with open(path, 'rb') as file:
+            yield file
+        return
+
+    index = __archive_index(archive)
+    if member not in index['files']:
+        raise FileNotFoundError(f'No file {member} in archive {archive}.')
+
+    if index['folder'] is not None:
+        with open(os.path.join(index['folder'], member), 'rb') as file:
+            yield file
+    elif archive.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive) as zip_file, zip_file.open(member) as file:
+            yield file
+    else:
+        with __open_7z_member(archive, member) as file:
+            yield file
+
+
+def remove_extracted_archives() -> None:
+    '''
+    Removes the temporary folders of the archives extracted by open_file. Must only be called when
+    no worker process reads from the archives anymore.
+
+            Parameters:
+                    None
+
+            Returns:
+                    None
+    '''
+    for archive, index in list(archive_indexes.items()):
+        if index['folder'] is not None:
+            shutil.rmtree(index['folder'], ignore_errors=True)
+            del archive_indexes[archive]
+
+
+def __archive_index(archive: str) -> dict:
+    # The member list is read once per archive (and again if the archive changes)
+    stat = os.stat(archive)
+    index = archive_indexes.get(archive)
+    if index is not None and index['size'] == stat.st_size and index['mtime'] == stat.st_mtime_ns:
+        return index
+
+    # Archives without access to single members are extracted, their members are listed from the
+    # extracted folder
+    folder = None
+    if __extract_required(archive):
+        folder = __extract_archive(archive, stat)
+        members = __list_extracted_members(folder)
+    else:
+        members = __list_members(archive)
+
+    files = dict()
+    folders = set()
+    for name, size, directory in members:
+        name = __member_name(name)
+        if not name:
+            continue
+        if directory:
+            folders.add(name)
+        else:
+            files[name] = size
+
+    # Folders are not always stored in the archive, they are derived from the members
+    children = {'': set()}
+    for name in list(files.keys()) + list(folders):
+        parts = name.split('/')
+        for depth in range(len(parts)):
+            children.setdefault('/'.join(parts[:depth]), set()).add(parts[depth])
+        if name in folders:
+            children.setdefault(name, set())
+
+    index = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'files': files, 'folders': children, 'folder': folder}
+    archive_indexes[archive] = index
+    return index
+
+
+def __list_members(archive: str) -> list:
+    # Returns the members of the archive as (name, size, is directory) tuples
+    extension = archive.lower()
+    if extension.endswith('.zip'):
+        with zipfile.ZipFile(archive) as zip_file:
+            return [(info.filename, info.file_size, info.is_dir()) for info in zip_file.infolist()]
+
+    return __list_7z_members(archive)
+
+
+def __extract_required(archive: str) -> bool:
+    # tar.zst archives and 7z archives without the 7z command line tool (py7zr)
+    extension = archive.lower()
+    if extension.endswith('.zip'):
+        return False
+    if extension.endswith('.7z'):
+        return __seven_zip(required=py7zr is None) is None
+    return True
+
+
+def __extract_archive(archive: str, stat: os.stat_result) -> str:
+    # The folder is named after the archive, its size and its modification time. An existing
+    # extraction (e.g. of the main process for the workers) is reused, the archive is extracted
+    # into a temporary folder first and then renamed, so a folder is always complete.
+    prefix = hashlib.sha1(os.path.abspath(archive).encode('utf-8')).hexdigest()[:16]
+    folder = os.path.join(extraction_folder, f'{prefix}_{stat.st_size}_{stat.st_mtime_ns}')
+    if os.path.isdir(folder):
+        return folder
+
+    os.makedirs(extraction_folder, exist_ok=True)
+    temporary_folder = tempfile.mkdtemp(prefix=f'{prefix}.', dir=extraction_folder)
+    try:
+        if archive.lower().endswith('.7z'):
+            with py7zr.SevenZipFile(archive, 'r') as seven_zip:
+                seven_zip.extractall(path=temporary_folder)
+        else:
+            # Single pass over the stream, the members are written in the order of the archive
+            with __open_tar_zst(archive) as tar_file:
+                tar_file.extraction_filter = getattr(tarfile, 'data_filter', None)
+                for info in tar_file:
+                    tar_file.extract(info, temporary_folder)
+        os.rename(temporary_folder, folder)
+    except OSError:
+        # Extracted at the same time by another process
+        if not os.path.isdir(folder):
+            raise
+    finally:
+        shutil.rmtree(temporary_folder, ignore_errors=True)
+
+    # Extractions of previous versions of the archive are no longer needed
+    for name in os.listdir(extraction_folder):
+        if name.startswith(f'{prefix}_') and name != os.path.basename(folder):
+            shutil.rmtree(os.path.join(extraction_folder, name), ignore_errors=True)
+
+    return folder
+
+
+def __list_extracted_members(folder: str) -> list:
+    # Returns the files and folders of an extracted archive as (name, size, is directory) tuples
+    members = list()
+    for root, directories, files in os.walk(folder):
+        relative = os.path.relpath(root, folder).replace(os.sep, '/')
+        for name in directories:
+            members.append((name if relative == '.' else f'{relative}/{name}', 0, True))
+        for name in files:
+            members.append((name if relative == '.' else f'{relative}/{name}', os.path.getsize(os.path.join(root, name)), False))
+    return members
+
+
+def __list_7z_members(archive: str) -> list:
+    # Technical listing of the 7z command line tool (blocks of 'Key = Value' lines after the header)
+    result = subprocess.run([__seven_zip(), 'l', '-slt', archive], capture_output=True, text=True, check=True)
+    members = list()
+    member = None
+    for line in result.stdout.split('----------', 1)[-1].splitlines():
+        key, _, value = line.partition(' = ')
+        if key == 'Path':
+            member = {'name': value, 'size': 0, 'directory': False}
+            members.append(member)
+        elif member is not None and key == 'Size' and value:
+            member['size'] = int(value)
+        elif member is not None and key == 'Folder':
+            member['directory'] = value == '+'
+        elif member is not None and key == 'Attributes' and value.startswith('D'):
+            member['directory'] = True
+
+    return [(member['name'], member['size'], member['directory']) for member in members]
+
+
+@contextmanager
+def __open_7z_member(archive: str, member: str):
+    # Stream the member from the standard output of the 7z command line tool
+    process = subprocess.Popen([__seven_zip(), 'x', '-so', '-bd', '-spd', archive, member], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        yield process.stdout
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+@contextmanager
+def __open_tar_zst(archive: str):
+    if zstandard is None:
+        raise ImportError(f'The zstandard package is required to read {archive}.')
+
+    # The tar archive is read as a stream, members can only be read in order
+    with open(archive, 'rb') as file, zstandard.ZstdDecompressor().stream_reader(file) as reader, tarfile.open(fileobj=reader, mode='r|') as tar_file:
+        yield tar_file
+
+
+def __seven_zip(required: bool = True) -> str:
+    for name in ('7z', '7zz', '7za'):
+        path = shutil.which(name)
+        if path is not None:
+            return path
+
+    if required:
+        raise FileNotFoundError('Neither the 7z command line tool nor py7zr is installed.')
+    return None
+
+
+def __member_name(name: str) -> str:
+    name = name.replace('\\', '/')
+    while name.startswith('./'):
+        name = name[2:]
+    return name.strip('/')
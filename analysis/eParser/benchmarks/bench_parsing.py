@@ -0,0 +1,245 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+
+# Benchmark of the parsing and evaluation functions on synthetic test folders (see synthetic.py).
+# For every size the throughput (records per second) and the peak memory (RSS, and with --memory
+# the traced Python allocations) of each function are measured.
+#
+#   python benchmarks/bench_parsing.py [--sizes 1e3 1e4 1e5 1e6] [--functions parse_test_results ...]
+
+eparser_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, eparser_folder)
+
+from synthetic import write_test_folder
+from constants import parsing
+from profiling import configure_profiling, profile_stage, collect_profile
+from xml_backend import lxml_etree
+from parsing import parse_description_file, parse_result_file, parse_timestamp_messages, parse_query_messages, parse_test_results, iterate_timestamp_messages
+from performance_evaluation import evaluate_performance, evaluate_performance_stream
+from data_format import format_query
+
+
+def bench_parse_result_file(test_folder: dict) -> int:
+    parse_result_file(test_folder['client'])
+    return test_folder['records']
+
+
+def bench_parse_timestamp_messages(test_folder: dict) -> int:
+    return len(parse_timestamp_messages(test_folder['client']))
+
+
+def bench_parse_test_results(test_folder: dict) -> int:
+    _, _, records = parse_test_results(test_folder['client'], columnar=True)
+    return records['sequence'].size
+
+
+def bench_iterate_timestamp_messages(test_folder: dict) -> int:
+    return sum(chunk['sequence'].size for chunk in iterate_timestamp_messages(test_folder['client'], 100000, columnar=True))
+
+
+def bench_evaluate_performance(test_folder: dict) -> int:
+    timestamps = evaluate_performance(test_folder['scenario'], test_folder['output'])
+    return int(timestamps['matched'])
+
+
+def bench_evaluate_performance_stream(test_folder: dict) -> int:
+    scenario = list(test_folder['scenario'])
+    scenario[3] = iterate_timestamp_messages(test_folder['client'], 100000, columnar=True)
+    scenario[4] = iterate_timestamp_messages(test_folder['server'], 100000, columnar=True)
+    timestamps = evaluate_performance_stream(scenario, test_folder['output'])
+    return int(timestamps['matched'])
+
+
+def bench_format_query(test_folder: dict) -> int:
+    # One query message per record (cumulative counters with some out of order reports)
+    records = test_folder['records']
+    rng = np.random.default_rng(0)
+    losses = np.cumsum(rng.random(records) < 0.001)
+    losses[rng.random(records) < 0.01] += 1
+    query = {
+        'losses': losses,
+        'total': np.arange(1, records + 1),
+        'timestamp': np.arange(1, records + 1) / 10000,
+    }
+    format_query(query, records / 10000, int(losses[-1]), records)
+    return records
+
+
+benchmarks = {
+    'parse_result_file': bench_parse_result_file,
+    'parse_timestamp_messages': bench_parse_timestamp_messages,
+    'parse_test_results': bench_parse_test_results,
+    'iterate_timestamp_messages': bench_iterate_timestamp_messages,
+    'evaluate_performance': bench_evaluate_performance,
+    'evaluate_performance_stream': bench_evaluate_performance_stream,
+    'format_query': bench_format_query,
+}
+
+# Functions that need the parsed scenario (prepared before the measurement)
+evaluation_benchmarks = ['evaluate_performance', 'evaluate_performance_stream']
+
+
+def run_benchmark(name: str, test_folder: dict, repeat: int) -> dict:
+    '''
+    Runs a benchmark function and measures the duration and the peak memory. The fastest run is
+    reported, the peak memory is the maximum of all runs.
+
+            Parameters:
+                    name (str): Name of the benchmark (see benchmarks)
+                    test_folder (dict): Test folder (paths, number of records and parsed scenario)
+                    repeat (int): Number of measurements
+
+            Returns:
+                    result (dict): Dictionary containing the records, duration, throughput and peaks
+    '''
+    result = {'records': 0, 'duration': None, 'peak_rss': None, 'peak_traced': None, 'bytes_read': None}
+    for _ in range(repeat):
+        with profile_stage('benchmark', step=name) as entry:
+            entry['records'] = benchmarks[name](test_folder)
+
+        result['records'] = entry['records']
+        result['duration'] = entry['duration'] if result['duration'] is None else min(result['duration'], entry['duration'])
+        result['peak_rss'] = max(result['peak_rss'] or 0, entry['peak_rss'] or 0)
+        result['peak_traced'] = max(result['peak_traced'] or 0, entry['peak_traced'] or 0)
+        result['bytes_read'] = entry['bytes_read']
+    collect_profile()
+
+    result['throughput'] = result['records'] / result['duration'] if result['duration'] > 0 else float('inf')
+    return result
+
+
+def verify_backends(path: str) -> bool:
+    '''
+    Parses the test results file of a test folder with every XML backend (standard library and
+    lxml parser, with and without the byte scanner, with small blocks) and compares the results
+    with the ones of the standard library parser without scanner.
+
+            Parameters:
+                    path (str): Path to the test folder
+
+            Returns:
+                    result (bool): True if all backends return identical results, False otherwise
+    '''
+    settings = dict(parsing)
+    configurations = [('stdlib', False, settings['block_size']), ('stdlib', True, settings['block_size']), ('stdlib', True, 4096)]
+    if lxml_etree is not None:
+        configurations += [('lxml', False, settings['block_size']), ('lxml', True, settings['block_size'])]
+
+    reference = None
+    identical = True
+    for backend, scanner, block_size in configurations:
+        parsing.update({'backend': backend, 'scanner': scanner, 'block_size': block_size})
+        try:
+            output = [
+                parse_result_file(path),
+                parse_query_messages(path),
+                parse_timestamp_messages(path),
+                parse_test_results(path),
+                parse_test_results(path, columnar=True),
+                parse_test_results(path, timestamps=False),
+                list(iterate_timestamp_messages(path, 1000)),
+                list(iterate_timestamp_messages(path, 1000, columnar=True)),
+                list(iterate_timestamp_messages(path, columnar=True)),
+            ]
+        finally:
+            parsing.update(settings)
+
+        if reference is None:
+            reference = output
+        elif not __equal(reference, output):
+            print(f'Error: Results of the {backend} backend (scanner: {scanner}, block size: {block_size}) differ!')
+            identical = False
+
+    return identical
+
+
+def __equal(first, second) -> bool:
+    if isinstance(first, np.ndarray) or isinstance(second, np.ndarray):
+        return isinstance(first, np.ndarray) and isinstance(second, np.ndarray) and first.dtype == second.dtype and np.array_equal(first, second)
+    if isinstance(first, dict):
+        return isinstance(second, dict) and first.keys() == second.keys() and all(__equal(first[key], second[key]) for key in first)
+    if isinstance(first, (list, tuple)):
+        return isinstance(second, (list, tuple)) and len(first) == len(second) and all(__equal(a, b) for a, b in zip(first, second))
+    return first == second
+
+
+def prepare_test_folder(folder: str, records: int, loss: float, reorder: float, queries: int, evaluate: bool) -> dict:
+    '''
+    Writes a synthetic test folder and, if an evaluation is benchmarked, parses it in advance.
+
+            Parameters:
+                    folder (str): Path to the temporary folder
+                    records (int): Number of records
+                    loss (float): Loss probability
+                    reorder (float): Reordering probability
+                    queries (int): Number of query messages
+                    evaluate (bool): Parse the scenario for the evaluation benchmarks
+
+            Returns:
+                    test_folder (dict): Dictionary containing the paths, the records and the scenario
+    '''
+    write_test_folder(folder, 'benchmark', 'scenario', 't1', records, loss=loss, reorder=reorder, queries=queries)
+
+    test_folder = {
+        'records': records,
+        'client': os.path.join(folder, 'benchmark', 'client', 'scenario', 't1'),
+        'server': os.path.join(folder, 'benchmark', 'server', 'scenario', 't1'),
+        'output': os.path.join(folder, 'output'),
+        'scenario': None,
+    }
+
+    if evaluate:
+        client_results, _, client_timestamps = parse_test_results(test_folder['client'], columnar=True)
+        server_results, _, server_timestamps = parse_test_results(test_folder['server'], columnar=True)
+        test_folder['scenario'] = [parse_description_file(test_folder['client']), client_results, server_results, client_timestamps, server_timestamps]
+
+    return test_folder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the parsing and evaluation functions.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5, 1e6], help='number of records per test folder (up to 1e8)')
+    parser.add_argument('--functions', nargs='+', choices=list(benchmarks.keys()), default=list(benchmarks.keys()), help='benchmarked functions')
+    parser.add_argument('--repeat', type=int, default=3, help='number of measurements per function and size')
+    parser.add_argument('--loss', type=float, default=0.001, help='loss probability of the synthetic data')
+    parser.add_argument('--reorder', type=float, default=0.0, help='reordering probability of the synthetic data')
+    parser.add_argument('--queries', type=int, default=0, help='query messages of the synthetic data (older TestSuite versions)')
+    parser.add_argument('--memory', action='store_true', help='trace the Python allocations (slower)')
+    parser.add_argument('--folder', default=None, help='folder for the synthetic data (default: temporary folder)')
+    parser.add_argument('--verify', nargs='*', default=None, metavar='TEST_FOLDER',
+                        help='compare the results of all XML backends on synthetic data and the given test folders (client or server) instead')
+    args = parser.parse_args()
+
+    if args.verify is not None:
+        identical = True
+        with tempfile.TemporaryDirectory(dir=args.folder) as folder:
+            for index, (records, latency, queries) in enumerate([(0, 'FULL', 0), (2500, 'FULL', 3), (2500, 'END_TO_END', 0), (2500, 'DISABLED', 3)]):
+                write_test_folder(folder, 'verify', 'scenario', f't{index}', records, seed=index, loss=0.01, burst=2, reorder=0.01, queries=queries, latency=latency)
+                for side in ('client', 'server'):
+                    identical &= verify_backends(os.path.join(folder, 'verify', side, 'scenario', f't{index}'))
+        for path in args.verify:
+            identical &= verify_backends(path)
+
+        print('All XML backends return identical results.' if identical else 'Error: The XML backends return different results!')
+        sys.exit(0 if identical else 1)
+
+    configure_profiling(True, args.memory)
+
+    print(f'{"Function":<30}{"Records":>12}{"Time (s)":>11}{"Records/s":>14}{"RSS (MiB)":>11}{"Traced (MiB)":>14}{"Read (MiB)":>12}')
+    for size in args.sizes:
+        records = int(size)
+        with tempfile.TemporaryDirectory(dir=args.folder) as folder:
+            evaluate = any(name in evaluation_benchmarks for name in args.functions)
+            test_folder = prepare_test_folder(folder, records, args.loss, args.reorder, args.queries, evaluate)
+
+            for name in args.functions:
+                result = run_benchmark(name, test_folder, args.repeat)
+                peak_traced = f'{result["peak_traced"] / 1048576:.1f}' if args.memory else '-'
+                bytes_read = f'{result["bytes_read"] / 1048576:.1f}' if result['bytes_read'] is not None else '-'
+                print(f'{name:<30}{result["records"]:>12}{result["duration"]:>11.3f}{result["throughput"]:>14,.0f}'
+                      f'{result["peak_rss"] / 1048576:>11.1f}{peak_traced:>14}{bytes_read:>12}', flush=True)
+
+            del test_folder
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import glob
+import argparse
+import tempfile
+import statistics
+import subprocess
+from synthetic import write_test_folder
+
+# Benchmark of the eParser startup: import time of the modules (in a fresh interpreter each) and
+# time until the first test scenario is processed by a complete eParser run.
+#
+#   python benchmarks/startup.py [--repeat 5] [--records 1000] [--jobs 2]
+
+eparser_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+heavy_modules = ['pandas', 'openpyxl', 'matplotlib', 'seaborn']
+
+
+def measure_import(module: str, repeat: int) -> tuple:
+    '''
+    Imports the module in a fresh interpreter and measures the import time.
+
+            Parameters:
+                    module (str): Name of the module
+                    repeat (int): Number of measurements
+
+            Returns:
+                    duration (float): Median import time (seconds)
+                    loaded (list): Heavy modules loaded by the import
+    '''
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            f'import {module}\n'
+            'duration = time.perf_counter() - start\n'
+            f'print(duration, *[name for name in {heavy_modules!r} if name in sys.modules])\n')
+
+    durations = list()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=eparser_folder, capture_output=True, text=True, check=True).stdout.split()
+        durations.append(float(output[0]))
+
+    return statistics.median(durations), output[1:]
+
+
+def measure_first_scenario(results_folder: str, output_folder: str, jobs: int) -> tuple:
+    '''
+    Runs eParser (parse and evaluate only, without cache) and measures the time until the first
+    performance.xml is written and until the run is finished.
+
+            Parameters:
+                    results_folder (str): Path to the results folder
+                    output_folder (str): Path to the output folder
+                    jobs (int): Number of worker processes
+
+            Returns:
+                    first (float): Time until the first test scenario is processed (seconds)
+                    total (float): Time until eParser is finished (seconds)
+    '''
+    command = [sys.executable, 'eParser.py', '-r', results_folder, '-o', output_folder, '-j', str(jobs), '--no-cache', '--stages', 'parse,evaluate']
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=eparser_folder, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    first = None
+    while process.poll() is None:
+        if first is None and glob.glob(os.path.join(output_folder, '*', '*', '*', 'performance.xml')):
+            first = time.perf_counter() - start
+        time.sleep(0.002)
+    total = time.perf_counter() - start
+
+    if first is None:
+        first = total
+
+    return first, total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the eParser startup.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements')
+    parser.add_argument('--records', type=int, default=1000, help='timestamp records per test folder')
+    parser.add_argument('--jobs', type=int, default=2, help='worker processes for the pool measurement')
+    args = parser.parse_args()
+
+    print('Import time (fresh interpreter, median):')
+    for module in ['eParser', 'processing', 'tablemaker', 'graphs', 'graphs_campaign']:
+        duration, loaded = measure_import(module, args.repeat)
+        print(f'    {module:<20} {duration * 1000:8.1f} ms    heavy modules: {", ".join(loaded) if loaded else "-"}')
+
+    with tempfile.TemporaryDirectory() as folder:
+        results_folder = os.path.join(folder, 'results')
+        for index in range(1, args.jobs + 1):
+            write_test_folder(results_folder, 'campaign', 'scenario', f't{index}', args.records, seed=index, queries=1)
+
+        print(f'Time to first test scenario processed ({args.records} records per test folder, median):')
+        for jobs in sorted({1, args.jobs}):
+            measurements = [measure_first_scenario(results_folder, os.path.join(folder, f'output_{jobs}_{run}'), jobs) for run in range(args.repeat)]
+            first = statistics.median(measurement[0] for measurement in measurements)
+            total = statistics.median(measurement[1] for measurement in measurements)
+            print(f'    {jobs} job(s)             {first * 1000:8.1f} ms    (finished after {total * 1000:.1f} ms)')
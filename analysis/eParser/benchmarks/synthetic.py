@@ -0,0 +1,252 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+# Generator of synthetic test folders (test_description.xml and test_results.xml) in the layout that
+# is written by the TestSuite (test_description.cpp / test_results.cpp, pugixml with tab indent).
+# The files are written in chunks, so arbitrarily large test results files can be generated with
+# constant memory. Client and server files of a test folder are generated from the same seed and
+# therefore describe the same datagrams.
+#
+#   python benchmarks/synthetic.py RESULTS_FOLDER --records 1000000 --loss 0.001 --reorder 0.0001
+
+ethtool_statistics = ['rx_packets', 'tx_packets', 'rx_dropped', 'tx_dropped', 'collisions', 'port_tx_errors', 'port_rx_dropped', 'port_tx_dropped_link_down']
+ip_statistics = ['mtu', 'rx_bytes', 'rx_packets', 'rx_errors', 'rx_dropped', 'rx_missed', 'rx_mcast', 'tx_bytes', 'tx_packets', 'tx_errors', 'tx_dropped', 'tx_carrier', 'tx_collisions']
+netstat_statistics = ['udp_pkg_rec', 'udp_pkg_snt', 'udp_rec_err', 'udp_rec_buf_err', 'udp_snt_buf_err']
+
+# Start of the generated timestamps (nanoseconds since the epoch)
+start_time = 1700000000000000000
+
+
+def write_test_description(path: str, t_uid: str, duration: int, cycle_time: int, datagram_size: int, latency: str = 'FULL') -> None:
+    '''
+    Writes a test description file (test_description.xml) to the given test folder.
+
+            Parameters:
+                    path (str): Path to the test folder
+                    t_uid (str): Test-ID
+                    duration (int): Duration of the test (seconds)
+                    cycle_time (int): Cycle time (nanoseconds)
+                    datagram_size (int): Datagram size (bytes)
+                    latency (str): Latency measurement ('DISABLED', 'END_TO_END' or 'FULL')
+
+            Returns:
+                    None
+    '''
+    os.makedirs(path, exist_ok=True)
+
+    with open(os.path.join(path, 'test_description.xml'), 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0"?>\n'
+                   '<test_description>\n'
+                   '\t<metadata>\n'
+                   f'\t\t<t_uid>{t_uid}</t_uid>\n'
+                   f'\t\t<path>{path}</path>\n'
+                   f'\t\t<latency_measurement>{latency}</latency_measurement>\n'
+                   '\t\t<latency_reduced>FALSE</latency_reduced>\n'
+                   '\t</metadata>\n'
+                   f'\t<duration>{duration}</duration>\n'
+                   '\t<connection>\n'
+                   '\t\t<type>ST_UDP</type>\n'
+                   '\t\t<client_ip>10.0.0.1</client_ip>\n'
+                   '\t\t<server_ip>10.0.0.2</server_ip>\n'
+                   '\t\t<port>8120</port>\n'
+                   f'\t\t<cycletime>{cycle_time}</cycletime>\n'
+                   f'\t\t<datagram_size>{datagram_size}</datagram_size>\n'
+                   '\t</connection>\n'
+                   '\t<interface>\n'
+                   '\t\t<client>enp1s0f0</client>\n'
+                   '\t\t<server>enp1s0f0</server>\n'
+                   '\t</interface>\n'
+                   '\t<stress>\n'
+                   '\t\t<type>NONE</type>\n'
+                   '\t\t<num>0</num>\n'
+                   '\t\t<location>LOC_BOTH</location>\n'
+                   '\t</stress>\n'
+                   '</test_description>\n')
+
+
+def write_test_results(path: str, side: str, records: int, cycle_time: int = 100000, loss: float = 0.0, burst: float = 1.0,
+                       reorder: float = 0.0, queries: int = 0, latency: str = 'FULL', seed: int = 0, chunk_size: int = 100000) -> dict:
+    '''
+    Writes a test results file (test_results.xml) to the given test folder. The client file contains
+    a record with the send timestamp (snt_prog) for every datagram. The server file contains a
+    record for every received datagram with the receive timestamps (rec_sw if the latency
+    measurement is 'FULL', and rec_prog). Losses occur in bursts with a geometrically distributed
+    length (mean burst), the probability that a datagram is lost is loss. Reordered datagrams are
+    swapped with their successor in the server file. If queries is set, the query messages of older
+    TestSuite versions (and num_loss) are written as well.
+
+            Parameters:
+                    path (str): Path to the test folder
+                    side (str): 'client' or 'server'
+                    records (int): Number of sent datagrams
+                    cycle_time (int): Cycle time (nanoseconds)
+                    loss (float): Loss probability (optional)
+                    burst (float): Mean length of loss bursts (optional)
+                    reorder (float): Reordering probability (optional)
+                    queries (int): Number of query messages (optional)
+                    latency (str): Latency measurement ('DISABLED', 'END_TO_END' or 'FULL')
+                    seed (int): Seed of the random number generator (same for client and server)
+                    chunk_size (int): Number of datagrams generated at once (optional)
+
+            Returns:
+                    counts (dict): Dictionary containing the number of 'records' and 'losses'
+    '''
+    os.makedirs(path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    if side == 'client':
+        record_template = '\t\t\t<record>\n\t\t\t\t<sequence>%d</sequence>\n\t\t\t\t<snt_prog>\n\t\t\t\t\t<tv_sec>%d</tv_sec>\n\t\t\t\t\t<tv_nsec>%d</tv_nsec>\n\t\t\t\t</snt_prog>\n\t\t\t</record>\n'
+    elif latency == 'FULL':
+        record_template = ('\t\t\t<record>\n\t\t\t\t<sequence>%d</sequence>\n\t\t\t\t<rec_sw>\n\t\t\t\t\t<tv_sec>%d</tv_sec>\n\t\t\t\t\t<tv_nsec>%d</tv_nsec>\n\t\t\t\t</rec_sw>\n'
+                           '\t\t\t\t<rec_prog>\n\t\t\t\t\t<tv_sec>%d</tv_sec>\n\t\t\t\t\t<tv_nsec>%d</tv_nsec>\n\t\t\t\t</rec_prog>\n\t\t\t</record>\n')
+    else:
+        record_template = '\t\t\t<record>\n\t\t\t\t<sequence>%d</sequence>\n\t\t\t\t<rec_prog>\n\t\t\t\t\t<tv_sec>%d</tv_sec>\n\t\t\t\t\t<tv_nsec>%d</tv_nsec>\n\t\t\t\t</rec_prog>\n\t\t\t</record>\n'
+
+    # The loss pattern is known before the file is written (num_loss and query messages come first)
+    lost = __loss_pattern(np.random.default_rng(seed + 1), records, loss, burst)
+    losses = int(np.count_nonzero(lost))
+    duration = records * cycle_time / 1000000000
+
+    filename = os.path.join(path, 'test_results.xml')
+    with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as file:
+        file.write('<?xml version="1.0"?>\n<test_results>\n\t<status>STATUS_SUCCESS</status>\n\t<custom>\n')
+        if queries > 0:
+            file.write(f'\t\t<num_loss>{losses}</num_loss>\n')
+        file.write(f'\t\t<num_total>{records}</num_total>\n\t\t<num_misses>0</num_misses>\n\t\t<elapsed_time>{duration:f}</elapsed_time>\n')
+
+        # Query messages (total and losses are reversed in the XML file, this is a bug in TestSuite)
+        if queries > 0:
+            file.write('\t\t<query>\n')
+            cumulative_losses = np.cumsum(lost)
+            for index in range(1, queries + 1):
+                sent = (records * index) // queries
+                lost_so_far = int(cumulative_losses[sent - 1]) if sent > 0 else 0
+                file.write(f'\t\t\t<report>\n\t\t\t\t<misses>{sent}</misses>\n\t\t\t\t<total>{lost_so_far}</total>\n'
+                           f'\t\t\t\t<timestamp>{sent * cycle_time / 1000000000:f}</timestamp>\n\t\t\t</report>\n')
+            file.write('\t\t</query>\n')
+
+        if latency != 'DISABLED':
+            file.write('\t\t<timestamp>\n')
+            for first in range(0, records, chunk_size):
+                count = min(chunk_size, records - first)
+                sequence = np.arange(first, first + count, dtype=np.int64)
+
+                # Both sides draw the same random numbers in the same order
+                sent = start_time + sequence * cycle_time + rng.integers(0, cycle_time // 20 + 1, count)
+                received_sw = sent + 15000 + rng.gamma(2.0, 2500.0, count).astype(np.int64)
+                received_prog = received_sw + 4000 + rng.gamma(2.0, 1000.0, count).astype(np.int64)
+                swapped = rng.random(count) < reorder
+
+                if side == 'client':
+                    columns = (sequence, sent // 1000000000, sent % 1000000000)
+                else:
+                    kept = ~lost[first:first + count]
+                    order = __reorder(np.flatnonzero(kept), swapped[kept])
+                    columns = (sequence[order], received_sw[order] // 1000000000, received_sw[order] % 1000000000,
+                               received_prog[order] // 1000000000, received_prog[order] % 1000000000)
+                    if latency != 'FULL':
+                        columns = (columns[0], columns[3], columns[4])
+
+                file.write(''.join(record_template % values for values in zip(*(column.tolist() for column in columns))))
+            file.write('\t\t</timestamp>\n')
+
+        file.write('\t</custom>\n')
+
+        # Statistics (the interfaces counted all datagrams, the received ones on the server)
+        received = records - losses
+        packets = {'client': (records, 0), 'server': (0, received)}[side]
+        file.write('\t<ethtool_statistic>\n')
+        for statistic in ethtool_statistics:
+            end = packets[0] if statistic == 'tx_packets' else packets[1] if statistic == 'rx_packets' else 0
+            file.write(f'\t\t<{statistic}>\n\t\t\t<start>0</start>\n\t\t\t<end>{end}</end>\n\t\t</{statistic}>\n')
+        file.write('\t</ethtool_statistic>\n\t<ip_statistic>\n')
+        for statistic in ip_statistics:
+            start, end = (9000, 9000) if statistic == 'mtu' else (0, 0)
+            file.write(f'\t\t<{statistic}>\n\t\t\t<start>{start}</start>\n\t\t\t<end>{end}</end>\n\t\t</{statistic}>\n')
+        file.write('\t</ip_statistic>\n\t<netstat_statistic>\n')
+        for statistic in netstat_statistics:
+            end = packets[0] if statistic == 'udp_pkg_snt' else packets[1] if statistic == 'udp_pkg_rec' else 0
+            file.write(f'\t\t<{statistic}>\n\t\t\t<start>0</start>\n\t\t\t<end>{end}</end>\n\t\t</{statistic}>\n')
+        file.write('\t</netstat_statistic>\n</test_results>\n')
+
+    return {'records': records if side == 'client' else records - losses, 'losses': losses}
+
+
+def write_test_folder(results_folder: str, campaign: str, scenario: str, test_folder: str, records: int, cycle_time: int = 100000,
+                      datagram_size: int = 80, seed: int = 0, **options) -> None:
+    '''
+    Writes the client and server files of a test folder in the layout of the results folder
+    (results_folder/campaign/client|server/scenario/test_folder).
+
+            Parameters:
+                    results_folder (str): Path to the results folder
+                    campaign (str): Name of the campaign
+                    scenario (str): Name of the test scenario
+                    test_folder (str): Name of the test folder (also used as Test-ID)
+                    records (int): Number of sent datagrams
+                    cycle_time (int): Cycle time (nanoseconds)
+                    datagram_size (int): Datagram size (bytes)
+                    seed (int): Seed of the random number generator
+                    options: Options of write_test_results (loss, burst, reorder, queries, latency, chunk_size)
+
+            Returns:
+                    None
+    '''
+    duration = max(1, round(records * cycle_time / 1000000000))
+    for side in ('client', 'server'):
+        path = os.path.join(results_folder, campaign, side, scenario, test_folder)
+        write_test_description(path, test_folder, duration, cycle_time, datagram_size, options.get('latency', 'FULL'))
+        write_test_results(path, side, records, cycle_time, seed=seed, **options)
+
+
+def __loss_pattern(rng, records: int, loss: float, burst: float) -> np.ndarray:
+    # Bursts start with probability loss / burst and have a geometrically distributed length
+    lost = np.zeros(records, dtype=bool)
+    if loss <= 0 or records == 0:
+        return lost
+
+    starts = np.flatnonzero(rng.random(records) < loss / max(burst, 1.0))
+    lengths = rng.geometric(1.0 / max(burst, 1.0), starts.size)
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        lost[start:start + length] = True
+
+    return lost
+
+
+def __reorder(order: np.ndarray, swapped: np.ndarray) -> np.ndarray:
+    # Swaps the marked positions with their successor (positions that were just swapped are skipped)
+    order = order.copy()
+    position = 0
+    for index in np.flatnonzero(swapped[:-1]).tolist():
+        if index < position:
+            continue
+        order[index], order[index + 1] = order[index + 1], order[index]
+        position = index + 2
+
+    return order
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Writes synthetic test folders in the TestSuite layout.')
+    parser.add_argument('results_folder', help='results folder (campaign/client|server/scenario/test folder)')
+    parser.add_argument('--campaign', default='synthetic', help='name of the campaign')
+    parser.add_argument('--scenario', default='scenario', help='name of the test scenario')
+    parser.add_argument('--tests', type=int, default=1, help='number of test folders')
+    parser.add_argument('--records', type=float, default=100000, help='datagrams per test folder')
+    parser.add_argument('--cycle-time', type=int, default=100000, help='cycle time (nanoseconds)')
+    parser.add_argument('--datagram-size', type=int, default=80, help='datagram size (bytes)')
+    parser.add_argument('--loss', type=float, default=0.0, help='loss probability')
+    parser.add_argument('--burst', type=float, default=1.0, help='mean length of loss bursts')
+    parser.add_argument('--reorder', type=float, default=0.0, help='reordering probability')
+    parser.add_argument('--queries', type=int, default=0, help='number of query messages (older TestSuite versions)')
+    parser.add_argument('--latency', default='FULL', choices=['DISABLED', 'END_TO_END', 'FULL'], help='latency measurement')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first test folder')
+    args = parser.parse_args()
+
+    for index in range(args.tests):
+        test_folder = f't{index + 1:03d}'
+        write_test_folder(args.results_folder, args.campaign, args.scenario, test_folder, int(args.records), args.cycle_time, args.datagram_size,
+                          seed=args.seed + index, loss=args.loss, burst=args.burst, reorder=args.reorder, queries=args.queries, latency=args.latency)
+        print(f'Written {os.path.join(args.results_folder, args.campaign, "*", args.scenario, test_folder)}', file=sys.stderr)
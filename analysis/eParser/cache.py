@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import numpy as np
+from constants import test_description_file, test_results_file, parsing
+from file_management import file_fingerprint, fingerprint_matches
+from parsing import parse_description_file, parse_test_results
+
+# Version of the cache file layout, entries of other versions are parsed again
+cache_version = 4
+
+
+def parse_test_folder(path: str, cache_folder: str = None, description: bool = True) -> tuple:
+    '''
+    Parses a test folder (test description and test results file) and returns the description, the
+    test results, the query messages and the columnar timestamp messages (see parse_test_results).
+    If a cache folder is given, the parsed data is stored there as a binary NumPy file and loaded
+    from it on later calls, as long as the XML files are unchanged (size, modification time and
+    content hash) and the query messages were downsampled with the same settings
+    (constants.parsing['query_stride'] and constants.parsing['max_reports']). Otherwise the XML
+    files are parsed.
+
+            Parameters:
+                    path (str): Path to the test folder
+                    cache_folder (str): Path to the cache folder (optional, None disables the cache)
+                    description (bool): Parse the test description file (optional)
+
+            Returns:
+                    description (dict): Dictionary containing the test description (None if not parsed)
+                    results (dict): Dictionary containing the test results
+                    reports (dict): Dictionary of arrays containing the query messages
+                    records (dict): Dictionary of arrays containing the timestamp messages
+    '''
+    if cache_folder is not None:
+        data = load_test_folder(path, cache_folder, description)
+        if data is not None:
+            return data
+
+    test_description = parse_description_file(path) if description else None
+    results, reports, records = parse_test_results(path, columnar=True, stride=parsing['query_stride'], max_reports=parsing['max_reports'])
+    data = (test_description, results, reports, records)
+
+    if cache_folder is not None:
+        store_test_folder(path, cache_folder, data)
+
+    return data
+
+
+def load_test_folder(path: str, cache_folder: str, description: bool = True) -> tuple:
+    '''
+    Loads the parsed data of a test folder from the cache.
+
+            Parameters:
+                    path (str): Path to the test folder
+                    cache_folder (str): Path to the cache folder
+                    description (bool): The test description is required (optional)
+
+            Returns:
+                    data (tuple): Parsed data (see parse_test_folder), None if there is no valid entry
+    '''
+    cache_file = __cache_file(path, cache_folder)
+    if not os.path.exists(cache_file):
+        return None
+
+    try:
+        with np.load(cache_file, allow_pickle=False) as entry:
+            metadata = json.loads(str(entry['metadata']))
+            if metadata['version'] != cache_version or metadata['path'] != os.path.abspath(path):
+                return None
+            if metadata['query'] != __query_settings():
+                return None
+            if description and metadata['description'] is None:
+                return None
+
+            # Check if the XML files are unchanged
+            for filename, fingerprint in metadata['files'].items():
+                if not fingerprint_matches(os.path.join(path, filename), fingerprint):
+                    return None
+
+            reports = __read_columns(entry, 'query', metadata['columns'])
+            records = __read_columns(entry, 'timestamps', metadata['columns'])
+    except (OSError, ValueError, KeyError):
+        # Damaged or incomplete cache file, parse again
+        return None
+
+    return metadata['description'], metadata['results'], reports, records
+
+
+def cached_fingerprints(path: str, cache_folder: str) -> dict:
+    '''
+    Returns the fingerprints of the XML files stored with the cache entry of a test folder, so they
+    do not have to be calculated again (e.g. for the manifest of the incremental mode).
+
+            Parameters:
+                    path (str): Path to the test folder
+                    cache_folder (str): Path to the cache folder
+
+            Returns:
+                    files (dict): Fingerprints by file name (see file_fingerprint, empty if there is no entry)
+    '''
+    cache_file = __cache_file(path, cache_folder)
+    if not os.path.exists(cache_file):
+        return dict()
+
+    try:
+        with np.load(cache_file, allow_pickle=False) as entry:
+            metadata = json.loads(str(entry['metadata']))
+            if metadata['version'] != cache_version or metadata['path'] != os.path.abspath(path):
+                return dict()
+            return metadata['files']
+    except (OSError, ValueError, KeyError):
+        return dict()
+
+
+def store_test_folder(path: str, cache_folder: str, data: tuple) -> None:
+    '''
+    Stores the parsed data of a test folder in the cache. The file is written to a temporary file
+    first and then renamed, so concurrent readers never see a partial entry.
+
+            Parameters:
+                    path (str): Path to the test folder
+                    cache_folder (str): Path to the cache folder
+                    data (tuple): Parsed data (see parse_test_folder)
+
+            Returns:
+                    None
+    '''
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder, exist_ok=True)
+
+    description, results, reports, records = data
+
+    files = dict()
+    for filename in (test_description_file, test_results_file):
+        if filename == test_description_file and description is None:
+            continue
+        files[filename] = file_fingerprint(os.path.join(path, filename))
+
+    arrays = dict()
+    columns = {'query': None, 'timestamps': None}
+    for name, values in (('query', reports), ('timestamps', records)):
+        if values is not None:
+            columns[name] = list(values.keys())
+            for key, array in values.items():
+                arrays[f'{name}__{key}'] = array
+
+    metadata = {
+        'version': cache_version,
+        'path': os.path.abspath(path),
+        'files': files,
+        'columns': columns,
+        'query': __query_settings(),
+        'description': description,
+        'results': results,
+    }
+
+    cache_file = __cache_file(path, cache_folder)
+    temporary_file = f'{cache_file}.{os.getpid()}.tmp.npz'
+    np.savez(temporary_file, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(temporary_file, cache_file)
+
+
+def __query_settings() -> dict:
+    return {'stride': parsing['query_stride'], 'max_reports': parsing['max_reports']}
+
+
+def __cache_file(path: str, cache_folder: str) -> str:
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_folder, f'{key}.npz')
+
+
+def __read_columns(entry, name: str, columns: dict) -> dict:
+    if columns[name] is None:
+        return None
+
+    return {key: entry[f'{name}__{key}'] for key in columns[name]}
@@ -3,11 +3,16 @@ import os
 # FOLDER NAMES
 output_folder = 'results/performance/output'
 results_folder = 'results/performance/raw'
+cache_folder = 'results/performance/cache'
 
 # LOG NAMES
 test_description_file = 'test_description.xml'
 test_results_file = 'test_results.xml'
 
+# TIMESTAMP STAGES (in the order a datagram passes them, see test_results.cpp)
+timestamp_stages = ['snt_prog', 'rec_sw', 'rec_prog']
+missing_timestamp = -1          # value of a stage that is not present in a record
+
 # TABLE OPTIONS
 tables = {
     'generate' : True,
@@ -22,6 +27,7 @@ tables = {
 diagrams = {
     'generate' : True,
     'histogram' : False,
+    'latency_window' : 100000000,   # window of the latency over time diagram (nanoseconds, one of evaluation['windows']['sizes'])
 
     'colors' : {'datagramsize': {80: 'lightgray', 8900: 'steelblue', 65000: '#9fcc9f',},
                 'location': {'CLIENT': 'lightgray', 'SERVER': 'steelblue', 'BOTH': '#9fcc9f',},
@@ -34,7 +40,51 @@ diagrams = {
     },
 }
 
+# EVALUATION OPTIONS
+evaluation = {
+    'histogram' : {
+        'sub_bucket_bits' : 7,      # 128 sub-buckets per power of two (relative error < 1 %)
+        'highest_bits' : 40,        # highest trackable latency 2^40 ns (approx. 18 min)
+    },
+    'percentiles' : [50, 90, 99, 99.9, 99.99],
+    'streaming' : {
+        'enabled' : False,          # evaluate the timestamps chunk by chunk (constant memory)
+        'chunk_size' : 1000000,
+    },
+    'reordering' : {
+        'displacement_threshold' : 16,  # displacement histogram from -16 to +16 (larger values in the outer buckets, RFC 5236)
+    },
+    'windows' : {
+        'sizes' : [10000000, 100000000, 1000000000],  # latency and loss series per 10 ms, 100 ms and 1 s (nanoseconds, not in streaming mode)
+        'percentile' : 99,
+        'max_windows' : 1000000,    # windows per size (later datagrams are left out, e.g. 10 ms windows cover 2.7 hours)
+    },
+    'clock_correction' : {
+        'enabled' : False,          # remove the offset and the drift between the clocks of client and server (not in streaming mode)
+        'windows' : 64,             # number of time windows for the lower envelope of the latencies
+        'minimum_latency' : 0,      # latency of the lower envelope after the correction (nanoseconds)
+    },
+}
+
+# PARSING OPTIONS
+parsing = {
+    'backend' : 'auto',         # XML parser ('auto', 'lxml' or 'stdlib', 'auto' uses lxml if installed)
+    'scanner' : True,           # read the timestamp records with the byte scanner (falls back to the XML parser)
+    'block_size' : 16777216,    # bytes read at once by the byte scanner
+    'query_stride' : 1,         # keep only every n-th query report (1 keeps all reports)
+    'max_reports' : 0,          # maximum number of kept query reports, the stride is doubled if reached (0 for no limit)
+}
+
+# CACHE OPTIONS
+cache = {
+    'enabled' : True,           # store the parsed test folders as binary files (cache_folder)
+}
+
 # EXECUTION OPTIONS
+execution = {
+    'jobs' : 0,                 # worker processes for the test scenarios (0 = automatic)
+}
+
 def os_name():
     if os.name == 'nt':
         return 'Windows'
@@ -51,3 +101,14 @@ def concurrent_execution():
         return True
     else:
         return False
+
+def worker_count(jobs: int = None) -> int:
+    if jobs is None:
+        jobs = execution['jobs']
+    if jobs > 0:
+        return jobs
+
+    if concurrent_execution():
+        return os.cpu_count() or 1
+    else:
+        return 1
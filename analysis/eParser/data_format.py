@@ -1,19 +1,22 @@
+import numpy as np
 
-def format_query(query: list, duartion: float, losses: int, total: int) -> list:
+
+def format_query(query: dict, duartion: float, losses: int, total: int) -> dict:
     '''
     Format the query messages to fix the data with negative differences. This function is needed
     because the query messages are sent with no delay (in contrast to the final result message),
     which means that the messages may not arrive in the correct order.
     The query is copied and the original is not modified. The differences are recalculated.
+    The data is fixed in linear time.
 
             Parameters:
-                    query (list): List of dictionaries containing the query messages
+                    query (dict): Dictionary of arrays containing the query messages
                     duartion (float): Duration of the test scenario
                     losses (int): Number of lost packets
                     total (int): Total number of packets
 
             Returns:
-                    new_query (list): List of dictionaries containing the query messages
+                    new_query (dict): Dictionary of arrays containing the query messages
     '''
 
     # Why is this function needed?
@@ -22,35 +25,22 @@ def format_query(query: list, duartion: float, losses: int, total: int) -> list:
     #   - This function fixes the data by looking for negative differences.
 
     # Check if the query is empty
-    if query == []:
+    if query is None or query['losses'].size == 0:
         return query
 
-    new_query = query.copy()
-    new_query.append({'losses': losses, 'total': total, 'timestamp': duartion, 'difference': (losses - new_query[-1]['losses'])})
-    if  not any(report['difference'] < 0 for report in new_query):
-        # No negative differences found, return the query as is
-        return new_query
-
-    # Negative differences found, we need to fix the data.
-
-    # Iterate through the list and until we find a negative difference
-    while any(report['difference'] < 0 for report in new_query):
-        current_index = 0
-        for idx, current_report in enumerate(new_query):
-            if current_report['difference'] < 0:
-                # Found a negative difference, fix the data
-                for previous_report in new_query[:idx]:
-                    # If the previous report has more losses than the current report, we can fix the data
-                    if previous_report['losses'] > current_report['losses']:
-                        previous_report['losses'] = current_report['losses']
-                current_index = idx
-                break
-
-        # Recalculate the differences
-        for idx, current_report in enumerate(new_query[:current_index+1]):
-            if idx == 0:
-                current_report['difference'] = current_report['losses']
-            else:
-                current_report['difference'] = current_report['losses'] - new_query[idx-1]['losses']
+    # Append the final result message
+    new_query = {
+        'losses': np.append(query['losses'], losses),
+        'total': np.append(query['total'], total),
+        'timestamp': np.append(query['timestamp'], duartion),
+    }
+
+    # A report can not have more losses than any later report. Capping every report to the minimum of
+    # all later reports (running minimum from the right) removes all negative differences in a single
+    # pass. This is the same result as repeatedly capping the reports before a negative difference.
+    new_query['losses'] = np.minimum.accumulate(new_query['losses'][::-1])[::-1]
+
+    # Recalculate the differences
+    new_query['difference'] = np.diff(new_query['losses'], prepend=0)
 
     return new_query
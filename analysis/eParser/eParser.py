@@ -1,120 +1,346 @@
 import os
+import sys
+import fnmatch
+import argparse
+import subprocess
+import time
 from datetime import datetime
-from constants import tables, diagrams, output_folder, results_folder, os_name, concurrent_execution
-from parsing import parse_description_file, parse_result_file, parse_query_messages, parse_timestamp_messages
-from file_management import validate_test_folder, check_server_data
+from constants import tables, diagrams, cache, output_folder, results_folder, cache_folder, test_description_file, test_results_file, os_name
+from file_management import validate_test_folder, results_file_complete, file_fingerprint
+from archive import archive_extensions, is_archive, archive_name, campaign_root, path_exists, is_folder, list_folder, file_stat, remove_extracted_archives
+from manifest import manifest_file, analysis_settings, load_manifest, save_manifest, test_folder_inputs, test_folder_changed, update_manifest, content_fingerprints, manifest_entry
+from processing import process_test_folder, write_campaign_summary, write_campaign_loss_bursts
+from scheduler import create_scheduler, map_tasks, wait_for_tasks, close_scheduler
+from profiling import configure_profiling, write_profile, print_profile_summary
 from tablemaker import write_test_table, write_query_table
 from graphs import create_campaign_graphs, create_scenario_graphs, create_datagramsize_graphs
-from performance_evaluation import evaluate_performance
 
 
 parent_folder = os.path.dirname(os.path.dirname((os.path.abspath(__file__))))
 
-# Output folder for the current execution
-commit_hash   = os.popen('git rev-parse HEAD').read().strip()[:7]
-timestamp     = datetime.now().strftime('%y%m%d_%H%M%S')
-operating_sys = os_name()
-output_folder = os.path.join(parent_folder, output_folder, f'{timestamp}_{commit_hash}_{operating_sys}')
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+# Stages of the pipeline (in order of execution)
+stages = ['parse', 'evaluate', 'tables', 'graphs']
 
-# Results folder for the current execution
-result_folder = os.path.join(parent_folder, results_folder)
-if not os.path.exists(result_folder):
-    exit(1)
 
 
-
-def __parse_campaign(name :str, client_path: str, server_path: str, output_path: str) -> None:
-    # Print start message
-    print(f'Starting eParser for campaign {name}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
-
+def __parse_campaign(name :str, client_path: str, server_path: str, output_path: str, cache_folder: str, selected_stages: list, scheduler: dict, incremental: bool = False, sizes: dict = None) -> bool:
     # Create campaign folder for the output
     campaign_folder = os.path.join(output_path, name)
     if not os.path.exists(campaign_folder):
         os.makedirs(campaign_folder)
 
+    test_folders = __list_test_folders(client_path)
+
+    # In incremental mode only the test folders whose inputs or analysis settings changed since the
+    # last run are processed, the others are taken from the manifest of the campaign
+    removed_folders = list()
+    if incremental:
+        manifest = load_manifest(campaign_folder, analysis_settings(selected_stages))
+        inputs = {test_folder: test_folder_inputs(test_folder, client_path, server_path) for test_folder in test_folders}
+        changed_folders = [test_folder for test_folder in test_folders if test_folder_changed(manifest, test_folder, inputs[test_folder])]
+
+        # In follow mode test folders that are still being written are skipped (see __test_folder_ready),
+        # their previous results are kept
+        if sizes is not None:
+            pending_folders = [test_folder for test_folder in changed_folders if not __test_folder_ready(test_folder, client_path, server_path, sizes)]
+            changed_folders = [test_folder for test_folder in changed_folders if test_folder not in pending_folders]
+            test_folders = [test_folder for test_folder in test_folders if test_folder not in pending_folders or test_folder in manifest['test_folders']]
+
+        removed_folders = [test_folder for test_folder in manifest['test_folders'] if test_folder not in test_folders]
+
+        # Nothing to do for this campaign
+        if len(changed_folders) == 0 and len(removed_folders) == 0 and os.path.exists(os.path.join(campaign_folder, manifest_file)):
+            return False
+
+        # Size and modification time only, the content hashes are taken from the cache afterwards
+        fingerprints = {test_folder: {path: file_fingerprint(path, content_hash=False) for path in inputs[test_folder]} for test_folder in changed_folders}
+    else:
+        changed_folders = test_folders
+
+    # Print start message
+    print(f'Starting eParser for campaign {name}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
+    if incremental:
+        print(f'{len(changed_folders)} of {len(test_folders)} test scenario(s) changed.')
+
+    # Parse and evaluate the test scenarios on the workers of the scheduler. Only the small parts of
+    # the test scenarios and a summary are returned, the results are collected in the order of the
+    # test folders.
+    count = len(changed_folders)
+    arguments = ([client_path] * count, [server_path] * count, [campaign_folder] * count, [cache_folder] * count, ['evaluate' in selected_stages] * count)
+    results = dict(zip(changed_folders, map_tasks(scheduler, process_test_folder, changed_folders, *arguments)))
+
+    if incremental:
+        for test_folder in changed_folders:
+            update_manifest(manifest, test_folder, content_fingerprints(fingerprints[test_folder], cache_folder), *results[test_folder])
+        for test_folder in test_folders:
+            if test_folder not in results:
+                results[test_folder] = manifest_entry(manifest, test_folder)
+
+        # Remove test folders that no longer exist
+        manifest['test_folders'] = {test_folder: manifest['test_folders'][test_folder] for test_folder in test_folders}
+
+    test_data = [results[test_folder][0] for test_folder in test_folders]
+    summaries = [results[test_folder][1] for test_folder in test_folders]
+
+    # Per-scenario tables and graphs are only created for the processed test folders
+    changed_data = [results[test_folder][0] for test_folder in changed_folders]
 
-    # List of tuples containing the following data for each test scenario:
-    #   - description:    dict
-    #   - client_results: dict
-    #   - server_results: dict
-    #   - client_timestamps: list (of dicts)
-    #   - server_timestamps: list (of dicts)
+    if 'evaluate' in selected_stages:
+        write_campaign_summary(summaries, campaign_folder)
+        write_campaign_loss_bursts(summaries, campaign_folder)
 
-    # Parse all test scenarios and store the data in the list
-    for test_folder in os.listdir(client_path):
+    if 'tables' in selected_stages and len(test_data) > 0:
+        write_test_table(test_data, name, campaign_folder, scheduler)
+        write_query_table(changed_data, campaign_folder, scheduler)
+
+    if 'graphs' in selected_stages and len(test_data) > 0:
+        create_campaign_graphs(test_data, campaign_folder, scheduler)
+        create_scenario_graphs(changed_data, campaign_folder, scheduler)
+        create_datagramsize_graphs(test_data, campaign_folder, scheduler)
+
+    # The manifest is only saved once the tables and graphs of the campaign were created, a failed
+    # producer raises its error before and the test folders are processed again on the next run
+    if incremental:
+        wait_for_tasks(scheduler)
+        save_manifest(campaign_folder, manifest)
+
+    print(f'Finished eParser for campaign {name}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
+    return True
+
+
+def __list_test_folders(client_path: str) -> list:
+    # Collect all valid test folders (contain test_description.xml and test_results.xml)
+    test_folders = list()
+    for test_folder in sorted(list_folder(client_path)):
         test_folder_client = os.path.join(client_path, test_folder)
-        if not os.path.isdir(test_folder_client):
+        if not is_folder(test_folder_client):
             continue
-
-        # Check if test folder is valid (contains test_description.xml and test_results.xml)
         if not validate_test_folder(test_folder_client):
             continue
-        print(f'Processing test scenario {test_folder}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
+        test_folders.append(test_folder)
 
-        # Check if server data exists
-        server_data = check_server_data(server_path, test_folder)
-        if server_data:
-            test_folder_server = os.path.join(server_path, test_folder)
+    return test_folders
 
-        # Parse the test description file
-        description = parse_description_file(test_folder_client)
 
-        # Parse the test results files
-        client_results = parse_result_file(test_folder_client)
-        if server_data:
-            server_results = parse_result_file(test_folder_server)
-        else:
-            server_results = None
+def __test_folder_ready(test_folder: str, client_path: str, server_path: str, sizes: dict) -> bool:
+    # A test folder is ready if the client (and the server, if it exists) test results files are
+    # complete and their sizes did not change since the previous poll
+    ready = path_exists(os.path.join(client_path, test_folder, test_description_file))
+    for folder in (client_path, server_path):
+        path = os.path.join(folder, test_folder)
+        if folder == server_path and not is_folder(path):
+            continue
 
-        # Parse the query messages
-        client_timestamps = parse_timestamp_messages(test_folder_client)
-        if server_data:
-            server_timestamps = parse_timestamp_messages(test_folder_server)
-        else:
-            server_timestamps = None
+        filename = os.path.join(path, test_results_file)
+        size = file_stat(filename)['size'] if path_exists(filename) else -1
+        previous = sizes.get(filename)
+        sizes[filename] = size
 
-        test = (description, client_results, server_results, client_timestamps, server_timestamps)
-        output_folder = os.path.join(campaign_folder, test[0]['metadata']['t_uid'])
-        evaluate_performance(test, output_folder)
+        if size != previous or not results_file_complete(path):
+            ready = False
 
-        # Delete everything
-        del description
-        del client_results
-        del server_results
-        del client_timestamps
-        del server_timestamps
-        del test
+    return ready
 
-    print(f'Finished eParser for campaign {name}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
 
+def __select_campaigns(result_folder: str, patterns: list) -> list:
+    # Archives (7z, zip, tar.zst) are read like campaign folders, an extracted folder is preferred
+    campaign_list = list()
+    for entry in sorted(os.listdir(result_folder)):
+        test_campaign = archive_name(entry) if is_archive(os.path.join(result_folder, entry)) else entry
+        if test_campaign != entry and os.path.isdir(os.path.join(result_folder, test_campaign)):
+            continue
+        if __skip_folder(test_campaign) or not __matches(test_campaign, patterns):
+            continue
+        if not is_folder(os.path.join(__campaign_folder(result_folder, test_campaign), 'client')):
+            continue
+        campaign_list.append(test_campaign)
 
+    return campaign_list
 
-# Process all campaigns in the results folder
-campaign_list = list()
-for test_campaign in os.listdir(result_folder):
-    if test_campaign.endswith('_N') or test_campaign.startswith('.') or test_campaign.endswith('.7z'):
-        continue
 
-    print(f'Process campaign {test_campaign}? (y/n)')
-    answer = input().lower()
+def __campaign_folder(result_folder: str, test_campaign: str) -> str:
+    # Folder of the campaign or the folder in its archive that contains the client and server folders
+    path = os.path.join(result_folder, test_campaign)
+    if os.path.isdir(path):
+        return path
 
-    if 'y' in answer:
-        campaign_list.append(test_campaign)
-    if 'a' in answer:
-        break
+    for extension in archive_extensions:
+        if is_archive(path + extension):
+            return campaign_root(path + extension)
 
-for test_campaign in campaign_list:
-    test_campaign_client = os.path.join(result_folder, test_campaign, 'client')
-    test_campaign_server = os.path.join(result_folder, test_campaign, 'server')
-    test_campaign_output = os.path.join(output_folder, test_campaign)
+    return path
 
-    for test_scenario in os.listdir(test_campaign_client):
-        if test_scenario.endswith('_N') or test_scenario.startswith('.') or test_scenario.endswith('.7z'):
-            continue
 
-        test_scenario_client = os.path.join(test_campaign_client, test_scenario)
-        test_scenario_server = os.path.join(test_campaign_server, test_scenario)
+def __select_scenarios(result_folder: str, campaign_list: list, patterns: list) -> list:
+    selection = list()
+    for test_campaign in campaign_list:
+        test_campaign_client = os.path.join(__campaign_folder(result_folder, test_campaign), 'client')
+        for test_scenario in sorted(list_folder(test_campaign_client)):
+            if __skip_folder(test_scenario) or not __matches(test_scenario, patterns):
+                continue
+            if not is_folder(os.path.join(test_campaign_client, test_scenario)):
+                continue
+            selection.append((test_campaign, test_scenario))
+
+    return selection
+
+
+def __skip_folder(name: str) -> bool:
+    return name.endswith('_N') or name.startswith('.') or name.lower().endswith(archive_extensions)
+
+
+def __matches(name: str, patterns: list) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def __commit_hash() -> str:
+    # Short hash of the current commit (only used for the name of the output folder)
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short=7', 'HEAD'], cwd=parent_folder, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def __parse_arguments() -> argparse.Namespace:
+    default_stages = ['parse', 'evaluate']
+    if tables['generate']:
+        default_stages.append('tables')
+    if diagrams['generate']:
+        default_stages.append('graphs')
+
+    parser = argparse.ArgumentParser(description='Parses and evaluates the performance test results.')
+    parser.add_argument('-c', '--campaign', action='append', metavar='GLOB', help='campaigns to process (glob, can be repeated, default: all)')
+    parser.add_argument('-s', '--scenario', action='append', metavar='GLOB', help='test scenarios to process (glob, can be repeated, default: all)')
+    parser.add_argument('-r', '--results', default=os.path.join(parent_folder, results_folder), help='folder containing the campaigns (folders or 7z, zip, tar.zst archives)')
+    parser.add_argument('-o', '--output', default=None, help='output folder (default: new folder per execution, "incremental" in incremental mode)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (0 = automatic)')
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=cache['enabled'], help='use the cache for parsed test folders')
+    parser.add_argument('--stages', default=','.join(default_stages), help=f'comma separated stages to run ({",".join(stages)})')
+    parser.add_argument('--incremental', action='store_true', help='only process test scenarios whose inputs or settings changed since the last run')
+    parser.add_argument('-f', '--follow', action='store_true', help='watch the results folder and process test scenarios as soon as they are complete (implies --incremental)')
+    parser.add_argument('--interval', type=float, default=5.0, help='polling interval in follow mode (seconds)')
+    parser.add_argument('--idle-timeout', type=float, default=0.0, help='stop following after this many seconds without new test scenarios (0 = never)')
+    parser.add_argument('--profile', action='store_true', help='record duration, peak memory, records and bytes read per stage (profile.json/profile.csv)')
+    parser.add_argument('--profile-memory', action='store_true', help='trace Python allocations with tracemalloc (implies --profile, slow)')
+    parser.add_argument('--profile-summary', action='store_true', help='print a summary table of the profile at the end (implies --profile)')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only list the selected campaigns and test scenarios')
+    parser.add_argument('-i', '--interactive', action='store_true', help='ask for each campaign whether it should be processed')
+    args = parser.parse_args()
+
+    # Every other stage needs the parsed data
+    selected_stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown_stages = [stage for stage in selected_stages if stage not in stages]
+    if unknown_stages:
+        parser.error(f'unknown stage(s): {", ".join(unknown_stages)}')
+    args.stages = [stage for stage in stages if stage in selected_stages or stage == 'parse']
+
+    if args.follow:
+        args.incremental = True
+    if args.profile_memory or args.profile_summary:
+        args.profile = True
+
+    args.campaign = args.campaign or ['*']
+    args.scenario = args.scenario or ['*']
+
+    return args
+
+
+
+if __name__ == '__main__':
+    args = __parse_arguments()
+
+    # Results folder for the current execution
+    result_folder = args.results
+    if not os.path.exists(result_folder):
+        print(f'Error: Results folder {result_folder} does not exist!')
+        sys.exit(1)
+
+    # Select the campaigns and test scenarios
+    campaign_list = __select_campaigns(result_folder, args.campaign)
+    if args.interactive:
+        selected_campaigns = list()
+        for test_campaign in campaign_list:
+            print(f'Process campaign {test_campaign}? (y/n)')
+            answer = input().lower()
+
+            if 'y' in answer:
+                selected_campaigns.append(test_campaign)
+            if 'a' in answer:
+                break
+        campaign_list = selected_campaigns
+
+    selection = __select_scenarios(result_folder, campaign_list, args.scenario)
+
+    if args.dry_run:
+        print(f'Stages: {", ".join(args.stages)}')
+        for test_campaign, test_scenario in selection:
+            test_folders = __list_test_folders(os.path.join(__campaign_folder(result_folder, test_campaign), 'client', test_scenario))
+            print(f'{test_campaign}/{test_scenario}: {len(test_folders)} test folder(s)')
+            for test_folder in test_folders:
+                print(f'    {test_folder}')
+        remove_extracted_archives()
+        sys.exit(0)
+
+    # Output folder for the current execution
+    if args.output is not None:
+        output_folder = args.output
+    elif args.incremental:
+        output_folder = os.path.join(parent_folder, output_folder, 'incremental')
+    else:
+        timestamp     = datetime.now().strftime('%y%m%d_%H%M%S')
+        operating_sys = os_name()
+        output_folder = os.path.join(parent_folder, output_folder, f'{timestamp}_{__commit_hash()}_{operating_sys}')
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    # Cache folder for the parsed test folders
+    cache_folder = os.path.join(parent_folder, cache_folder) if args.cache else None
+
+    configure_profiling(args.profile, args.profile_memory)
+
+    scheduler = create_scheduler(args.jobs)
+    try:
+        if not args.follow:
+            for test_campaign, test_scenario in selection:
+                test_scenario_client = os.path.join(__campaign_folder(result_folder, test_campaign), 'client', test_scenario)
+                test_scenario_server = os.path.join(__campaign_folder(result_folder, test_campaign), 'server', test_scenario)
+                test_campaign_output = os.path.join(output_folder, test_campaign)
+
+                __parse_campaign(test_scenario, test_scenario_client, test_scenario_server, test_campaign_output, cache_folder, args.stages, scheduler, args.incremental)
+
+        # Follow mode: poll the results folder and process every test folder as soon as it is complete
+        else:
+            print(f'Following {result_folder} (every {args.interval} s, stop with Ctrl+C)...')
+            sizes = dict()
+            last_change = time.monotonic()
+            while True:
+                # New campaigns and test scenarios are picked up as well (except in interactive mode)
+                if not args.interactive:
+                    campaign_list = __select_campaigns(result_folder, args.campaign)
+                selection = __select_scenarios(result_folder, campaign_list, args.scenario)
+
+                for test_campaign, test_scenario in selection:
+                    test_scenario_client = os.path.join(__campaign_folder(result_folder, test_campaign), 'client', test_scenario)
+                    test_scenario_server = os.path.join(__campaign_folder(result_folder, test_campaign), 'server', test_scenario)
+                    test_campaign_output = os.path.join(output_folder, test_campaign)
+
+                    if __parse_campaign(test_scenario, test_scenario_client, test_scenario_server, test_campaign_output, cache_folder, args.stages, scheduler, True, sizes):
+                        last_change = time.monotonic()
+
+                if args.idle_timeout > 0 and time.monotonic() - last_change > args.idle_timeout:
+                    print(f'No new test scenarios for {args.idle_timeout} s, stopping.')
+                    break
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print('Stopped.')
+    finally:
+        try:
+            close_scheduler(scheduler)
+        finally:
+            remove_extracted_archives()
 
-        __parse_campaign(test_scenario, test_scenario_client, test_scenario_server, test_campaign_output)
\ No newline at end of file
+        if args.profile:
+            write_profile(output_folder)
+            if args.profile_summary:
+                print_profile_summary()
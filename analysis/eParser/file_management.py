@@ -1,5 +1,7 @@
 import os
+import hashlib
 from constants import test_description_file, test_results_file
+from archive import split_path, path_exists, list_folder, file_stat, open_file
 
 def validate_test_folder(path: str) -> bool:
     '''
@@ -12,9 +14,34 @@ def validate_test_folder(path: str) -> bool:
                     result (bool): True if the folder contains the test description and test result
                                    files, False otherwise
     '''
-    files_in_path = os.listdir(path)
+    files_in_path = list_folder(path)
     return test_results_file in files_in_path
 
+def results_file_complete(path: str) -> bool:
+    '''
+    Checks if the test results file in the given test folder is completely written, i.e. if it
+    ends with the closing </test_results> tag. Only the end of the file is read. Files in an
+    archive are always complete.
+
+            Parameters:
+                    path (str): Path to the test scenario folder
+
+            Returns:
+                    result (bool): True if the test results file is complete, False otherwise
+    '''
+    filename = os.path.join(path, test_results_file)
+    if not path_exists(filename):
+        return False
+    if split_path(filename)[0] is not None:
+        return True
+
+    with open(filename, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 256))
+        tail = file.read().rstrip()
+
+    return tail.endswith(b'</test_results>')
+
 def check_server_data(server_folder: str, test_folder: str) -> bool:
     '''
     Checks if server data exists for the given test scenario and that the test folder is valid.
@@ -28,8 +55,60 @@ def check_server_data(server_folder: str, test_folder: str) -> bool:
                                    False otherwise
     '''
     test_folder_server = os.path.join(server_folder, test_folder)
-    if not os.path.exists(test_folder_server):
+    if not path_exists(test_folder_server):
         return False
 
     return validate_test_folder(test_folder_server)
-    
\ No newline at end of file
+    
+
+
+def file_fingerprint(path: str, content_hash: bool = True) -> dict:
+    '''
+    Returns the fingerprint of the given file. The dictionary contains the following keys: 'size',
+    'mtime' (modification time in nanoseconds) and 'sha256' (content hash, None if not requested).
+    For a file in an archive, the modification time of the archive is used.
+
+            Parameters:
+                    path (str): Path to the file
+                    content_hash (bool): Calculate the content hash (optional, reads the whole file)
+
+            Returns:
+                    fingerprint (dict): Dictionary containing the fingerprint
+    '''
+    stat = file_stat(path)
+    fingerprint = {'size': stat['size'], 'mtime': stat['mtime'], 'sha256': None}
+
+    if content_hash:
+        digest = hashlib.sha256()
+        with open_file(path) as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+
+    return fingerprint
+
+
+def fingerprint_matches(path: str, fingerprint: dict) -> bool:
+    '''
+    Checks if the given file still matches the fingerprint. Size and modification time are compared
+    first; if only the modification time differs, the content hash decides.
+
+            Parameters:
+                    path (str): Path to the file
+                    fingerprint (dict): Fingerprint (see file_fingerprint)
+
+            Returns:
+                    result (bool): True if the file is unchanged, False otherwise
+    '''
+    if not path_exists(path):
+        return False
+
+    current = file_fingerprint(path, content_hash=False)
+    if current['size'] != fingerprint['size']:
+        return False
+    if current['mtime'] == fingerprint['mtime']:
+        return True
+    if fingerprint['sha256'] is None:
+        return False
+
+    return file_fingerprint(path)['sha256'] == fingerprint['sha256']
@@ -1,87 +1,100 @@
 import os
-from multiprocessing import Process
-from constants import concurrent_execution
-from graphs_campaign import _prepare_and_create_campaign_graphs
-from graphs_scenario import _prepare_and_create_scenario_graphs
-from graphs_datagramsize import _prepare_and_create_datagramsize_graphs
+from scheduler import submit_task
 
+# The graphs_* modules are imported in the functions, matplotlib and seaborn are slow to load and
+# only needed if graphs are created
 
-def create_campaign_graphs(test_data: list, campaign_folder: str, processes: list = None) -> None:
+
+def create_campaign_graphs(test_data: list, campaign_folder: str, scheduler: dict = None) -> None:
     '''
     Creates the graphs for the campaign. This includes:
         - Packet loss per datagram size
         - Packet loss per cycle time
 
+    Test scenarios without known losses are left out.
+
             Parameters:
                     test_data (list): List of parsed test scenarios
                     campaign_folder (str): Path to the folder where the table should be saved
-                    processes (list): List of processes (optional, used for concurrent execution)
+                    scheduler (dict): Task scheduler (optional, used for concurrent execution)
 
             Returns:
                     None
     '''
+    from graphs_campaign import _prepare_and_create_campaign_graphs
+
+    test_data = __scenarios_with_losses(test_data, 'campaign')
+    if len(test_data) == 0:
+        return
+
     campaign_path = os.path.join(campaign_folder, "campaign")
     if not os.path.exists(campaign_path):
         os.makedirs(campaign_path)
 
-    if concurrent_execution():
-        process = Process(target=_prepare_and_create_campaign_graphs, args=(test_data, campaign_path))
-        process.start()
-        processes.append(process)
-    else:
-        _prepare_and_create_campaign_graphs(test_data, campaign_path)
+    submit_task(scheduler, _prepare_and_create_campaign_graphs, test_data, campaign_path)
 
 
-def create_scenario_graphs(test_data: list, campaign_folder: str, processes: list = None) -> None:
+def create_scenario_graphs(test_data: list, campaign_folder: str, scheduler: dict = None) -> None:
     '''
     Creates the graphs for each test scenario. This includes:
         - Histogram of packet losses
         - Packet losses over time
         - Sent and received packets over time
         - Packets per second over time / Packets per query over time
+        - Latency (mean, percentile, maximum) and packet losses per time window
 
-    Note that the diagrams are only created if the test scenario contains query messages. Otherwise
-    the diagrams are skipped.
+    Note that the first four diagrams are only created if the test scenario contains query messages
+    and the last one only if the latency windows of the scenario were evaluated (latency_windows.npz
+    in the output folder of the scenario). Otherwise the diagrams are skipped.
 
             Parameters:
                     test_data (list): List of parsed test scenarios
                     campaign_folder (str): Path to the folder where the table should be saved
-                    processes (list): List of processes (optional, used for concurrent execution)
+                    scheduler (dict): Task scheduler (optional, used for concurrent execution)
 
             Returns:
                     None
     '''
+    from graphs_scenario import _prepare_and_create_scenario_graphs
+
     scenario_path = os.path.join(campaign_folder, "scenario")
     if not os.path.exists(scenario_path):
         os.makedirs(scenario_path)
 
     for test_scenario in test_data:
-        if (test_scenario[3] is not None) and (test_scenario[3] != []):
+        windows_file = os.path.join(campaign_folder, test_scenario[0]['metadata']['t_uid'], 'latency_windows.npz')
+        if not os.path.exists(windows_file):
+            windows_file = None
+
+        if ((test_scenario[3] is not None) and (test_scenario[3]['losses'].size > 0) and ('losses' in test_scenario[1]['report'])) or windows_file is not None:
             scenario_subpath = os.path.join(scenario_path, f"{test_scenario[0]['metadata']['t_uid']} (C {test_scenario[0]['connection']['client_ip']}) (S {test_scenario[0]['connection']['server_ip']})")
             if not os.path.exists(scenario_subpath):
                 os.makedirs(scenario_subpath)
 
-            if concurrent_execution():
-                process = Process(target=_prepare_and_create_scenario_graphs, args=(test_scenario, scenario_subpath))
-                process.start()
-                processes.append(process)
-            else:
-                _prepare_and_create_scenario_graphs(test_scenario, scenario_subpath)
+            submit_task(scheduler, _prepare_and_create_scenario_graphs, test_scenario, scenario_subpath, windows_file)
 
 
-def create_datagramsize_graphs(test_data: list, campaign_folder: str, processes: list = None) -> None:
+def create_datagramsize_graphs(test_data: list, campaign_folder: str, scheduler: dict = None) -> None:
     '''
     Creates the graphs for the different datagram sizes. This includes:
         - Packet loss per cycle time
 
+    Test scenarios without known losses are left out.
+
             Parameters:
                     test_data (list): List of parsed test scenarios
                     campaign_folder (str): Path to the folder where the table should be saved
-                    processes (list): List of processes (optional, used for concurrent execution)
+                    scheduler (dict): Task scheduler (optional, used for concurrent execution)
 
             Returns:
                     None
     '''
+    from graphs_datagramsize import _prepare_and_create_datagramsize_graphs
+
+    test_data = __scenarios_with_losses(test_data, 'datagram size')
+    if len(test_data) == 0:
+        return
+
     datagramsizes = list(set(test_scenario[0]['connection']['datagram_size'] for test_scenario in test_data))
     datagramsize_path = os.path.join(campaign_folder, "datagram")
     if not os.path.exists(datagramsize_path):
@@ -89,9 +102,14 @@ def create_datagramsize_graphs(test_data: list, campaign_folder: str, processes:
     
     for datagramsize in datagramsizes:
 
-        if concurrent_execution():
-            process = Process(target=_prepare_and_create_datagramsize_graphs, args=(test_data, datagramsize, datagramsize_path))
-            process.start()
-            processes.append(process)
-        else:
-            _prepare_and_create_datagramsize_graphs(test_data, datagramsize, datagramsize_path)
\ No newline at end of file
+        submit_task(scheduler, _prepare_and_create_datagramsize_graphs, test_data, datagramsize, datagramsize_path)
+
+
+def __scenarios_with_losses(test_data: list, graphs: str) -> list:
+    # The loss graphs need the losses of every test scenario (test results or timestamps, see
+    # processing.process_test_folder), test scenarios without them are left out
+    unknown = [test_scenario[0]['metadata']['t_uid'] for test_scenario in test_data if 'losses' not in test_scenario[1]['report']]
+    if len(unknown) > 0:
+        print(f"Error: Losses of test scenario(s) {', '.join(unknown)} are unknown, they are left out of the {graphs} graphs!")
+
+    return [test_scenario for test_scenario in test_data if 'losses' in test_scenario[1]['report']]
@@ -5,6 +5,7 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator, FuncFormatter
 from constants import diagrams
+from profiling import profile_stage
 
 
 #                                  _                                     _
@@ -18,9 +19,14 @@ from constants import diagrams
 
 
 def _prepare_and_create_campaign_graphs(test_data: list, campaign_folder: str) -> None:
-    __plot_campaign_diagr1(test_data, campaign_folder)
-    __plot_campaign_diagr2(test_data, campaign_folder)
-    __plot_campaign_diagr3(test_data, campaign_folder)
+    campaign_name = os.path.basename(os.path.dirname(campaign_folder))
+
+    with profile_stage('graphs', campaign_name, 'campaign-diagr1'):
+        __plot_campaign_diagr1(test_data, campaign_folder)
+    with profile_stage('graphs', campaign_name, 'campaign-diagr2'):
+        __plot_campaign_diagr2(test_data, campaign_folder)
+    with profile_stage('graphs', campaign_name, 'campaign-diagr3'):
+        __plot_campaign_diagr3(test_data, campaign_folder)
 
 
 def __plot_campaign_diagr1(test_data: list, output_path: str) -> None:
@@ -5,6 +5,7 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator, FuncFormatter
 from constants import diagrams
+from profiling import profile_stage
 
 
 #      _       _                                      _                                 _
@@ -20,7 +21,8 @@ from constants import diagrams
 def _prepare_and_create_datagramsize_graphs(test_data: list, datagramsize: int, output_path: str) -> None:
     datagramsize_data = [test_scenario for test_scenario in test_data if test_scenario[0]['connection']['datagram_size'] == datagramsize]
 
-    __plot_datagramsize_diagr1(datagramsize_data, datagramsize, output_path)
+    with profile_stage('graphs', str(datagramsize), 'datagramsize-diagr1'):
+        __plot_datagramsize_diagr1(datagramsize_data, datagramsize, output_path)
 
 
 def __plot_datagramsize_diagr1(test_data: list, datagramsize: int, output_path: str) -> None:
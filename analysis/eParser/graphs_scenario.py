@@ -1,10 +1,13 @@
 import os
 import math
+import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
-from constants import diagrams
+from constants import diagrams, evaluation
+from profiling import profile_stage
 from data_format import format_query
+from performance_evaluation import load_latency_windows, window_name, percentile_tag
 
 
 #                                _                               _
@@ -17,14 +20,25 @@ from data_format import format_query
 #                                          |___/          |_|
 
 
-def _prepare_and_create_scenario_graphs(test_scenario: tuple, output_path: str) -> None:
-    query = format_query(test_scenario[3].copy(), test_scenario[1]['report']['duration'], test_scenario[1]['report']['losses'], test_scenario[1]['report']['total'])
-    current_scenario = (test_scenario[0], test_scenario[1], test_scenario[2], query)
+def _prepare_and_create_scenario_graphs(test_scenario: tuple, output_path: str, windows_file: str = None) -> None:
+    t_uid = test_scenario[0]['metadata']['t_uid']
 
-    __plot_scenario_diagr1(current_scenario, output_path)
-    __plot_scenario_diagr2(current_scenario, output_path)
-    __plot_scenario_diagr3(current_scenario, output_path)
-    __plot_scenario_diagr4(current_scenario, output_path)
+    if (test_scenario[3] is not None) and (test_scenario[3]['losses'].size > 0) and ('losses' in test_scenario[1]['report']):
+        query = format_query(test_scenario[3], test_scenario[1]['report']['duration'], test_scenario[1]['report']['losses'], test_scenario[1]['report']['total'])
+        current_scenario = (test_scenario[0], test_scenario[1], test_scenario[2], query)
+
+        with profile_stage('graphs', t_uid, 'scenario-diagr1'):
+            __plot_scenario_diagr1(current_scenario, output_path)
+        with profile_stage('graphs', t_uid, 'scenario-diagr2'):
+            __plot_scenario_diagr2(current_scenario, output_path)
+        with profile_stage('graphs', t_uid, 'scenario-diagr3'):
+            __plot_scenario_diagr3(current_scenario, output_path)
+        with profile_stage('graphs', t_uid, 'scenario-diagr4'):
+            __plot_scenario_diagr4(current_scenario, output_path)
+
+    if windows_file is not None:
+        with profile_stage('graphs', t_uid, 'scenario-diagr5'):
+            __plot_scenario_diagr5(test_scenario, windows_file, output_path)
 
 
 def __plot_scenario_diagr1(test_scenario: tuple, output_path: str) -> None:
@@ -47,18 +61,18 @@ def __plot_scenario_diagr1(test_scenario: tuple, output_path: str) -> None:
     query = test_scenario[3]
 
     # Get the data for the histogram
-    differences_list = [report['difference'] for report in query]
+    differences_list = query['difference']
 
     # Create the histogram
     # Creating the histogram
     _, ax = plt.subplots(figsize=(12, 5))
-    ax.hist(differences_list, bins=range(0, max(differences_list) + 2), align='left', color=diagrams['colors']['datagramsize'].get(test_scenario[0]['connection']['datagram_size'], 'red'), edgecolor='black', alpha=0.7)
+    ax.hist(differences_list, bins=range(0, int(differences_list.max()) + 2), align='left', color=diagrams['colors']['datagramsize'].get(test_scenario[0]['connection']['datagram_size'], 'red'), edgecolor='black', alpha=0.7)
 
     # Labels, title, and other configurations
     ax.set_xlabel('Packet Losses per 100000 Packets (Number of Packets)')
     ax.set_ylabel('Frequency')
     ax.set_title('Frequency Analysis of Packet Losses')
-    ax.set_xticks(range(0, max(differences_list) + 10, 10))
+    ax.set_xticks(range(0, int(differences_list.max()) + 10, 10))
     plt.tight_layout()
 
     # Save the diagram
@@ -81,14 +95,13 @@ def __plot_scenario_diagr2(test_scenario: tuple, output_path: str) -> None:
     plt.rc('text', usetex=False)
     plt.rc('font', family='serif')
 
-    # Fetch the data for the visualization
-    query = test_scenario[3].copy()
-    query.insert(0, {'timestamp': 0, 'total': 0, 'losses': 0, 'difference': 0})
+    # Fetch the data for the visualization (starting at zero)
+    query = {key: np.insert(values, 0, 0) for key, values in test_scenario[3].items()}
 
     # Get the data for the diagram
-    timestamps = [report['timestamp'] for report in query]
-    totals = [report['total'] for report in query]
-    received = [(report['total'] - report["losses"]) for report in query]
+    timestamps = query['timestamp']
+    totals = query['total']
+    received = query['total'] - query['losses']
 
     # Create the diagram
     _, ax = plt.subplots(figsize=(12, 5))
@@ -99,7 +112,7 @@ def __plot_scenario_diagr2(test_scenario: tuple, output_path: str) -> None:
     ax.set_title('Temporal Distribution of Sent and Received UDP Packets')
     ax.legend(loc='upper right', frameon=True)
 
-    max_value = max(totals)
+    max_value = totals.max()
     plt.ylim(0, math.ceil(max_value / 0.78))
 
     def seconds_formatter(x, _):
@@ -132,13 +145,12 @@ def __plot_scenario_diagr3(test_scenario: tuple, output_path: str) -> None:
     plt.rc('text', usetex=False)
     plt.rc('font', family='serif')
 
-    # Fetch the data for the visualization
-    query = test_scenario[3].copy()
-    query.insert(0, {'timestamp': 0, 'total': 0, 'losses': 0, 'difference': 0})
+    # Fetch the data for the visualization (starting at zero)
+    query = {key: np.insert(values, 0, 0) for key, values in test_scenario[3].items()}
 
     # Get the data for the diagram
-    timestamps = [report['timestamp'] for report in query]
-    difference = [report['difference'] for report in query]
+    timestamps = query['timestamp']
+    difference = query['difference']
 
     # Create the diagram
     _, ax = plt.subplots(figsize=(12, 5))
@@ -178,23 +190,17 @@ def __plot_scenario_diagr4(test_scenario: tuple, output_path: str) -> None:
     query = test_scenario[3]
 
     # Get the data for the diagram
-    timestamps = [report['timestamp'] for report in query]
-    package_per_second = {'sent': list(), 'received': list()}
-
-    for idx, report in enumerate(query):
-        current_timestamp = report['timestamp']
-        previous_timestamp = 0 if idx == 0 else query[idx-1]['timestamp']
-        diff_timestamp = current_timestamp - previous_timestamp
+    timestamps = query['timestamp']
+    diff_timestamp = np.diff(query['timestamp'], prepend=0)
+    diff_sent = np.diff(query['total'], prepend=0)
+    diff_received = np.diff(query['total'] - query['losses'], prepend=0)
 
-        diff_sent = report['total'] - (0 if idx == 0 else query[idx-1]['total'])
-        diff_received = (report['total'] - report['losses']) - (0 if idx == 0 else (query[idx-1]['total'] - query[idx-1]['losses']))
-
-        if draw_packages_per_second:
-            package_per_second['sent'].append(diff_sent / diff_timestamp)
-            package_per_second['received'].append(diff_received / diff_timestamp)
-        else:
-            package_per_second['sent'].append(diff_sent)
-            package_per_second['received'].append(diff_received)
+    # Query messages with the same timestamp (e.g. the last one at the end of the test) have no
+    # interval, their rate is left at zero
+    if draw_packages_per_second:
+        package_per_second = {key: np.divide(diff, diff_timestamp, out=np.zeros(diff.shape), where=diff_timestamp > 0) for key, diff in (('sent', diff_sent), ('received', diff_received))}
+    else:
+        package_per_second = {'sent': diff_sent, 'received': diff_received}
 
     # Create the diagram
     _, ax = plt.subplots(figsize=(12, 5))
@@ -211,8 +217,8 @@ def __plot_scenario_diagr4(test_scenario: tuple, output_path: str) -> None:
     ax.set_xlabel('Time')
     ax.legend(loc='upper right', frameon=True)
 
-    max_value = max(package_per_second['sent'])
-    min_value = min(package_per_second['received'])
+    max_value = package_per_second['sent'].max()
+    min_value = package_per_second['received'].min()
     plt.ylim(min_value - 20, max_value + 20)
 
     def seconds_formatter(x, _):
@@ -230,3 +236,61 @@ def __plot_scenario_diagr4(test_scenario: tuple, output_path: str) -> None:
         plt.savefig(os.path.join(output_path, f'{diagram_name}.png'), dpi=300)
 
     plt.close()
+
+
+def __plot_scenario_diagr5(test_scenario: tuple, windows_file: str, output_path: str) -> None:
+    diagram_name = 'scenario-diagr5__latency_over_time'
+
+    # Fetch the data for the visualization (latency windows written by the evaluation)
+    size = diagrams['latency_window']
+    windows = load_latency_windows(windows_file, size)
+    if windows is None or windows['count'].size == 0:
+        # If the window size was not evaluated, we stop here.
+        return
+
+    # Set the style
+    sns.set_style("whitegrid")
+    sns.set_context("paper", font_scale=1, rc={"lines.linewidth": 2})
+    plt.rc('text', usetex=False)
+    plt.rc('font', family='serif')
+
+    # Get the data for the diagram (latencies in milliseconds, drawn at the centre of the windows)
+    timestamps = windows['start']
+    centres = timestamps + size / 2000000000
+    percentile = percentile_tag(evaluation['windows']['percentile'])
+
+    # Create the diagram
+    _, ax = plt.subplots(figsize=(12, 5))
+    ax.plot(centres, windows['max'] / 1000000, color='lightgray', linewidth=1, label='Maximum')
+    ax.plot(centres, windows[percentile] / 1000000, color='steelblue', linewidth=1, label=percentile.replace('_', '.').upper())
+    ax.plot(centres, windows['mean'] / 1000000, color='black', linewidth=1, label='Mean')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Latency (ms)')
+    ax.set_title(f'Latency and Packet Losses per {window_name(size)} Window')
+
+    # Packet losses on the second axis
+    ax_losses = ax.twinx()
+    ax_losses.bar(timestamps, windows['lost'], width=size / 1000000000, align='edge', color='red', alpha=0.5, label='Lost Packets')
+    ax_losses.set_ylabel('Lost Packets')
+    ax_losses.set_ylim(0, max(int(windows['lost'].max()), 1) / 0.78)
+    ax_losses.grid(False)
+
+    lines, labels = ax.get_legend_handles_labels()
+    lines_losses, labels_losses = ax_losses.get_legend_handles_labels()
+    ax.legend(lines + lines_losses, labels + labels_losses, loc='upper right', frameon=True)
+
+    def seconds_formatter(x, _):
+        return f"{x:g} s"
+    plt.gca().xaxis.set_major_formatter(FuncFormatter(seconds_formatter))
+
+    plt.tight_layout()
+
+    # Save the diagram
+    if diagrams['output']['pdf']:
+        plt.savefig(os.path.join(output_path, f'{diagram_name}.pdf'))
+    if diagrams['output']['latex']:
+        plt.savefig(os.path.join(output_path, f'{diagram_name}.pgf'))
+    if diagrams['output']['png']:
+        plt.savefig(os.path.join(output_path, f'{diagram_name}.png'), dpi=300)
+
+    plt.close()
@@ -0,0 +1,213 @@
+import os
+import json
+from constants import test_description_file, test_results_file, parsing, evaluation, tables, diagrams
+from file_management import file_fingerprint, fingerprint_matches
+from archive import path_exists
+from cache import cached_fingerprints
+
+# Version of the analysis, increase it whenever the output of the evaluation changes
+analysis_version = 9
+
+manifest_file = 'manifest.json'
+
+
+def analysis_settings(stages: list) -> dict:
+    '''
+    Returns the settings that influence the output of a campaign (analysis version, stages, the
+    downsampling of the query messages and the evaluation, table and diagram options). The settings
+    are returned in their JSON form, so they can be compared with the settings stored in a manifest.
+
+            Parameters:
+                    stages (list): Stages of the pipeline that are executed
+
+            Returns:
+                    settings (dict): Dictionary containing the settings
+    '''
+    settings = {
+        'version': analysis_version,
+        'stages': list(stages),
+        'query': {'stride': parsing['query_stride'], 'max_reports': parsing['max_reports']},
+        'evaluation': evaluation,
+        'tables': tables,
+        'diagrams': diagrams,
+    }
+
+    return json.loads(json.dumps(settings))
+
+
+def load_manifest(campaign_folder: str, settings: dict) -> dict:
+    '''
+    Loads the manifest of a campaign output folder. The manifest contains the fingerprints of the
+    input files of each test folder together with its parsed scenario (without the query messages)
+    and its summary. An empty manifest is returned if there is none or if it was written with
+    different settings, so every test folder is processed again.
+
+            Parameters:
+                    campaign_folder (str): Path to the output folder of the campaign
+                    settings (dict): Current settings (see analysis_settings)
+
+            Returns:
+                    manifest (dict): Dictionary containing the settings and the test folders
+    '''
+    manifest = {'settings': settings, 'test_folders': dict()}
+
+    filename = os.path.join(campaign_folder, manifest_file)
+    if not os.path.exists(filename):
+        return manifest
+
+    try:
+        with open(filename, 'r', encoding='utf-8') as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        return manifest
+
+    if stored.get('settings') != settings:
+        return manifest
+
+    manifest['test_folders'] = stored.get('test_folders', dict())
+    return manifest
+
+
+def save_manifest(campaign_folder: str, manifest: dict) -> None:
+    '''
+    Saves the manifest of a campaign output folder. The file is written to a temporary file first
+    and then renamed, so an interrupted run never leaves a partial manifest.
+
+            Parameters:
+                    campaign_folder (str): Path to the output folder of the campaign
+                    manifest (dict): Manifest (see load_manifest)
+
+            Returns:
+                    None
+    '''
+    filename = os.path.join(campaign_folder, manifest_file)
+    temporary_file = f'{filename}.{os.getpid()}.tmp'
+    with open(temporary_file, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1, default=__json_value)
+    os.replace(temporary_file, filename)
+
+
+def test_folder_inputs(test_folder: str, client_path: str, server_path: str) -> list:
+    '''
+    Returns the paths of the input files of a test folder (client and, if present, server test
+    description and test results files).
+
+            Parameters:
+                    test_folder (str): Name of the test folder
+                    client_path (str): Path to the folder containing the client test folders
+                    server_path (str): Path to the folder containing the server test folders
+
+            Returns:
+                    inputs (list): List of paths of the existing input files
+    '''
+    inputs = list()
+    for folder in (client_path, server_path):
+        for filename in (test_description_file, test_results_file):
+            path = os.path.join(folder, test_folder, filename)
+            if path_exists(path):
+                inputs.append(path)
+
+    return inputs
+
+
+def test_folder_changed(manifest: dict, test_folder: str, inputs: list) -> bool:
+    '''
+    Checks if a test folder has to be processed again, i.e. if it is not in the manifest or if its
+    input files were added, removed or changed (size, modification time and content hash).
+
+            Parameters:
+                    manifest (dict): Manifest (see load_manifest)
+                    test_folder (str): Name of the test folder
+                    inputs (list): Paths of the input files (see test_folder_inputs)
+
+            Returns:
+                    result (bool): True if the test folder has to be processed, False otherwise
+    '''
+    entry = manifest['test_folders'].get(test_folder)
+    if entry is None:
+        return True
+
+    if sorted(entry['files'].keys()) != sorted(inputs):
+        return True
+
+    return not all(fingerprint_matches(path, fingerprint) for path, fingerprint in entry['files'].items())
+
+
+def update_manifest(manifest: dict, test_folder: str, files: dict, scenario: tuple, summary: dict) -> None:
+    '''
+    Stores the fingerprints of the input files, the parsed scenario (without the query messages)
+    and the summary of a processed test folder in the manifest. The fingerprints should be taken
+    before the test folder is processed, so changes during processing are detected on the next run.
+
+            Parameters:
+                    manifest (dict): Manifest (see load_manifest)
+                    test_folder (str): Name of the test folder
+                    files (dict): Fingerprints of the input files by path (see file_fingerprint)
+                    scenario (tuple): Test scenario (description, client results, server results, query)
+                    summary (dict): Dictionary containing the summary of the test folder
+
+            Returns:
+                    None
+    '''
+    manifest['test_folders'][test_folder] = {
+        'files': files,
+        'scenario': list(scenario[:3]),
+        'summary': summary,
+    }
+
+
+def content_fingerprints(files: dict, cache_folder: str = None) -> dict:
+    '''
+    Adds the content hashes to the fingerprints of the input files of a processed test folder. The
+    fingerprints are taken without the hash before the test folder is processed (size and
+    modification time, see file_fingerprint). The hash calculated by the cache while processing is
+    used if the size and modification time match, otherwise the file is read once more. Files that
+    changed during processing get no hash, so they are processed again on the next run.
+
+            Parameters:
+                    files (dict): Fingerprints of the input files by path (without content hash)
+                    cache_folder (str): Path to the cache folder (optional, None if the cache is disabled)
+
+            Returns:
+                    files (dict): Fingerprints of the input files by path
+    '''
+    cached = dict()
+    if cache_folder is not None:
+        for folder in set(os.path.dirname(path) for path in files.keys()):
+            cached.update({os.path.join(folder, filename): fingerprint for filename, fingerprint in cached_fingerprints(folder, cache_folder).items()})
+
+    fingerprints = dict()
+    for path, fingerprint in files.items():
+        fingerprints[path] = dict(fingerprint)
+        entry = cached.get(path)
+        if entry is not None and entry['size'] == fingerprint['size'] and entry['mtime'] == fingerprint['mtime']:
+            fingerprints[path]['sha256'] = entry['sha256']
+        elif path_exists(path) and file_fingerprint(path, content_hash=False) == fingerprint:
+            fingerprints[path] = file_fingerprint(path)
+
+    return fingerprints
+
+
+def manifest_entry(manifest: dict, test_folder: str) -> tuple:
+    '''
+    Returns the parsed scenario and the summary of an unchanged test folder from the manifest. The
+    query messages are not stored, so the scenario contains None instead.
+
+            Parameters:
+                    manifest (dict): Manifest (see load_manifest)
+                    test_folder (str): Name of the test folder
+
+            Returns:
+                    scenario (tuple): Test scenario (description, client results, server results, None)
+                    summary (dict): Dictionary containing the summary of the test folder
+    '''
+    entry = manifest['test_folders'][test_folder]
+    description, client_results, server_results = entry['scenario']
+    return (description, client_results, server_results, None), entry['summary']
+
+
+def __json_value(value):
+    # NumPy scalars (e.g. in the summary) are stored as Python values
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -1,6 +1,10 @@
 import xml.etree.ElementTree as ET
 import os
-from constants import test_description_file, test_results_file
+from array import array
+import numpy as np
+from constants import test_description_file, test_results_file, timestamp_stages, missing_timestamp
+from xml_backend import parse, iterparse, ScanError
+from archive import open_file
 
 def parse_result_file(path: str) -> dict:
     '''
@@ -17,80 +21,84 @@ def parse_result_file(path: str) -> dict:
                     results (dict): Dictionary containing the test results
     '''
     xml_file = os.path.join(path, test_results_file)
-    tree = ET.parse(xml_file)
+    with open_file(xml_file) as file:
+        tree = parse(file)
     root = tree.getroot()
 
     results = dict()
 
-
     # STATUS
-    status = root.find('status').text
-    results['status'] = 'SUCCESS' if status == 'STATUS_SUCCESS' else 'ERROR'
-
+    results['status'] = __parse_status(root.find('status'))
 
     # CONCULSION
-    report = dict()
-    custom_root = root.find('custom')
-    report['total'] = int(custom_root.find('num_total').text)
-    report['timer_misses'] = int(custom_root.find('num_misses').text)
+    results['report'] = __parse_report(root.find('custom'))
 
-    duration = custom_root.find('elapsed_time')
-    if duration is not None:
-        report['duration'] = float(duration.text)
-    else:
-        report['duration'] = -1   # no value present
+    # STATISTICS <ethtool_statistic>, <ip_statistic> and <netstat_statistic>
+    for statistic in ('ethtool_statistic', 'ip_statistic', 'netstat_statistic'):
+        statistic_root = root.find(statistic)
+        if statistic_root is not None:
+            results[statistic] = __parse_statistic(statistic_root)
 
-    results['report'] = report
+    return results
 
 
-    # STATISTICS <ethtool_statistic>
-    ethtool_statistic = dict()
-    ethtool_statistic_root = root.find('ethtool_statistic')
-    if ethtool_statistic_root is not None:
-        for child in ethtool_statistic_root:
-            start = int(child.find('start').text)
-            end = int(child.find('end').text)
-            ethtool_statistic[child.tag] = end - start
+def parse_query_messages(path: str, stride: int = 1, max_reports: int = 0) -> dict:
+    '''
+    Parses the query messages from the test results file and returns them as a dictionary of NumPy
+    arrays. The dictionary contains the following keys: 'losses', 'total', 'timestamp',
+    'difference'. The arrays are sorted by timestamp. The file is streamed, so the number of query
+    messages is not limited.
 
-        results['ethtool_statistic'] = ethtool_statistic
+    The query messages can be downsampled: only every stride-th report is kept. If max_reports is
+    given, the stride is doubled whenever the number of kept reports reaches max_reports, so the
+    memory usage stays bounded for arbitrarily long tests. The last report is always kept. Since the
+    losses and totals are cumulative, the downsampled series stays exact at the kept reports; the
+    difference is calculated between the kept reports.
 
+            Parameters:
+                    path (str): Path to the test results file
+                    stride (int): Keep only every stride-th report (optional)
+                    max_reports (int): Maximum number of kept reports (optional, 0 for no limit)
 
-    # STATISTICS <ip_statistic>
-    ip_statistic = dict()
-    ip_statistic_root = root.find('ip_statistic')
-    if ip_statistic_root is not None:
-        for child in root.find('ip_statistic'):
-            start = int(child.find('start').text)
-            end = int(child.find('end').text)
+            Returns:
+                    reports (dict): Dictionary containing the query messages (None if not present)
+    '''
+    xml_file = os.path.join(path, test_results_file)
 
-            if 'mtu' == child.tag:
-                ip_statistic[child.tag] = end
-            else:
-                ip_statistic[child.tag] = end - start
+    reports = None
+    elements = list()
+    with open_file(xml_file) as file:
+        for event, element in iterparse(file, records='skip'):
+            if event == 'start':
+                elements.append(element)
 
-        results['ip_statistic'] = ip_statistic
+                if len(elements) == 3 and elements[1].tag == 'custom' and element.tag == 'query':
+                    reports = __create_query_buffer(stride, max_reports)
+                continue
 
+            elements.pop()
+            if len(elements) != 3 or elements[1].tag != 'custom':
+                continue
 
-    # STATISTICS <netstat_statistic>
-    netstat_statistic = dict()
-    netstat_root = root.find('netstat_statistic')
-    if netstat_root is not None:
-        for child in netstat_root:
-            start = int(child.find('start').text)
-            end = int(child.find('end').text)
-            netstat_statistic[child.tag] = end - start
+            parent = elements[2]
+            if parent.tag == 'query' and element.tag == 'report':
+                __append_query_report(element, reports)
 
-        results['netstat_statistic'] = netstat_statistic
+            # Drop the processed elements, the parent must not collect empty children
+            parent.clear()
 
+    if reports is not None:
+        reports = __finish_query_buffer(reports)
 
-    return results
+    return reports
 
 
-def parse_query_messages(path: str) -> list:
+def parse_timestamp_messages(path: str) -> list:
     '''
-    Parses the query messages from the test results file and returns them as a list of dictionaries.
-    Each dictionary contains the following keys: 'losses', 'total', 'timestamp', 'difference'. The
-    list is sorted by timestamp.
+    Parses the timestamp messages from the test results file and returns them as a list of dictionaries.
+    Each dictionary contains the following keys: 'sequence', 'tv_sec', 'tv_nsec' (first stage of the
+    record) and the timestamp of every stage of the record in nanoseconds ('snt_prog', 'rec_sw',
+    'rec_prog'). The list is sorted by sequence.
 
             Parameters:
                     path (str): Path to the test results file
@@ -99,80 +107,181 @@ def parse_query_messages(path: str) -> list:
                     reports (list): List of dictionaries containing the query messages
     '''
     xml_file = os.path.join(path, test_results_file)
-    tree = ET.parse(xml_file)
+    with open_file(xml_file) as file:
+        tree = parse(file)
     root = tree.getroot()
-    query_root = root.find('custom').find('query')
-    if query_root is None:
+    timestamp_root = root.find('custom').find('timestamp')
+    if timestamp_root is None:
         return None
 
-    reports = list()
-    
-    count = 0
-    for report in query_root.findall('report'):
-        count += 1
-
-        if count > 20000:
-            return None
-
-    for report in query_root.findall('report'):
-        # REPORT CONTENT (Total and losses are reversed in the XML file, this is a bug in TestSuite.)
-        losses = int(report.find('total').text)
-        total = int(report.find('misses').text)
-        timestamp = report.find('timestamp')
-        if timestamp is not None:
-            timestamp = float(timestamp.text)
-        else:
-            timestamp = -1   # no value present
-
-        # DIFFERENCE
-        if reports:
-            difference = losses - reports[-1]['losses']
-        else:
-            difference = losses
+    records = list()
 
-        reports.append({
-            'losses': losses,
-            'total': total,
-            'timestamp': timestamp,
-            'difference': difference
-        })
+    for record in timestamp_root.findall('record'):
+        records.append(__parse_timestamp_record(record))
 
-    return reports
+    return records
 
 
-def parse_timestamp_messages(path: str) -> list:
+def parse_test_results(path: str, columnar: bool = False, timestamps: bool = True, stride: int = 1, max_reports: int = 0) -> tuple:
     '''
-    Parses the timestamp messages from the test results file and returns them as a list of dictionaries.
-    Each dictionary contains the following keys: 'sequence', 'tv_sec', 'tv_nsec'. The list is sorted by
-    sequence.
+    Parses the complete test results file in a single pass and returns the test results, the query
+    messages and the timestamp messages together. The results are identical to the ones of
+    parse_result_file, parse_query_messages and parse_timestamp_messages, but the file is read only
+    once and the processed query reports and timestamp records are cleared while parsing.
+
+    If columnar is set, the timestamp messages are returned as a dictionary of NumPy arrays instead
+    of a list of dictionaries. The dictionary contains the following keys: 'sequence' (int64
+    sequence numbers), 'timestamp' (int64 timestamps in nanoseconds, first stage of the record) and
+    one int64 array per stage present in the file ('snt_prog', 'rec_sw', 'rec_prog', see
+    constants.timestamp_stages; missing values are marked with constants.missing_timestamp). The
+    arrays are in file order and filled directly while parsing. If timestamps is not set, the timestamp messages are
+    skipped (e.g. if they are streamed with iterate_timestamp_messages) and None is returned.
+
+    The columnar timestamp messages are read by the byte scanner of the XML backend (see
+    xml_backend.iterparse). If the file contains records the scanner cannot read, it is parsed
+    again with the XML parser.
+
+    The query messages are downsampled like in parse_query_messages (stride and max_reports, the
+    pipeline passes constants.parsing['query_stride'] and constants.parsing['max_reports']).
 
             Parameters:
                     path (str): Path to the test results file
+                    columnar (bool): Return the timestamp messages as NumPy arrays (optional)
+                    timestamps (bool): Parse the timestamp messages (optional)
+                    stride (int): Keep only every stride-th query report (optional)
+                    max_reports (int): Maximum number of kept query reports (optional, 0 for no limit)
 
             Returns:
-                    reports (list): List of dictionaries containing the query messages
+                    results (dict): Dictionary containing the test results (see parse_result_file)
+                    reports (dict): Dictionary of arrays containing the query messages (see
+                                    parse_query_messages, None if not present)
+                    records (list/dict): List of dictionaries or dictionary of arrays containing the
+                                         timestamp messages (None if not present)
     '''
     xml_file = os.path.join(path, test_results_file)
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-    timestamp_root = root.find('custom').find('timestamp')
-    if timestamp_root is None:
-        return None
 
-    records = list()
+    # The timestamp records are read (or skipped) by the byte scanner, the dictionaries are built
+    # from the elements
+    if not timestamps:
+        scan = 'skip'
+    elif columnar:
+        scan = 'columns'
+    else:
+        scan = None
 
-    for record in timestamp_root.findall('record'):
-        sequence = record.find('sequence').text
-        tv_sec = record.find('.//tv_sec').text
-        tv_nsec = record.find('.//tv_nsec').text
+    try:
+        return __parse_test_results(xml_file, columnar, timestamps, scan, stride, max_reports)
+    except ScanError:
+        return __parse_test_results(xml_file, columnar, timestamps, None, stride, max_reports)
 
-        records.append({
-            'sequence': sequence,
-            'tv_sec': tv_sec,
-            'tv_nsec': tv_nsec
-        })
 
-    return records
+def iterate_timestamp_messages(path: str, chunk_size: int = 0, columnar: bool = False):
+    '''
+    Streams the timestamp messages from the test results file. In contrast to
+    parse_timestamp_messages, the XML tree is never built completely. Every record is cleared
+    after it has been read, so the memory usage stays constant regardless of the file size. The
+    records are yielded in file order as dictionaries with the keys 'sequence', 'tv_sec' and
+    'tv_nsec' (or as lists of these dictionaries if a chunk size is given). If columnar is set, the
+    chunks are dictionaries of NumPy arrays (see parse_test_results), read by the byte scanner of
+    the XML backend if possible.
+
+            Parameters:
+                    path (str): Path to the test results file
+                    chunk_size (int): Number of records per chunk (optional, 0 yields single records
+                                      or a single columnar chunk)
+                    columnar (bool): Yield the chunks as dictionaries of NumPy arrays (optional)
+
+            Yields:
+                    record (dict): Dictionary containing one timestamp message (chunk_size = 0)
+                    chunk (list/dict): Up to chunk_size timestamp messages (chunk_size > 0)
+    '''
+    xml_file = os.path.join(path, test_results_file)
+
+    if columnar:
+        yield from __iterate_timestamp_columns(xml_file, chunk_size)
+        return
+
+    chunk = list()
+    elements = list()
+    with open_file(xml_file) as file:
+        for event, element in iterparse(file):
+            if event == 'start':
+                elements.append(element)
+                continue
+
+            elements.pop()
+            if len(elements) != 3 or elements[1].tag != 'custom':
+                continue
+
+            # Direct child of <custom><timestamp> or <custom><query>
+            parent = elements[2]
+            if parent.tag == 'timestamp' and element.tag == 'record':
+                record = __parse_timestamp_record(element)
+
+                if chunk_size > 0:
+                    chunk.append(record)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = list()
+                else:
+                    yield record
+
+            # Drop the processed elements, the parent must not collect empty children
+            parent.clear()
+
+    if chunk:
+        yield chunk
+
+
+def __iterate_timestamp_columns(xml_file: str, chunk_size: int):
+    # If the scanner fails, the file is parsed again and the records yielded so far are skipped
+    count = 0
+    try:
+        for chunk in __scan_timestamp_columns(xml_file, chunk_size, 'columns', 0):
+            count += chunk['sequence'].size
+            yield chunk
+    except ScanError:
+        yield from __scan_timestamp_columns(xml_file, chunk_size, None, count)
+
+
+def __scan_timestamp_columns(xml_file: str, chunk_size: int, scan: str, skip: int):
+    columns = __create_timestamp_columns()
+    elements = list()
+    with open_file(xml_file) as file:
+        for event, element in iterparse(file, records=scan):
+            if event == 'records':
+                if len(elements) != 3 or elements[1].tag != 'custom':
+                    raise ScanError('Timestamp records outside of the <custom> section.')
+                __extend_timestamp_columns(columns, element)
+            elif event == 'start':
+                elements.append(element)
+                continue
+            else:
+                elements.pop()
+                if len(elements) != 3 or elements[1].tag != 'custom':
+                    continue
+
+                parent = elements[2]
+                if parent.tag == 'timestamp' and element.tag == 'record':
+                    if skip > 0:
+                        skip -= 1
+                    else:
+                        __append_timestamp_record(element, columns)
+
+                parent.clear()
+
+            # The scanner returns the records of a whole block, they are split into chunks of chunk_size
+            if chunk_size > 0 and len(columns['sequence']) >= chunk_size:
+                values = __finish_timestamp_columns(columns)
+                columns = __create_timestamp_columns()
+
+                full = values['sequence'].size - values['sequence'].size % chunk_size
+                for first in range(0, full, chunk_size):
+                    yield {key: value[first:first + chunk_size] for key, value in values.items()}
+                __extend_timestamp_columns(columns, {key: value[full:] for key, value in values.items()})
+
+    if len(columns['sequence']) > 0:
+        yield __finish_timestamp_columns(columns)
 
 
 def parse_description_file(path) -> dict:
@@ -188,7 +297,8 @@ def parse_description_file(path) -> dict:
                     results (dict): Dictionary containing the test results
     '''
     xml_file = os.path.join(path, test_description_file)
-    tree = ET.parse(xml_file)
+    with open_file(xml_file) as file:
+        tree = parse(file)
     root = tree.getroot()
 
     description = dict()
@@ -200,6 +310,9 @@ def parse_description_file(path) -> dict:
     metadata['t_uid'] = metadata_root.find('t_uid').text
     metadata['path'] = metadata_root.find('path').text
 
+    method = metadata_root.find('method')
+    metadata['method'] = method.text if method is not None else 'CUSTOM'
+
     description['metadata'] = metadata
 
 
@@ -252,3 +365,217 @@ def parse_description_file(path) -> dict:
     description['stress'] = stress
 
     return description
+
+
+def __parse_test_results(xml_file: str, columnar: bool, timestamps: bool, scan: str, stride: int, max_reports: int) -> tuple:
+    results = dict()
+    reports = None
+    records = None
+
+    elements = list()
+    with open_file(xml_file) as file:
+        for event, element in iterparse(file, records=scan):
+            if event == 'records':
+                # Timestamp records read by the scanner (see xml_backend.iterparse)
+                if len(elements) != 3 or elements[1].tag != 'custom' or records is None:
+                    raise ScanError('Timestamp records outside of the <custom> section.')
+                __extend_timestamp_columns(records, element)
+                continue
+
+            if event == 'start':
+                elements.append(element)
+
+                if len(elements) == 3 and elements[1].tag == 'custom':
+                    if element.tag == 'query':
+                        reports = __create_query_buffer(stride, max_reports)
+                    elif element.tag == 'timestamp' and timestamps:
+                        records = __create_timestamp_columns() if columnar else list()
+                continue
+
+            elements.pop()
+
+            # Top level sections
+            if len(elements) == 1:
+                if element.tag == 'status':
+                    results['status'] = __parse_status(element)
+                elif element.tag == 'custom':
+                    results['report'] = __parse_report(element)
+                elif element.tag in ('ethtool_statistic', 'ip_statistic', 'netstat_statistic'):
+                    results[element.tag] = __parse_statistic(element)
+                    element.clear()
+                continue
+
+            # Direct child of <custom><query> or <custom><timestamp>
+            if len(elements) != 3 or elements[1].tag != 'custom':
+                continue
+
+            parent = elements[2]
+            if parent.tag == 'query' and element.tag == 'report':
+                __append_query_report(element, reports)
+            elif parent.tag == 'timestamp' and element.tag == 'record' and timestamps:
+                if columnar:
+                    __append_timestamp_record(element, records)
+                else:
+                    records.append(__parse_timestamp_record(element))
+
+            # Drop the processed elements, the parent must not collect empty children
+            parent.clear()
+
+    if reports is not None:
+        reports = __finish_query_buffer(reports)
+
+    if columnar and records is not None:
+        records = __finish_timestamp_columns(records)
+
+    return results, reports, records
+
+
+def __parse_status(status_root: ET.Element) -> str:
+    return 'SUCCESS' if status_root.text == 'STATUS_SUCCESS' else 'ERROR'
+
+
+def __parse_report(custom_root: ET.Element) -> dict:
+    report = dict()
+    report['total'] = int(custom_root.find('num_total').text)
+    report['timer_misses'] = int(custom_root.find('num_misses').text)
+
+    losses = custom_root.find('num_loss')
+    if losses is not None:
+        report['losses'] = int(losses.text)
+
+    duration = custom_root.find('elapsed_time')
+    if duration is not None:
+        report['duration'] = float(duration.text)
+    else:
+        report['duration'] = -1   # no value present
+
+    return report
+
+
+def __parse_statistic(statistic_root: ET.Element) -> dict:
+    statistic = dict()
+    for child in statistic_root:
+        start = int(child.find('start').text)
+        end = int(child.find('end').text)
+
+        if 'mtu' == child.tag:
+            statistic[child.tag] = end
+        else:
+            statistic[child.tag] = end - start
+
+    return statistic
+
+
+def __create_query_buffer(stride: int, max_reports: int) -> dict:
+    return {
+        'columns': {'losses': array('q'), 'total': array('q'), 'timestamp': array('d')},
+        'stride': max(stride, 1),
+        'max_reports': max_reports,
+        'count': 0,
+        'last': None,
+        'last_kept': True,
+    }
+
+
+def __append_query_report(report: ET.Element, buffer: dict) -> None:
+    # REPORT CONTENT (Total and losses are reversed in the XML file, this is a bug in TestSuite.)
+    losses = int(report.find('total').text)
+    total = int(report.find('misses').text)
+    timestamp = report.find('timestamp')
+    if timestamp is not None:
+        timestamp = float(timestamp.text)
+    else:
+        timestamp = -1   # no value present
+
+    index = buffer['count']
+    buffer['count'] += 1
+    buffer['last'] = (losses, total, timestamp)
+    buffer['last_kept'] = index % buffer['stride'] == 0
+    if not buffer['last_kept']:
+        return
+
+    columns = buffer['columns']
+    columns['losses'].append(losses)
+    columns['total'].append(total)
+    columns['timestamp'].append(timestamp)
+
+    # Keep every second report and double the stride if the buffer is full
+    if buffer['max_reports'] > 0 and len(columns['losses']) >= buffer['max_reports']:
+        buffer['last_kept'] = (len(columns['losses']) - 1) % 2 == 0
+        for key in columns:
+            columns[key] = columns[key][::2]
+        buffer['stride'] *= 2
+
+
+def __finish_query_buffer(buffer: dict) -> dict:
+    columns = buffer['columns']
+    if not buffer['last_kept']:
+        columns['losses'].append(buffer['last'][0])
+        columns['total'].append(buffer['last'][1])
+        columns['timestamp'].append(buffer['last'][2])
+
+    reports = {
+        'losses': np.frombuffer(columns['losses'], dtype=np.int64),
+        'total': np.frombuffer(columns['total'], dtype=np.int64),
+        'timestamp': np.frombuffer(columns['timestamp'], dtype=np.float64),
+    }
+
+    # DIFFERENCE
+    reports['difference'] = np.diff(reports['losses'], prepend=0)
+
+    return reports
+
+
+def __parse_timestamp_record(record: ET.Element) -> dict:
+    message = {
+        'sequence': record.find('sequence').text,
+        'tv_sec': record.find('.//tv_sec').text,
+        'tv_nsec': record.find('.//tv_nsec').text
+    }
+
+    # Timestamps of all stages in nanoseconds
+    for stage in timestamp_stages:
+        stage_root = record.find(stage)
+        if stage_root is not None:
+            message[stage] = int(stage_root.find('tv_sec').text) * 1000000000 + int(stage_root.find('tv_nsec').text)
+
+    return message
+
+
+def __create_timestamp_columns() -> dict:
+    return {'sequence': array('q'), 'timestamp': array('q')}
+
+
+def __append_timestamp_record(record: ET.Element, columns: dict) -> None:
+    count = len(columns['sequence'])
+    columns['sequence'].append(int(record.find('sequence').text))
+    columns['timestamp'].append(int(record.find('.//tv_sec').text) * 1000000000 + int(record.find('.//tv_nsec').text))
+
+    # A column is added for every stage that is present, missing values are marked
+    for stage in timestamp_stages:
+        stage_root = record.find(stage)
+        if stage_root is None:
+            if stage in columns:
+                columns[stage].append(missing_timestamp)
+            continue
+
+        if stage not in columns:
+            columns[stage] = array('q', [missing_timestamp]) * count
+        columns[stage].append(int(stage_root.find('tv_sec').text) * 1000000000 + int(stage_root.find('tv_nsec').text))
+
+
+def __extend_timestamp_columns(columns: dict, chunk: dict) -> None:
+    count = len(columns['sequence'])
+    size = chunk['sequence'].size
+    for key, values in chunk.items():
+        if key not in columns:
+            columns[key] = array('q', [missing_timestamp]) * count
+        columns[key].frombytes(values.tobytes())
+
+    for key, values in columns.items():
+        if key not in chunk:
+            values.extend(array('q', [missing_timestamp]) * size)
+
+
+def __finish_timestamp_columns(columns: dict) -> dict:
+    return {key: np.frombuffer(values, dtype=np.int64) for key, values in columns.items()}
@@ -1,12 +1,189 @@
 import os
 import xml.etree.ElementTree as ET
+import numpy as np
+from constants import evaluation, timestamp_stages, missing_timestamp
 
-def evaluate_performance(test_data: list, output_folder: str) -> None:
-    output_filename = os.path.join(output_folder, "performance.xml")
+def evaluate_performance(test_data: list, output_folder: str) -> dict:
     output_filename2 = os.path.join(output_folder, "timediffs.xml")
+    output_filename5 = os.path.join(output_folder, "latency_windows.npz")
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    if test_data[3] is None or test_data[4] is None or len(test_data[3]) == 0 or len(test_data[4]) == 0:
+        print("Error: Timestamps are not available!")
+        return
+
+    # Get the timestamps as columns (int64 sequence numbers and nanosecond timestamps)
+    client_timestamps = timestamp_columns(test_data[3])
+    server_timestamps = timestamp_columns(test_data[4])
+
+    # Reordering of the server sequence numbers (in the order of arrival)
+    reordering = create_reordering_accumulator()
+    update_reordering_accumulator(reordering, server_timestamps['sequence'])
+    reordering_statistics = finish_reordering_accumulator(reordering)
+    in_order = reordering_statistics['reordered'] == 0
+    if not in_order:
+        print(f"Error: Sequence numbers are not in the same order ({reordering_statistics['reordered']} reordered datagrams)!")
+
+    # Join the client and server timestamps on the sequence number (lost packets are only present
+    # in the client timestamps and must not shift the following pairs)
+    join = join_timestamps(client_timestamps, server_timestamps)
+    if join['sequence'].size == 0:
+        print("Error: No matching sequence numbers in client and server timestamps!")
+        return
+
+    # Loss bursts: runs of consecutive client sequence numbers that did not arrive at the server
+    lost = np.ones(client_timestamps['sequence'].size, dtype=bool)
+    lost[join['client_index']] = False
+    losses = create_loss_accumulator(int(client_timestamps['timestamp'].min()))
+    lost_times = client_timestamps['timestamp'][lost]
+    update_loss_accumulator(losses, client_timestamps['sequence'][lost], lost_times)
+    loss_statistics = finish_loss_accumulator(losses)
+    del lost
+
+    # Calculate the difference (latency) in nanoseconds for each sequence number
+    sequence_numbers = join['sequence']
+    client_times = client_timestamps['timestamp'][join['client_index']]
+    differences = server_timestamps['timestamp'][join['server_index']] - client_times
+
+    # Remove the offset and the drift between the clocks of client and server (optional)
+    clock = None
+    correction = None
+    if evaluation['clock_correction']['enabled']:
+        clock = estimate_clock_correction(client_times, differences)
+        if clock is not None:
+            correction = clock_correction(clock, client_times)
+            differences -= correction
+
+    # Evaluate the timestamps
+    timestamps = {
+        'packet_loss': join['client_only'] > 0,
+        'in_order': in_order,
+        'matched': sequence_numbers.size,
+        'client_only': join['client_only'],
+        'server_only': join['server_only'],
+    }
+
+    # Calculate the statistics of the differences
+    timestamps.update(latency_statistics(differences))
+
+    # Record the differences in the latency histogram (used for the percentiles)
+    histogram = create_latency_histogram()
+    record_latency_histogram(histogram, differences)
+
+    # Latencies between the stages of the matched records (sender program, kernel, receiving program)
+    client_stages = {key: values[join['client_index']] for key, values in client_timestamps.items() if key in timestamp_stages}
+    server_stages = {key: values[join['server_index']] for key, values in server_timestamps.items() if key in timestamp_stages}
+    if correction is not None:
+        server_stages = {key: np.where(values != missing_timestamp, values - correction, missing_timestamp) for key, values in server_stages.items()}
+    stages = dict()
+    for name, latencies in stage_latencies(client_stages, server_stages).items():
+        if latencies.size == 0:
+            continue
+        stage_histogram = create_latency_histogram()
+        record_latency_histogram(stage_histogram, latencies)
+        stages[name] = {'count': latencies.size, **latency_statistics(latencies)}, stage_histogram
+
+    __write_performance_file(test_data, timestamps, histogram, output_folder, stages, (reordering_statistics, reordering['displacements']), (loss_statistics, losses), clock)
+
+    # Latency and loss series per time window (by send time, for the scenario graphs)
+    origin = losses['origin']
+    windows = {size: latency_windows(client_times, differences, lost_times, origin, size) for size in evaluation['windows']['sizes']}
+    save_latency_windows(windows, origin, output_filename5)
+    del client_times, lost_times, windows
+
+    #  Write timestamps to XML file
+    #  Create the XML file only if output_folder contains the string 'ihwk_1', 'ihwk_2' or 'ihwk_3', otherwise the file is not needed
+    if 'ihwk_1' in output_folder or 'ihwk_2' in output_folder or 'ihwk_3' in output_folder:
+        root = ET.Element('timestamps')
+
+        for sequence, difference in zip(sequence_numbers.tolist(), (differences / 1000000000).tolist()):
+            record = ET.SubElement(root, 'record')
+            ET.SubElement(record, 'sequence').text = str(sequence)
+            ET.SubElement(record, 'difference').text = str(difference)
+
+        # Write the formatted XML file to disk
+        tree = ET.ElementTree(root)
+        indent(tree.getroot()) # this I add
+        tree.write(output_filename2, encoding='utf-8', xml_declaration=True)
+
+        del tree
+        del root
+
+    return timestamps
+
+
+def evaluate_performance_stream(test_data: list, output_folder: str) -> dict:
+    '''
+    Evaluates the performance of a test scenario like evaluate_performance, but consumes the client
+    and server timestamps as streams of columnar chunks (see iterate_timestamp_messages). The chunks
+    are joined on the sequence number while they arrive and the latencies are only collected in a
+    latency accumulator, so the memory usage depends on the chunk size and not on the number of
+    records. The timediffs.xml file and the latency windows are not written and the clock
+    correction is not applied in this mode (they need all records at once).
+
+            Parameters:
+                    test_data (list): Test scenario (description, client results, server results,
+                                      client timestamp chunks, server timestamp chunks)
+                    output_folder (str): Path to the output folder of the scenario
+
+            Returns:
+                    timestamps (dict): Dictionary containing the <timestamps> block (None on error)
+    '''
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    if test_data[3] is None or test_data[4] is None:
+        print("Error: Timestamps are not available!")
+        return
+
+    join = dict()
+    accumulator = create_latency_accumulator()
+    stage_accumulators = dict()
+    reordering = create_reordering_accumulator()
+    losses = create_loss_accumulator()
+    server_chunks = __observe_reordering(test_data[4], reordering)
+    for _, client_timestamps, server_timestamps in iterate_joined_timestamps(test_data[3], server_chunks, join, losses):
+        update_latency_accumulator(accumulator, server_timestamps['timestamp'] - client_timestamps['timestamp'])
+
+        for name, latencies in stage_latencies(client_timestamps, server_timestamps).items():
+            if name not in stage_accumulators:
+                stage_accumulators[name] = create_latency_accumulator()
+            update_latency_accumulator(stage_accumulators[name], latencies)
+
+    if accumulator['count'] == 0:
+        print("Error: No matching sequence numbers in client and server timestamps!")
+        return
+
+    # Evaluate the timestamps
+    timestamps = {
+        'packet_loss': join['client_only'] > 0,
+        'in_order': join['in_order'],
+        'matched': accumulator['count'],
+        'client_only': join['client_only'],
+        'server_only': join['server_only'],
+    }
+    timestamps.update(finish_latency_accumulator(accumulator))
+
+    stages = dict()
+    for name, stage_accumulator in stage_accumulators.items():
+        if stage_accumulator['count'] > 0:
+            stages[name] = {'count': stage_accumulator['count'], **finish_latency_accumulator(stage_accumulator)}, stage_accumulator['histogram']
+
+    reordering_statistics = finish_reordering_accumulator(reordering)
+    if reordering_statistics['reordered'] > 0:
+        print(f"Error: Sequence numbers are not in the same order ({reordering_statistics['reordered']} reordered datagrams)!")
+    loss_statistics = finish_loss_accumulator(losses)
+    __write_performance_file(test_data, timestamps, accumulator['histogram'], output_folder, stages, (reordering_statistics, reordering['displacements']), (loss_statistics, losses))
+
+    return timestamps
+
+
+def __write_performance_file(test_data: list, timestamps: dict, histogram: dict, output_folder: str, stages: dict, reordering: tuple, losses: tuple, clock: dict = None) -> None:
+    output_filename = os.path.join(output_folder, "performance.xml")
+    output_filename3 = os.path.join(output_folder, "latency_histogram.npz")
+    output_filename4 = os.path.join(output_folder, "loss_bursts.npz")
+
     # Get basic data
     basic_tuid = test_data[0]['metadata']['t_uid']
     basic_datagramsize = test_data[0]['connection']['datagram_size']
@@ -17,107 +194,6 @@ def evaluate_performance(test_data: list, output_folder: str) -> None:
     test_datagrams = test_data[1]['report']['total']
     test_bandwidth = (test_datagrams * basic_datagramsize * 8) / test_duration
 
-    if len(test_data[3]) == 0 or len(test_data[4]) == 0:
-        print("Error: Timestamps are not available!")
-        return
-
-    # Evaluate the timestamps
-    paket_loss = True
-    if(len(test_data[3]) == len(test_data[4])):
-        paket_loss = False
-
-    # Get the timestamp difference for each sequence number
-    # Check if the sequence numbers are the same, a counter is not enough because numbers my be missing or they are not in order
-    # Iterate the client timestamps and get a sequence number, then iterate the server timestamps and get the same sequence number
-    # The Send and Receive timestamps are then compared and the difference is calculated
-    # The timestamps are stored as tv_sec and tv_nsec, so they have to be converted to seconds first
-    # The difference is then calculated by subtracting the Send timestamp from the Receive timestamp
-    # The difference is then stored in a list with the corresponding sequence number
-    # The list is then sorted by the sequence number
-
-    # Get the sequence numbers from the client timestamps
-    client_sequence_numbers = list()
-    for timestamp in test_data[3]:
-        client_sequence_numbers.append(int(timestamp['sequence']))
-
-    # Get the sequence numbers from the server timestamps
-    server_sequence_numbers = list()
-    for timestamp in test_data[4]:
-        server_sequence_numbers.append(int(timestamp['sequence']))
-
-    # Check if client and server sequence numbers are the same and in the same order
-    in_order = True
-    sorted_server_sequence_numbers = sorted(server_sequence_numbers)
-    if server_sequence_numbers != sorted_server_sequence_numbers:
-        print("Error: Sequence numbers are not the same or not in the same order!")
-        in_order = False
-
-        # Print out only the sequence numbers that is in a different order
-        for i in range(len(server_sequence_numbers)):
-            if server_sequence_numbers[i] != sorted_server_sequence_numbers[i]:
-                print(f"Server: {server_sequence_numbers[i]}")
-                print(f"Sorted: {sorted_server_sequence_numbers[i]}")
-
-    # Sort test data [3] and [4] by sequence number
-    test_data[3].sort(key=lambda x: int(x['sequence']))
-    test_data[4].sort(key=lambda x: int(x['sequence']))
-
-    # Get the timestamps for each sequence number
-    timestamps = list()
-    for i in range(len(test_data[3])):
-        # Calculate the difference between the timestamps
-        diff_sec = int(test_data[4][i]['tv_sec']) - int(test_data[3][i]['tv_sec'])
-        diff_nsec = int(test_data[4][i]['tv_nsec']) - int(test_data[3][i]['tv_nsec'])
-
-        # Check if the nanoseconds are negative
-        if diff_nsec < 0:
-            diff_sec -= 1
-            diff_nsec += 1000000000
-
-        # Calculate the difference in seconds
-        difference = diff_sec + (diff_nsec / 1000000000)
-
-        timestamps.append({
-            'sequence': int(test_data[3][i]['sequence']),
-            'difference': difference
-        })
-
-    # Calculate the average difference
-    average_difference = 0
-    for timestamp in timestamps:
-        average_difference += timestamp['difference']
-    average_difference = average_difference / len(timestamps)
-
-    # Calculate the standard deviation
-    standard_deviation = 0
-    for timestamp in timestamps:
-        standard_deviation += (timestamp['difference'] - average_difference) ** 2
-    standard_deviation = (standard_deviation / len(timestamps)) ** 0.5
-
-    # Calculate the minimum and maximum difference
-    minimum_difference = timestamps[0]['difference']
-    maximum_difference = timestamps[0]['difference']
-    for timestamp in timestamps:
-        if timestamp['difference'] < minimum_difference:
-            minimum_difference = timestamp['difference']
-        if timestamp['difference'] > maximum_difference:
-            maximum_difference = timestamp['difference']
-
-    # Calculate the minimum and maximum difference more efficiently
-    minimum_difference = min(timestamps, key=lambda x: x['difference'])['difference']
-    maximum_difference = max(timestamps, key=lambda x: x['difference'])['difference']
-
-
-    # Calculate the difference between the minimum and maximum difference
-    difference_difference = maximum_difference - minimum_difference
-
-    # Calculate the jitter
-    jitter = 0
-    for timestamp in timestamps:
-        jitter += abs(timestamp['difference'] - average_difference)
-    jitter = jitter / len(timestamps)
-
-
     # Create the XML file
     root = ET.Element('performance')
 
@@ -135,41 +211,1117 @@ def evaluate_performance(test_data: list, output_folder: str) -> None:
 
     # Timestamps
     xml_timestamps = ET.SubElement(root, 'timestamps')
-    ET.SubElement(xml_timestamps, 'packet_loss').text = str(paket_loss)
-    ET.SubElement(xml_timestamps, 'in_order').text = str(in_order)
-    ET.SubElement(xml_timestamps, 'average_difference').text = str(average_difference)
-    ET.SubElement(xml_timestamps, 'standard_deviation').text = str(standard_deviation)
-    ET.SubElement(xml_timestamps, 'minimum_difference').text = str(minimum_difference)
-    ET.SubElement(xml_timestamps, 'maximum_difference').text = str(maximum_difference)
-    ET.SubElement(xml_timestamps, 'difference_difference').text = str(difference_difference)
-    ET.SubElement(xml_timestamps, 'jitter').text = str(jitter)
+    for key, value in timestamps.items():
+        ET.SubElement(xml_timestamps, key).text = str(value)
+
+    # Percentiles (from the latency histogram)
+    xml_percentiles = ET.SubElement(root, 'percentiles')
+    for percentile in evaluation['percentiles']:
+        value = latency_histogram_percentile(histogram, percentile)
+        ET.SubElement(xml_percentiles, percentile_tag(percentile)).text = str(value / 1000000000)
+
+    # Latencies between the stages (statistics and percentiles per pair of stages)
+    if len(stages) > 0:
+        xml_stages = ET.SubElement(root, 'stages')
+        for name, (statistics, stage_histogram) in stages.items():
+            xml_stage = ET.SubElement(xml_stages, name)
+            for key, value in statistics.items():
+                ET.SubElement(xml_stage, key).text = str(value)
+            for percentile in evaluation['percentiles']:
+                value = latency_histogram_percentile(stage_histogram, percentile)
+                ET.SubElement(xml_stage, percentile_tag(percentile)).text = str(value / 1000000000)
+
+    # Reordering of the server sequence numbers (statistics and the non-empty buckets of the
+    # displacement histogram)
+    statistics, displacements = reordering
+    xml_reordering = ET.SubElement(root, 'reordering')
+    for key, value in statistics.items():
+        ET.SubElement(xml_reordering, key).text = str(value)
+    xml_displacements = ET.SubElement(xml_reordering, 'displacement_histogram')
+    threshold = evaluation['reordering']['displacement_threshold']
+    for displacement, count in zip(range(-threshold, threshold + 1), displacements.tolist()):
+        if count > 0:
+            ET.SubElement(xml_displacements, displacement_tag(displacement)).text = str(count)
+
+    # Estimated clock offset and drift (the latencies above are corrected)
+    if clock is not None:
+        xml_clock = ET.SubElement(root, 'clock_correction')
+        ET.SubElement(xml_clock, 'offset').text = str(clock['offset'] / 1000000000)
+        ET.SubElement(xml_clock, 'drift_ppm').text = str(clock['drift'] * 1000000)
+        ET.SubElement(xml_clock, 'origin').text = str(clock['origin'] / 1000000000)
+        ET.SubElement(xml_clock, 'windows').text = str(clock['windows'])
+        ET.SubElement(xml_clock, 'minimum_latency').text = str(clock['minimum_latency'] / 1000000000)
+
+    # Loss bursts (statistics and percentiles of the burst lengths)
+    statistics, loss_accumulator = losses
+    xml_losses = ET.SubElement(root, 'loss_bursts')
+    for key, value in statistics.items():
+        ET.SubElement(xml_losses, key).text = str(value)
+    for percentile in evaluation['percentiles']:
+        ET.SubElement(xml_losses, percentile_tag(percentile)).text = str(latency_histogram_percentile(loss_accumulator['histogram'], percentile))
 
     # Write the formatted XML file to disk
     tree = ET.ElementTree(root)
     indent(tree.getroot()) # this I add
     tree.write(output_filename, encoding='utf-8', xml_declaration=True)
 
-    # Delete the xml tree and structure from memory
-    del tree
-    del root
+    # Store the latency histogram and the loss bursts next to the XML file (mergeable across scenarios)
+    save_latency_histogram(histogram, output_filename3)
+    save_loss_bursts(loss_accumulator, output_filename4)
 
-    #  Write timestamps to XML file
-    #  Create the XML file only if output_folder contains the string 'ihwk_1', 'ihwk_2' or 'ihwk_3', otherwise the file is not needed
-    if 'ihwk_1' in output_folder or 'ihwk_2' in output_folder or 'ihwk_3' in output_folder:
-        root = ET.Element('timestamps')
 
-        for timestamp in timestamps:
-            record = ET.SubElement(root, 'record')
-            ET.SubElement(record, 'sequence').text = str(timestamp['sequence'])
-            ET.SubElement(record, 'difference').text = str(timestamp['difference'])
+def timestamp_columns(timestamps) -> dict:
+    '''
+    Returns the timestamp messages as a dictionary of NumPy arrays with the keys 'sequence',
+    'timestamp' (nanoseconds) and one key per stage (see parse_test_results). Timestamp messages
+    that are already columnar are returned as they are, lists of dictionaries (see
+    parse_timestamp_messages) are converted.
 
-        # Write the formatted XML file to disk
-        tree = ET.ElementTree(root)
-        indent(tree.getroot()) # this I add
-        tree.write(output_filename2, encoding='utf-8', xml_declaration=True)
+            Parameters:
+                    timestamps (list/dict): Timestamp messages (list of dictionaries or columns)
 
-        del tree
-        del root
+            Returns:
+                    columns (dict): Dictionary containing the int64 arrays
+    '''
+    if isinstance(timestamps, dict):
+        return timestamps
+
+    count = len(timestamps)
+    sequence = np.fromiter((int(record['sequence']) for record in timestamps), dtype=np.int64, count=count)
+    timestamp = np.fromiter((int(record['tv_sec']) * 1000000000 + int(record['tv_nsec']) for record in timestamps), dtype=np.int64, count=count)
+    columns = {'sequence': sequence, 'timestamp': timestamp}
+
+    for stage in timestamp_stages:
+        if any(stage in record for record in timestamps):
+            columns[stage] = np.fromiter((record.get(stage, missing_timestamp) for record in timestamps), dtype=np.int64, count=count)
+
+    return columns
+
+
+def join_timestamps(client_timestamps: dict, server_timestamps: dict) -> dict:
+    '''
+    Joins the client and server timestamps on the sequence number. The returned dictionary contains
+    the following keys: 'sequence' (matched sequence numbers in ascending order), 'client_index'
+    and 'server_index' (positions of the matched records in the given arrays), 'client_only' and
+    'server_only' (number of sequence numbers that are only present on one side). Duplicated
+    sequence numbers are matched once (first occurrence).
+
+            Parameters:
+                    client_timestamps (dict): Columnar client timestamps (see timestamp_columns)
+                    server_timestamps (dict): Columnar server timestamps (see timestamp_columns)
+
+            Returns:
+                    join (dict): Dictionary containing the join result
+    '''
+    sequence, client_index, server_index = np.intersect1d(client_timestamps['sequence'], server_timestamps['sequence'], assume_unique=False, return_indices=True)
+
+    client_unique = np.unique(client_timestamps['sequence']).size
+    server_unique = np.unique(server_timestamps['sequence']).size
+
+    return {
+        'sequence': sequence,
+        'client_index': client_index,
+        'server_index': server_index,
+        'client_only': client_unique - sequence.size,
+        'server_only': server_unique - sequence.size,
+    }
+
+
+def iterate_joined_timestamps(client_chunks, server_chunks, join: dict, losses: dict = None):
+    '''
+    Joins two streams of columnar timestamp chunks (see iterate_timestamp_messages) on the sequence
+    number. Chunks are read from the side that lags behind, records that are not matched yet are
+    kept until the other side has moved past them. A record is counted as lost (client or server
+    only) if it is older than the first sequence number of the latest chunk of the other side, so
+    reordering across more than one chunk is counted as loss. After the streams are exhausted, the
+    join dictionary contains the following keys: 'client_only', 'server_only' and 'in_order'
+    (server sequence numbers are in ascending order). The client only records are added to the
+    loss accumulator, if one is given.
+
+            Parameters:
+                    client_chunks (iterable): Columnar client timestamp chunks
+                    server_chunks (iterable): Columnar server timestamp chunks
+                    join (dict): Dictionary receiving the join counters
+                    losses (dict): Loss accumulator (optional, see create_loss_accumulator)
+
+            Yields:
+                    sequence (np.ndarray): Matched sequence numbers of the step (ascending)
+                    client_timestamps (dict): Client columns of the matched records
+                    server_timestamps (dict): Server columns of the matched records
+    '''
+    client_chunks = iter(client_chunks)
+    server_chunks = iter(server_chunks)
+    client = __empty_timestamp_columns()
+    server = __empty_timestamp_columns()
+    client_frontier = server_frontier = None
+    client_watermark = server_watermark = None
+    client_done = server_done = False
+    last_server_sequence = None
+
+    join['client_only'] = 0
+    join['server_only'] = 0
+    join['in_order'] = True
+
+    while not (client_done and server_done):
+        # Read from the side that lags behind (both if they are at the same sequence number)
+        read_client = not client_done and (server_done or client_frontier is None or (server_frontier is not None and client_frontier <= server_frontier))
+        read_server = not server_done and (client_done or server_frontier is None or (client_frontier is not None and server_frontier <= client_frontier))
+
+        if read_client:
+            chunk = next(client_chunks, None)
+            if chunk is None or chunk['sequence'].size == 0:
+                client_done = True
+            else:
+                client = __concatenate_timestamp_columns(client, chunk)
+                if losses is not None:
+                    first = int(chunk['timestamp'].min())
+                    losses['origin'] = first if losses['origin'] is None else min(losses['origin'], first)
+                client_frontier = int(chunk['sequence'].max()) if client_frontier is None else max(client_frontier, int(chunk['sequence'].max()))
+                client_watermark = int(chunk['sequence'][0])
+
+        if read_server:
+            chunk = next(server_chunks, None)
+            if chunk is None or chunk['sequence'].size == 0:
+                server_done = True
+            else:
+                sequence = chunk['sequence']
+                if np.any(sequence[1:] < sequence[:-1]) or (last_server_sequence is not None and sequence[0] < last_server_sequence):
+                    join['in_order'] = False
+                last_server_sequence = int(sequence[-1])
+
+                server = __concatenate_timestamp_columns(server, chunk)
+                server_frontier = int(sequence.max()) if server_frontier is None else max(server_frontier, int(sequence.max()))
+                server_watermark = int(sequence[0])
+
+        # Join the pending records
+        sequence, client_index, server_index = np.intersect1d(client['sequence'], server['sequence'], assume_unique=False, return_indices=True)
+        if sequence.size > 0:
+            yield sequence, {key: values[client_index] for key, values in client.items()}, {key: values[server_index] for key, values in server.items()}
+            client = __remove_timestamp_columns(client, client_index)
+            server = __remove_timestamp_columns(server, server_index)
+
+        # Drop the unmatched records the other side has moved past
+        if server_done or server_watermark is not None:
+            lost = client['sequence'] < server_watermark if not server_done else np.ones(client['sequence'].size, dtype=bool)
+            join['client_only'] += int(np.count_nonzero(lost))
+            if losses is not None:
+                update_loss_accumulator(losses, client['sequence'][lost], client['timestamp'][lost])
+            client = {key: values[~lost] for key, values in client.items()}
+        if client_done or client_watermark is not None:
+            lost = server['sequence'] < client_watermark if not client_done else np.ones(server['sequence'].size, dtype=bool)
+            join['server_only'] += int(np.count_nonzero(lost))
+            server = {key: values[~lost] for key, values in server.items()}
+
+
+def latency_windows(client_timestamp: np.ndarray, differences: np.ndarray, lost_timestamp: np.ndarray, origin: int, size: int) -> dict:
+    '''
+    Groups the latencies and the lost datagrams into time windows of the given size (by send time,
+    the first window starts at the origin) and returns one value per window: the number of matched
+    datagrams ('count'), the number of lost datagrams ('lost') and the 'mean', the 'max' and the
+    percentile (see constants.evaluation, e.g. 'p99') of the latencies in nanoseconds. Windows
+    without matched datagrams have NaN latencies. The origin must not be later than the earliest
+    send timestamp. The number of windows is limited (see constants.evaluation), datagrams sent
+    after the last window (e.g. a single timestamp far in the future) are left out.
+
+            Parameters:
+                    client_timestamp (np.ndarray): int64 array of send timestamps of the matched datagrams
+                    differences (np.ndarray): int64 array of latencies of the matched datagrams
+                    lost_timestamp (np.ndarray): int64 array of send timestamps of the lost datagrams
+                    origin (int): Start of the first window in nanoseconds
+                    size (int): Size of the windows in nanoseconds
+
+            Returns:
+                    windows (dict): Dictionary containing one array per column
+    '''
+    index = (client_timestamp - origin) // size
+    lost_index = (lost_timestamp - origin) // size
+    last = max(int(index.max()) if index.size > 0 else 0, int(lost_index.max()) if lost_index.size > 0 else 0)
+    windows = min(last + 1, evaluation['windows']['max_windows'])
+    if last >= windows:
+        print(f"Error: Only the first {windows} windows of {window_name(size)} are evaluated!")
+        inside = index < windows
+        differences, index = differences[inside], index[inside]
+        lost_index = lost_index[lost_index < windows]
+
+    count = np.bincount(index, minlength=windows)
+    lost = np.bincount(lost_index, minlength=windows)
+    sums = np.bincount(index, weights=differences, minlength=windows)
+    occupied = count > 0
+
+    # Sort the latencies by window and latency, every window is a contiguous block then. If it fits
+    # into int64, a combined key (window, latency) is sorted, which is much faster than lexsort.
+    ordered = differences
+    if differences.size > 0:
+        lowest = int(differences.min())
+        span = int(differences.max()) - lowest + 1
+        if windows * span < 2 ** 63:
+            keys = index * span + (differences - lowest)
+            keys.sort()
+            ordered = keys % span + lowest
+            del keys
+        else:
+            ordered = differences[np.lexsort((differences, index))]
+    ends = np.cumsum(count)
+    starts = ends - count
+
+    percentile = evaluation['windows']['percentile']
+    ranks = np.maximum(np.ceil(percentile / 100 * count).astype(np.int64), 1)
+
+    mean = np.full(windows, np.nan)
+    maximum = np.full(windows, np.nan)
+    value = np.full(windows, np.nan)
+    mean[occupied] = sums[occupied] / count[occupied]
+    maximum[occupied] = ordered[ends[occupied] - 1]
+    value[occupied] = ordered[starts[occupied] + ranks[occupied] - 1]
+
+    return {
+        'count': count,
+        'lost': lost,
+        'mean': mean,
+        'max': maximum,
+        percentile_tag(percentile): value,
+    }
+
+
+def window_name(size: int) -> str:
+    '''
+    Returns the name of a window size (e.g. '10ms', '1s').
+
+            Parameters:
+                    size (int): Size of the window in nanoseconds
+
+            Returns:
+                    name (str): Name of the window size
+    '''
+    if size % 1000000000 == 0:
+        return f'{size // 1000000000}s'
+    if size % 1000000 == 0:
+        return f'{size // 1000000}ms'
+    return f'{size // 1000}us'
+
+
+def save_latency_windows(windows: dict, origin: int, filename: str) -> None:
+    '''
+    Saves the latency windows of all window sizes as a compressed NumPy file. The columns are
+    stored as '<name>__<column>' (e.g. '100ms__p99', see window_name), together with the 'sizes'
+    and the 'origin' (nanoseconds).
+
+            Parameters:
+                    windows (dict): Latency windows by window size (see latency_windows)
+                    origin (int): Start of the first window in nanoseconds
+                    filename (str): Path to the output file (.npz)
+
+            Returns:
+                    None
+    '''
+    arrays = {'sizes': np.array(list(windows.keys()), dtype=np.int64), 'origin': origin}
+    for size, columns in windows.items():
+        for key, values in columns.items():
+            arrays[f'{window_name(size)}__{key}'] = values
+
+    np.savez_compressed(filename, **arrays)
+
+
+def load_latency_windows(filename: str, size: int) -> dict:
+    '''
+    Loads the latency windows of one window size saved with save_latency_windows. Besides the
+    columns, the start of each window ('start', seconds since the origin) is returned.
+
+            Parameters:
+                    filename (str): Path to the latency windows file (.npz)
+                    size (int): Size of the windows in nanoseconds
+
+            Returns:
+                    windows (dict): Dictionary containing one array per column (None if the window
+                                    size is not in the file)
+    '''
+    prefix = f'{window_name(size)}__'
+    with np.load(filename) as data:
+        windows = {key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)}
+
+    if len(windows) == 0:
+        return None
+
+    windows['start'] = np.arange(windows['count'].size) * size / 1000000000
+    return windows
+
+
+def estimate_clock_correction(client_timestamp: np.ndarray, differences: np.ndarray) -> dict:
+    '''
+    Estimates the offset and the linear drift between the clocks of client and server from the
+    matched records. The send times are divided into equal time windows (see constants.evaluation)
+    and the minimum latency of each window is taken (lower envelope, the queueing delay is close to
+    zero there). The drift is the median of the slopes between all pairs of window minima
+    (Theil-Sen), the offset is the median of the window minima around this slope, so the line runs
+    along the lower envelope and single outliers do not move it. The latency of the line is mapped
+    to the configured minimum latency.
+
+            Parameters:
+                    client_timestamp (np.ndarray): int64 array of send timestamps (nanoseconds)
+                    differences (np.ndarray): int64 array of the uncorrected latencies (nanoseconds)
+
+            Returns:
+                    clock (dict): Dictionary containing the 'origin' (first send timestamp), the
+                                  'offset' (nanoseconds at the origin), the 'drift' (nanoseconds per
+                                  nanosecond), the number of 'windows' and the 'minimum_latency'
+                                  (None if the records span less than two windows)
+    '''
+    origin = int(client_timestamp.min())
+    times = client_timestamp - origin
+    span = int(times.max()) + 1
+
+    # Minimum latency and its send time per window
+    windows = evaluation['clock_correction']['windows']
+    window = times * windows // span
+    minima = np.full(windows, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(minima, window, differences)
+    occupied, first = np.unique(window[differences == minima[window]], return_index=True)
+    if occupied.size < 2:
+        return None
+
+    positions = np.flatnonzero(differences == minima[window])[first]
+    x = times[positions].astype(np.float64)
+    y = differences[positions].astype(np.float64)
+
+    # Median of the slopes between all pairs of window minima
+    first_index, second_index = np.triu_indices(x.size, k=1)
+    drift = float(np.median((y[second_index] - y[first_index]) / (x[second_index] - x[first_index])))
+    offset = float(np.median(y - drift * x))
+
+    return {
+        'origin': origin,
+        'offset': offset,
+        'drift': drift,
+        'windows': int(occupied.size),
+        'minimum_latency': evaluation['clock_correction']['minimum_latency'],
+    }
+
+
+def clock_correction(clock: dict, client_timestamp: np.ndarray) -> np.ndarray:
+    '''
+    Returns the correction of the latencies (to be subtracted) for the given send timestamps: the
+    offset and the drift of the estimated line minus the minimum latency.
+
+            Parameters:
+                    clock (dict): Estimated clock offset and drift (see estimate_clock_correction)
+                    client_timestamp (np.ndarray): int64 array of send timestamps (nanoseconds)
+
+            Returns:
+                    correction (np.ndarray): int64 array of corrections in nanoseconds
+    '''
+    times = (client_timestamp - clock['origin']).astype(np.float64)
+    return np.rint(clock['offset'] + clock['drift'] * times).astype(np.int64) - clock['minimum_latency']
+
+
+def create_reordering_accumulator() -> dict:
+    '''
+    Creates an empty reordering accumulator. The accumulator collects the reordering metrics of the
+    sequence numbers of the received datagrams (in the order of arrival):
+
+      - reordered: datagrams with a sequence number below the highest one received before (RFC 4737
+        Type-P-Reordered)
+      - extent: distance of a reordered datagram to the first earlier datagram with a higher
+        sequence number (RFC 4737 reordering extent)
+      - displacement: position of arrival minus the position in the sorted sequence numbers (late
+        datagrams are positive, early ones negative; RFC 5236 reorder density)
+
+    The sequence numbers are added in chunks (see update_reordering_accumulator). A chunk is
+    evaluated together with the previous and the next chunk, so reordering across more than one
+    chunk is not fully captured (like in iterate_joined_timestamps).
+
+            Returns:
+                    accumulator (dict): Dictionary containing the empty accumulator
+    '''
+    threshold = evaluation['reordering']['displacement_threshold']
+
+    return {
+        'window': list(),
+        'maximum': None,
+        'received': 0,
+        'reordered': 0,
+        'extent_maximum': 0,
+        'extent_total': 0,
+        'displaced': 0,
+        'displacement_maximum': 0,
+        'displacement_total': 0,
+        'displacements': np.zeros(2 * threshold + 1, dtype=np.int64),
+    }
+
+
+def update_reordering_accumulator(accumulator: dict, sequence: np.ndarray) -> None:
+    '''
+    Adds a chunk of sequence numbers (in the order of arrival) to the reordering accumulator. The
+    previous chunk is evaluated now that the chunk following it is known.
+
+            Parameters:
+                    accumulator (dict): Reordering accumulator (see create_reordering_accumulator)
+                    sequence (np.ndarray): int64 array of sequence numbers
+
+            Returns:
+                    None
+    '''
+    if sequence.size == 0:
+        return
+
+    window = accumulator['window']
+    window.append(sequence)
+    if len(window) > 1:
+        __evaluate_reordering(accumulator, len(window) - 2)
+    if len(window) > 2:
+        dropped = window.pop(0)
+        maximum = int(dropped.max())
+        accumulator['maximum'] = maximum if accumulator['maximum'] is None else max(accumulator['maximum'], maximum)
+
+
+def finish_reordering_accumulator(accumulator: dict) -> dict:
+    '''
+    Evaluates the last chunk and returns the reordering metrics: 'received', 'reordered',
+    'reordered_ratio', 'maximum_extent', 'mean_extent' (of the reordered datagrams), 'displaced',
+    'maximum_displacement' and 'mean_displacement' (absolute values of the displaced datagrams).
+    The displacement histogram is available as accumulator['displacements'] (displacements from
+    -threshold to +threshold, see constants.evaluation).
+
+            Parameters:
+                    accumulator (dict): Reordering accumulator (see create_reordering_accumulator)
+
+            Returns:
+                    statistics (dict): Dictionary containing the reordering metrics
+    '''
+    if len(accumulator['window']) > 0:
+        __evaluate_reordering(accumulator, len(accumulator['window']) - 1)
+        accumulator['window'] = list()
+
+    received = accumulator['received']
+    reordered = accumulator['reordered']
+    displaced = accumulator['displaced']
+
+    return {
+        'received': received,
+        'reordered': reordered,
+        'reordered_ratio': reordered / received if received > 0 else 0.0,
+        'maximum_extent': accumulator['extent_maximum'],
+        'mean_extent': accumulator['extent_total'] / reordered if reordered > 0 else 0.0,
+        'displaced': displaced,
+        'maximum_displacement': accumulator['displacement_maximum'],
+        'mean_displacement': accumulator['displacement_total'] / displaced if displaced > 0 else 0.0,
+    }
+
+
+def displacement_tag(displacement: int) -> str:
+    '''
+    Returns the XML tag of a bucket of the displacement histogram (e.g. 'early_2', 'in_place',
+    'late_3').
+
+            Parameters:
+                    displacement (int): Displacement of the bucket
+
+            Returns:
+                    tag (str): XML tag
+    '''
+    if displacement < 0:
+        return f'early_{-displacement}'
+    if displacement > 0:
+        return f'late_{displacement}'
+    return 'in_place'
+
+
+def __evaluate_reordering(accumulator: dict, index: int) -> None:
+    # Evaluates the chunk at the given index of the window, the other chunks are the context
+    window = accumulator['window']
+    sequence = np.concatenate(window) if len(window) > 1 else window[index]
+    start = sum(chunk.size for chunk in window[:index])
+    stop = start + window[index].size
+    accumulator['received'] += stop - start
+
+    # Highest sequence number received up to each position (including the dropped chunks)
+    running_maximum = np.maximum.accumulate(sequence)
+    if accumulator['maximum'] is not None:
+        np.maximum(running_maximum, accumulator['maximum'], out=running_maximum)
+
+    previous_maximum = running_maximum[start - 1:stop - 1] if start > 0 else np.concatenate((
+        [accumulator['maximum'] if accumulator['maximum'] is not None else np.iinfo(np.int64).min], running_maximum[:stop - 1]))
+    reordered = np.flatnonzero(sequence[start:stop] < previous_maximum) + start
+    if reordered.size == 0:
+        # Ascending sequence numbers, no datagram is displaced unless a later datagram of the window
+        # has a lower sequence number (early datagrams of the chunk)
+        if stop == sequence.size or sequence[stop:].min() >= sequence[stop - 1]:
+            accumulator['displacements'][accumulator['displacements'].size // 2] += stop - start
+            return
+    else:
+        # Reordering extent: distance to the first datagram with a higher sequence number (the
+        # running maximum is ascending, so it is found by a binary search)
+        extents = reordered - np.searchsorted(running_maximum, sequence[reordered], side='right')
+        accumulator['reordered'] += reordered.size
+        accumulator['extent_maximum'] = max(accumulator['extent_maximum'], int(extents.max()))
+        accumulator['extent_total'] += int(extents.sum())
+
+    # Displacement: position of arrival minus the position in the sorted sequence numbers
+    order = np.argsort(sequence, kind='stable')
+    ranks = np.empty(sequence.size, dtype=np.int64)
+    ranks[order] = np.arange(sequence.size)
+    displacements = np.arange(start, stop) - ranks[start:stop]
+    distances = np.abs(displacements)
+
+    accumulator['displaced'] += int(np.count_nonzero(displacements))
+    accumulator['displacement_maximum'] = max(accumulator['displacement_maximum'], int(distances.max()))
+    accumulator['displacement_total'] += int(distances.sum())
+
+    threshold = evaluation['reordering']['displacement_threshold']
+    accumulator['displacements'] += np.bincount(np.clip(displacements, -threshold, threshold) + threshold, minlength=2 * threshold + 1)
+
+
+def __observe_reordering(chunks, accumulator: dict):
+    # Passes the chunks through and adds their sequence numbers to the reordering accumulator
+    for chunk in chunks:
+        update_reordering_accumulator(accumulator, chunk['sequence'])
+        yield chunk
+
+
+def create_loss_accumulator(origin: int = None) -> dict:
+    '''
+    Creates an empty loss accumulator. The accumulator collects the loss bursts of a test: runs of
+    consecutive sequence numbers that were sent by the client but not received by the server. For
+    every burst the first sequence number, the length and the send time of the first lost datagram
+    are kept, the burst lengths are also recorded in a histogram (layout of the latency histogram,
+    exact up to 2^sub_bucket_bits, mergeable across scenarios).
+
+            Parameters:
+                    origin (int): Start of the test in nanoseconds (optional, earliest client timestamp)
+
+            Returns:
+                    accumulator (dict): Dictionary containing the empty accumulator
+    '''
+    return {
+        'origin': origin,
+        'lost': 0,
+        'open': None,
+        'sequence': list(),
+        'length': list(),
+        'timestamp': list(),
+        'histogram': create_latency_histogram(),
+    }
+
+
+def update_loss_accumulator(accumulator: dict, sequence: np.ndarray, timestamp: np.ndarray) -> None:
+    '''
+    Adds lost datagrams to the loss accumulator. A burst that reaches the end of the lost datagrams
+    is kept open, it is continued by the next update if it starts with the following sequence number.
+
+            Parameters:
+                    accumulator (dict): Loss accumulator (see create_loss_accumulator)
+                    sequence (np.ndarray): int64 array of sequence numbers of the lost datagrams
+                    timestamp (np.ndarray): int64 array of send timestamps of the lost datagrams
+
+            Returns:
+                    None
+    '''
+    if sequence.size == 0:
+        return
+
+    if np.any(sequence[1:] < sequence[:-1]):
+        order = np.argsort(sequence, kind='stable')
+        sequence = sequence[order]
+        timestamp = timestamp[order]
+    accumulator['lost'] += sequence.size
+
+    # A burst ends where the sequence numbers are not consecutive
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sequence) != 1) + 1))
+    lengths = np.diff(np.append(starts, sequence.size))
+    first_sequence = sequence[starts]
+    first_timestamp = timestamp[starts]
+
+    # Continue the open burst of the previous update or close it
+    if accumulator['open'] is not None:
+        open_sequence, open_length, open_timestamp = accumulator['open']
+        if first_sequence[0] == open_sequence + open_length:
+            first_sequence[0] = open_sequence
+            lengths[0] += open_length
+            first_timestamp[0] = open_timestamp
+        else:
+            __close_loss_bursts(accumulator, np.array([open_sequence]), np.array([open_length]), np.array([open_timestamp]))
+
+    accumulator['open'] = (int(first_sequence[-1]), int(lengths[-1]), int(first_timestamp[-1]))
+    __close_loss_bursts(accumulator, first_sequence[:-1], lengths[:-1], first_timestamp[:-1])
+
+
+def finish_loss_accumulator(accumulator: dict) -> dict:
+    '''
+    Closes the open burst and returns the loss statistics: 'lost', 'bursts', 'longest_burst',
+    'mean_burst_length' and 'longest_burst_time' (seconds since the origin, -1 without bursts). The
+    bursts are available as int64 arrays in accumulator['sequence'], accumulator['length'] and
+    accumulator['timestamp'] (nanoseconds) afterwards.
+
+            Parameters:
+                    accumulator (dict): Loss accumulator (see create_loss_accumulator)
+
+            Returns:
+                    statistics (dict): Dictionary containing the loss statistics
+    '''
+    if accumulator['open'] is not None:
+        open_sequence, open_length, open_timestamp = accumulator['open']
+        __close_loss_bursts(accumulator, np.array([open_sequence]), np.array([open_length]), np.array([open_timestamp]))
+        accumulator['open'] = None
+
+    for key in ('sequence', 'length', 'timestamp'):
+        if isinstance(accumulator[key], list):
+            accumulator[key] = np.concatenate(accumulator[key]) if len(accumulator[key]) > 0 else np.empty(0, dtype=np.int64)
+
+    lengths = accumulator['length']
+    bursts = lengths.size
+    longest = int(lengths.max()) if bursts > 0 else 0
+    longest_time = -1
+    if bursts > 0:
+        origin = accumulator['origin'] if accumulator['origin'] is not None else int(accumulator['timestamp'].min())
+        longest_time = (int(accumulator['timestamp'][int(np.argmax(lengths))]) - origin) / 1000000000
+
+    return {
+        'lost': accumulator['lost'],
+        'bursts': bursts,
+        'longest_burst': longest,
+        'mean_burst_length': accumulator['lost'] / bursts if bursts > 0 else 0.0,
+        'longest_burst_time': longest_time,
+    }
+
+
+def save_loss_bursts(accumulator: dict, filename: str) -> None:
+    '''
+    Saves the loss bursts of a finished loss accumulator (see finish_loss_accumulator) as a
+    compressed NumPy file: the bursts ('sequence', 'length', 'timestamp'), the 'origin', the number
+    of 'lost' datagrams, the 'longest' burst and the histogram of the burst lengths ('counts', 'lower', 'upper').
+
+            Parameters:
+                    accumulator (dict): Finished loss accumulator
+                    filename (str): Path to the output file (.npz)
+
+            Returns:
+                    None
+    '''
+    histogram = accumulator['histogram']
+    lower, upper = latency_histogram_edges(histogram)
+    origin = accumulator['origin'] if accumulator['origin'] is not None else -1
+    longest = int(accumulator['length'].max()) if accumulator['length'].size > 0 else 0
+    np.savez_compressed(filename, sequence=accumulator['sequence'], length=accumulator['length'], timestamp=accumulator['timestamp'],
+                        origin=origin, lost=accumulator['lost'], longest=longest, sub_bucket_bits=histogram['sub_bucket_bits'],
+                        highest_bits=histogram['highest_bits'], counts=histogram['counts'], lower=lower, upper=upper)
+
+
+def merge_loss_bursts(filenames: list) -> tuple:
+    '''
+    Merges the loss bursts of several scenarios (see save_loss_bursts). Only the histograms and the
+    counters are read, not the bursts themselves, so the memory usage does not depend on the number
+    of sequence numbers.
+
+            Parameters:
+                    filenames (list): Paths to the loss burst files (.npz)
+
+            Returns:
+                    statistics (dict): Dictionary containing 'lost', 'bursts', 'longest_burst' and
+                                       'mean_burst_length' of all scenarios
+                    histogram (dict): Merged histogram of the burst lengths
+    '''
+    lost = 0
+    longest = 0
+    histograms = list()
+    for filename in filenames:
+        with np.load(filename) as data:
+            lost += int(data['lost'])
+            longest = max(longest, int(data['longest']))
+            histograms.append({
+                'sub_bucket_bits': int(data['sub_bucket_bits']),
+                'highest_bits': int(data['highest_bits']),
+                'counts': data['counts'].astype(np.int64),
+            })
+    histogram = merge_latency_histograms(histograms)
+    bursts = int(histogram['counts'].sum())
+
+    statistics = {
+        'lost': lost,
+        'bursts': bursts,
+        'longest_burst': longest,
+        'mean_burst_length': lost / bursts if bursts > 0 else 0.0,
+    }
+    return statistics, histogram
+
+
+def __close_loss_bursts(accumulator: dict, sequence: np.ndarray, lengths: np.ndarray, timestamp: np.ndarray) -> None:
+    if lengths.size == 0:
+        return
+
+    accumulator['sequence'].append(sequence.astype(np.int64))
+    accumulator['length'].append(lengths.astype(np.int64))
+    accumulator['timestamp'].append(timestamp.astype(np.int64))
+    record_latency_histogram(accumulator['histogram'], lengths)
+
+
+def stage_latencies(client_timestamps: dict, server_timestamps: dict) -> dict:
+    '''
+    Calculates the latencies between the timestamp stages of matched records (same index in the
+    client and server columns). The stages are ordered like constants.timestamp_stages; the latency
+    between every two consecutive stages is returned (e.g. 'snt_prog_to_rec_sw': sender program to
+    the software receive timestamp of the kernel, 'rec_sw_to_rec_prog': kernel to the receiving
+    program) and, for more than two stages, the latency between the first and the last stage.
+    Records in which one of the two stages is missing are left out.
+
+            Parameters:
+                    client_timestamps (dict): Matched client columns (see timestamp_columns)
+                    server_timestamps (dict): Matched server columns (see timestamp_columns)
+
+            Returns:
+                    latencies (dict): Dictionary of int64 arrays of latencies in nanoseconds by name
+    '''
+    stages = list()
+    for stage in timestamp_stages:
+        if stage in client_timestamps:
+            stages.append((stage, client_timestamps[stage]))
+        elif stage in server_timestamps:
+            stages.append((stage, server_timestamps[stage]))
+
+    pairs = list(zip(stages[:-1], stages[1:]))
+    if len(stages) > 2:
+        pairs.append((stages[0], stages[-1]))
+
+    latencies = dict()
+    for (first, first_values), (second, second_values) in pairs:
+        differences = second_values - first_values
+        valid = (first_values != missing_timestamp) & (second_values != missing_timestamp)
+        latencies[f'{first}_to_{second}'] = differences if valid.all() else differences[valid]
+
+    return latencies
+
+
+def create_latency_accumulator() -> dict:
+    '''
+    Creates an empty latency accumulator. The accumulator collects the statistics of a stream of
+    latencies in constant memory: the exact sum (mean), the sum of squared deviations (Welford /
+    Chan), the minimum and maximum, a latency histogram and the sum of the latencies per histogram
+    bucket (jitter).
+
+            Returns:
+                    accumulator (dict): Dictionary containing the empty accumulator
+    '''
+    histogram = create_latency_histogram()
+
+    return {
+        'count': 0,
+        'total': 0,
+        'm2': 0.0,
+        'minimum': None,
+        'maximum': None,
+        'histogram': histogram,
+        'bucket_sums': np.zeros(histogram['counts'].size, dtype=np.float64),
+    }
+
+
+def update_latency_accumulator(accumulator: dict, differences: np.ndarray) -> None:
+    '''
+    Adds a chunk of latencies to the latency accumulator.
+
+            Parameters:
+                    accumulator (dict): Latency accumulator (see create_latency_accumulator)
+                    differences (np.ndarray): int64 array of latencies in nanoseconds
+
+            Returns:
+                    None
+    '''
+    count = differences.size
+    if count == 0:
+        return
+
+    # Combine the mean and the squared deviations of the chunk with the previous ones (Chan)
+    total = int(differences.sum())
+    chunk_mean = total / count
+    deviations = differences - chunk_mean
+    chunk_m2 = float(np.dot(deviations, deviations))
+
+    if accumulator['count'] > 0:
+        delta = chunk_mean - accumulator['total'] / accumulator['count']
+        chunk_m2 += delta * delta * accumulator['count'] * count / (accumulator['count'] + count)
+
+    accumulator['count'] += count
+    accumulator['total'] += total
+    accumulator['m2'] += chunk_m2
+
+    # Minimum and maximum
+    minimum = int(differences.min())
+    maximum = int(differences.max())
+    accumulator['minimum'] = minimum if accumulator['minimum'] is None else min(accumulator['minimum'], minimum)
+    accumulator['maximum'] = maximum if accumulator['maximum'] is None else max(accumulator['maximum'], maximum)
+
+    # Histogram and latency sums per bucket
+    indices = __latency_histogram_indices(accumulator['histogram'], differences)
+    size = accumulator['histogram']['counts'].size
+    accumulator['histogram']['counts'] += np.bincount(indices, minlength=size)
+    accumulator['bucket_sums'] += np.bincount(indices, weights=differences, minlength=size)
+
+
+def finish_latency_accumulator(accumulator: dict) -> dict:
+    '''
+    Returns the statistics of the latency accumulator with the same keys as latency_statistics. All
+    values are exact except for the jitter: the absolute deviations are summed per histogram bucket,
+    so only the bucket containing the mean contributes an error (bounded by its width).
+
+            Parameters:
+                    accumulator (dict): Latency accumulator (see create_latency_accumulator)
+
+            Returns:
+                    statistics (dict): Dictionary containing the statistics
+    '''
+    count = accumulator['count']
+    average = accumulator['total'] / count
+    standard_deviation = (accumulator['m2'] / count) ** 0.5
+
+    # Mean absolute deviation: buckets below the mean contribute (n * mean - sum), buckets above the
+    # mean (sum - n * mean). The values of the bucket containing the mean are assumed to be uniformly
+    # distributed within the bucket, limited to the minimum and the maximum (the outer buckets also
+    # contain the latencies beyond the trackable range, e.g. for a mean below the first bucket).
+    counts = accumulator['histogram']['counts']
+    deviations = np.abs(accumulator['bucket_sums'] - counts * average)
+
+    minimum = accumulator['minimum']
+    maximum = accumulator['maximum']
+    lower, upper = latency_histogram_edges(accumulator['histogram'])
+    index = min(int(np.searchsorted(upper + 1, average, side='right')), counts.size - 1)
+    low = minimum if index == 0 else max(int(lower[index]), minimum)
+    high = maximum + 1 if index == counts.size - 1 else min(int(upper[index]), maximum) + 1
+    if high - low > 1:
+        deviations[index] = counts[index] * ((average - low) ** 2 + (high - average) ** 2) / (2 * (high - low))
+
+    jitter = float(deviations.sum()) / count
+
+    return {
+        'average_difference': average / 1000000000,
+        'standard_deviation': standard_deviation / 1000000000,
+        'minimum_difference': minimum / 1000000000,
+        'maximum_difference': maximum / 1000000000,
+        'difference_difference': (maximum - minimum) / 1000000000,
+        'jitter': jitter / 1000000000,
+    }
+
+
+def latency_statistics(differences: np.ndarray) -> dict:
+    '''
+    Calculates the statistics of the given latencies. The keys of the returned dictionary match the
+    elements of the <timestamps> block in performance.xml: 'average_difference',
+    'standard_deviation', 'minimum_difference', 'maximum_difference', 'difference_difference' and
+    'jitter' (mean absolute deviation). All values are returned in seconds.
+
+            Parameters:
+                    differences (np.ndarray): int64 array of latencies in nanoseconds
+
+            Returns:
+                    statistics (dict): Dictionary containing the statistics
+    '''
+    count = differences.size
+
+    # The sum is calculated exactly on the integers, the deviations in floating point
+    average = int(differences.sum()) / count
+    deviations = differences - average
+    standard_deviation = (np.dot(deviations, deviations) / count) ** 0.5
+    np.abs(deviations, out=deviations)
+    jitter = deviations.sum() / count
+
+    minimum = int(differences.min())
+    maximum = int(differences.max())
+
+    return {
+        'average_difference': average / 1000000000,
+        'standard_deviation': float(standard_deviation) / 1000000000,
+        'minimum_difference': minimum / 1000000000,
+        'maximum_difference': maximum / 1000000000,
+        'difference_difference': (maximum - minimum) / 1000000000,
+        'jitter': float(jitter) / 1000000000,
+    }
+
+
+def create_latency_histogram() -> dict:
+    '''
+    Creates an empty latency histogram. The histogram uses logarithmic buckets with a fixed number
+    of linear sub-buckets per power of two (similar to an HDR histogram), so its size is fixed and
+    the relative error of a bucket is below 2^-(sub_bucket_bits - 1). Latencies are recorded in
+    nanoseconds. Negative latencies (e.g. clocks with an offset) are recorded in the mirrored
+    buckets below zero, so the buckets are in ascending order from -2^highest_bits to
+    2^highest_bits - 1; values outside are counted in the first or the last bucket. The dictionary
+    contains the following keys: 'sub_bucket_bits', 'highest_bits' and 'counts' (int64 array).
+
+            Returns:
+                    histogram (dict): Dictionary containing the empty histogram
+    '''
+    sub_bucket_bits = evaluation['histogram']['sub_bucket_bits']
+    highest_bits = evaluation['histogram']['highest_bits']
+
+    return {
+        'sub_bucket_bits': sub_bucket_bits,
+        'highest_bits': highest_bits,
+        'counts': np.zeros(2 * __latency_histogram_buckets(sub_bucket_bits, highest_bits), dtype=np.int64),
+    }
+
+
+def record_latency_histogram(histogram: dict, differences: np.ndarray) -> None:
+    '''
+    Records the given latencies in the latency histogram.
+
+            Parameters:
+                    histogram (dict): Latency histogram (see create_latency_histogram)
+                    differences (np.ndarray): int64 array of latencies in nanoseconds
+
+            Returns:
+                    None
+    '''
+    indices = __latency_histogram_indices(histogram, differences)
+    histogram['counts'] += np.bincount(indices, minlength=histogram['counts'].size)
+
+
+def merge_latency_histograms(histograms: list) -> dict:
+    '''
+    Merges the given latency histograms (e.g. of several scenarios or campaigns) into a new one.
+    All histograms must use the same bucket layout.
+
+            Parameters:
+                    histograms (list): List of latency histograms (see create_latency_histogram)
+
+            Returns:
+                    histogram (dict): Dictionary containing the merged histogram
+    '''
+    merged = create_latency_histogram()
+    for histogram in histograms:
+        if histogram['sub_bucket_bits'] != merged['sub_bucket_bits'] or histogram['highest_bits'] != merged['highest_bits'] or histogram['counts'].size != merged['counts'].size:
+            raise ValueError('Latency histograms with different bucket layouts cannot be merged.')
+        merged['counts'] += histogram['counts']
+
+    return merged
+
+
+def latency_histogram_edges(histogram: dict) -> tuple:
+    '''
+    Returns the lowest and the highest latency (in nanoseconds) of every bucket of the histogram.
+
+            Parameters:
+                    histogram (dict): Latency histogram (see create_latency_histogram)
+
+            Returns:
+                    lower (np.ndarray): int64 array of the lowest latency of each bucket
+                    upper (np.ndarray): int64 array of the highest latency of each bucket
+    '''
+    sub_bucket_bits = histogram['sub_bucket_bits']
+    sub_buckets = 1 << sub_bucket_bits
+    half_sub_buckets = sub_buckets >> 1
+
+    indices = np.arange(histogram['counts'].size // 2, dtype=np.int64)
+    shift = np.where(indices < sub_buckets, 0, (indices - sub_buckets) // half_sub_buckets + 1)
+    sub_bucket = np.where(indices < sub_buckets, indices, (indices - sub_buckets) % half_sub_buckets + half_sub_buckets)
+
+    lower = sub_bucket << shift
+    upper = ((sub_bucket + 1) << shift) - 1
+
+    # The negative buckets mirror the positive ones (bucket -1 to -1 mirrors 0 to 0)
+    return np.concatenate((-upper[::-1] - 1, lower)), np.concatenate((-lower[::-1] - 1, upper))
+
+
+def latency_histogram_percentile(histogram: dict, percentile: float) -> int:
+    '''
+    Returns the latency (in nanoseconds) at the given percentile. The value is the highest latency
+    of the bucket containing the percentile.
+
+            Parameters:
+                    histogram (dict): Latency histogram (see create_latency_histogram)
+                    percentile (float): Percentile between 0 and 100
+
+            Returns:
+                    value (int): Latency at the percentile in nanoseconds (-1 if the histogram is empty)
+    '''
+    cumulative_counts = np.cumsum(histogram['counts'])
+    total = int(cumulative_counts[-1])
+    if total == 0:
+        return -1
+
+    rank = max(int(np.ceil(percentile / 100 * total)), 1)
+    index = int(np.searchsorted(cumulative_counts, rank, side='left'))
+
+    _, upper = latency_histogram_edges(histogram)
+    return int(upper[index])
+
+
+def percentile_tag(percentile: float) -> str:
+    '''
+    Returns the XML tag of the given percentile (e.g. 'p99_9' for 99.9).
+    '''
+    return 'p' + f'{percentile:g}'.replace('.', '_')
+
+
+def save_latency_histogram(histogram: dict, filename: str) -> None:
+    '''
+    Saves the latency histogram as a compressed NumPy file. Besides the counts, the bucket edges are
+    stored, so the file can be evaluated without this module (see PerformanceDiagrammCreator).
+
+            Parameters:
+                    histogram (dict): Latency histogram (see create_latency_histogram)
+                    filename (str): Path to the output file (.npz)
+
+            Returns:
+                    None
+    '''
+    lower, upper = latency_histogram_edges(histogram)
+    np.savez_compressed(filename, sub_bucket_bits=histogram['sub_bucket_bits'], highest_bits=histogram['highest_bits'], counts=histogram['counts'], lower=lower, upper=upper)
+
+
+def load_latency_histogram(filename: str) -> dict:
+    '''
+    Loads a latency histogram saved with save_latency_histogram.
+
+            Parameters:
+                    filename (str): Path to the histogram file (.npz)
+
+            Returns:
+                    histogram (dict): Dictionary containing the histogram
+    '''
+    with np.load(filename) as data:
+        return {
+            'sub_bucket_bits': int(data['sub_bucket_bits']),
+            'highest_bits': int(data['highest_bits']),
+            'counts': data['counts'].astype(np.int64),
+        }
+
+
+def __latency_histogram_buckets(sub_bucket_bits: int, highest_bits: int) -> int:
+    # Number of buckets of the non-negative latencies
+    return (1 << sub_bucket_bits) + (highest_bits - sub_bucket_bits) * (1 << (sub_bucket_bits - 1))
+
+
+def __latency_histogram_indices(histogram: dict, differences: np.ndarray) -> np.ndarray:
+    sub_bucket_bits = histogram['sub_bucket_bits']
+    sub_buckets = 1 << sub_bucket_bits
+    half_sub_buckets = sub_buckets >> 1
+    zero = histogram['counts'].size // 2
+
+    # Negative values are stored mirrored (-1 like 0, -2 like 1, ...) below the bucket of zero
+    negative = differences < 0
+    values = np.clip(np.where(negative, -1 - differences, differences), 0, (1 << histogram['highest_bits']) - 1).astype(np.int64)
+
+    # Values below the number of sub-buckets are stored linearly, all others in the sub-bucket of
+    # their power of two (the values are exactly representable as float64, so frexp is exact)
+    shift = np.maximum(np.frexp(values.astype(np.float64))[1] - sub_bucket_bits, 0)
+    indices = np.where(shift == 0, values, sub_buckets + (shift - 1) * half_sub_buckets + (values >> shift) - half_sub_buckets)
+    return np.where(negative, zero - 1 - indices, zero + indices)
+
+
+def __empty_timestamp_columns() -> dict:
+    return {'sequence': np.empty(0, dtype=np.int64), 'timestamp': np.empty(0, dtype=np.int64)}
+
+
+def __concatenate_timestamp_columns(columns: dict, chunk: dict) -> dict:
+    # Stages that are only present in one of the two are filled with missing_timestamp
+    size = columns['sequence'].size
+    chunk_size = chunk['sequence'].size
+    keys = list(columns.keys()) + [key for key in chunk.keys() if key not in columns]
+
+    return {key: np.concatenate((columns[key] if key in columns else np.full(size, missing_timestamp, dtype=np.int64),
+                                 chunk[key] if key in chunk else np.full(chunk_size, missing_timestamp, dtype=np.int64))) for key in keys}
+
+
+def __remove_timestamp_columns(columns: dict, indices: np.ndarray) -> dict:
+    keep = np.ones(columns['sequence'].size, dtype=bool)
+    keep[indices] = False
+    return {key: values[keep] for key, values in columns.items()}
 
 
 def indent(elem, level=0, more_sibs=False):
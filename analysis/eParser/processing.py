@@ -0,0 +1,181 @@
+import os
+import csv
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from constants import test_results_file, evaluation, parsing
+from parsing import parse_description_file, parse_test_results, iterate_timestamp_messages
+from file_management import check_server_data
+from archive import file_stat
+from cache import parse_test_folder
+from performance_evaluation import evaluate_performance, evaluate_performance_stream, join_timestamps, merge_loss_bursts, save_latency_histogram, latency_histogram_percentile, percentile_tag, indent
+from profiling import profile_stage
+
+
+def process_test_folder(test_folder: str, client_path: str, server_path: str, campaign_folder: str, cache_folder: str = None, evaluate: bool = True) -> tuple:
+    '''
+    Parses and evaluates a single test folder of a campaign and writes its output (performance.xml,
+    latency histogram, ...) to the campaign folder. Only the small parts of the test scenario and a
+    summary are returned, so the function can be executed in a worker process without sending the
+    timestamps back to the parent. If the test results do not contain the number of lost datagrams
+    (current TestSuite versions), it is taken from the timestamps (client records without a server
+    record) where available.
+
+            Parameters:
+                    test_folder (str): Name of the test folder
+                    client_path (str): Path to the folder containing the client test folders
+                    server_path (str): Path to the folder containing the server test folders
+                    campaign_folder (str): Path to the output folder of the campaign
+                    cache_folder (str): Path to the cache folder (optional, None disables the cache)
+                    evaluate (bool): Evaluate the timestamps (optional, otherwise only parse)
+
+            Returns:
+                    scenario (tuple): Test scenario (description, client results, server results, query)
+                    summary (dict): Dictionary containing the summary of the test folder
+    '''
+    print(f'Processing test scenario {test_folder}... (at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")})')
+
+    test_folder_client = os.path.join(client_path, test_folder)
+
+    # Check if server data exists
+    server_data = check_server_data(server_path, test_folder)
+    if server_data:
+        test_folder_server = os.path.join(server_path, test_folder)
+
+    scenario_name = f'{os.path.basename(campaign_folder)}/{test_folder}'
+    streaming = evaluation['streaming']['enabled']
+    with profile_stage('parse', scenario_name) as entry:
+        # Stream the timestamps chunk by chunk (constant memory, the test results file is read twice)
+        if streaming:
+            description = parse_description_file(test_folder_client)
+            client_results, query, _ = parse_test_results(test_folder_client, timestamps=False, stride=parsing['query_stride'], max_reports=parsing['max_reports'])
+            client_timestamps = iterate_timestamp_messages(test_folder_client, evaluation['streaming']['chunk_size'], columnar=True)
+            if server_data:
+                server_results, _, _ = parse_test_results(test_folder_server, timestamps=False, stride=parsing['query_stride'], max_reports=parsing['max_reports'])
+                server_timestamps = iterate_timestamp_messages(test_folder_server, evaluation['streaming']['chunk_size'], columnar=True)
+
+        # Parse the test description and results files (or load them from the cache)
+        else:
+            description, client_results, query, client_timestamps = parse_test_folder(test_folder_client, cache_folder)
+            entry['records'] = 0 if client_timestamps is None else client_timestamps['sequence'].size
+            if server_data:
+                _, server_results, _, server_timestamps = parse_test_folder(test_folder_server, cache_folder, description=False)
+                entry['records'] += 0 if server_timestamps is None else server_timestamps['sequence'].size
+
+        # Size of the test results files (replaced by the measured value where available)
+        folders = [test_folder_client, test_folder_server] if server_data else [test_folder_client]
+        entry['bytes_read'] = sum(file_stat(os.path.join(folder, test_results_file))['size'] for folder in folders)
+
+    if not server_data:
+        server_results = None
+        server_timestamps = None
+
+    timestamps = None
+    if evaluate:
+        with profile_stage('evaluate', scenario_name) as entry:
+            test = (description, client_results, server_results, client_timestamps, server_timestamps)
+            output_folder = os.path.join(campaign_folder, test[0]['metadata']['t_uid'])
+            if streaming:
+                timestamps = evaluate_performance_stream(test, output_folder)
+            else:
+                timestamps = evaluate_performance(test, output_folder)
+
+            if timestamps is not None:
+                entry['records'] = int(timestamps['matched'])
+
+    # Current TestSuite versions do not report the losses (num_loss), they are taken from the join of
+    # the client and server timestamps
+    if 'losses' not in client_results['report']:
+        losses = __timestamp_losses(client_timestamps, server_timestamps, timestamps, streaming)
+        if losses is not None:
+            client_results['report']['losses'] = losses
+
+    summary = {
+        'test_folder': test_folder,
+        't_uid': description['metadata']['t_uid'],
+        'datagram_size': description['connection']['datagram_size'],
+        'cycle_time': description['connection']['cycle_time'],
+        'server_data': server_data,
+    }
+    if timestamps is not None:
+        summary.update(timestamps)
+
+    return (description, client_results, server_results, query), summary
+
+
+def write_campaign_summary(summaries: list, campaign_folder: str) -> None:
+    '''
+    Writes the summaries of all test folders of a campaign to a CSV file (performance_overview.csv)
+    in the campaign folder. The rows are written in the given order.
+
+            Parameters:
+                    summaries (list): List of summaries (see process_test_folder)
+                    campaign_folder (str): Path to the output folder of the campaign
+
+            Returns:
+                    None
+    '''
+    filename = os.path.join(campaign_folder, 'performance_overview.csv')
+
+    columns = [('test_folder', 'Test Folder'), ('t_uid', 'Test-ID'),
+               ('datagram_size', 'Datagram Size (B)'), ('cycle_time', 'Cycle Time (ns)'),
+               ('server_data', 'Server Data'),
+               ('matched', 'Matched'), ('client_only', 'Client Only'), ('server_only', 'Server Only'),
+               ('packet_loss', 'Packet Loss'), ('in_order', 'In Order'),
+               ('average_difference', 'Latency [avg](s)'), ('standard_deviation', 'Latency [std](s)'),
+               ('minimum_difference', 'Latency [min](s)'), ('maximum_difference', 'Latency [max](s)'),
+               ('jitter', 'Jitter (s)')]
+
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Write header
+        writer.writerow([title for _, title in columns])
+
+        # Write content
+        for summary in summaries:
+            writer.writerow([summary.get(key, '') for key, _ in columns])
+
+
+def write_campaign_loss_bursts(summaries: list, campaign_folder: str) -> None:
+    '''
+    Aggregates the loss bursts of all evaluated test folders of a campaign (loss_bursts.npz of the
+    scenarios, see performance_evaluation.save_loss_bursts) and writes the totals and the
+    percentiles of the burst lengths to loss_bursts.xml and the merged histogram of the burst
+    lengths to loss_bursts.npz in the campaign folder.
+
+            Parameters:
+                    summaries (list): List of summaries (see process_test_folder)
+                    campaign_folder (str): Path to the output folder of the campaign
+
+            Returns:
+                    None
+    '''
+    filenames = [os.path.join(campaign_folder, summary['t_uid'], 'loss_bursts.npz') for summary in summaries]
+    filenames = [filename for filename in filenames if os.path.exists(filename)]
+    if len(filenames) == 0:
+        return
+
+    statistics, histogram = merge_loss_bursts(filenames)
+
+    root = ET.Element('loss_bursts')
+    ET.SubElement(root, 'scenarios').text = str(len(filenames))
+    for key, value in statistics.items():
+        ET.SubElement(root, key).text = str(value)
+    for percentile in evaluation['percentiles']:
+        ET.SubElement(root, percentile_tag(percentile)).text = str(latency_histogram_percentile(histogram, percentile))
+
+    tree = ET.ElementTree(root)
+    indent(tree.getroot())
+    tree.write(os.path.join(campaign_folder, 'loss_bursts.xml'), encoding='utf-8', xml_declaration=True)
+    save_latency_histogram(histogram, os.path.join(campaign_folder, 'loss_bursts.npz'))
+
+
+def __timestamp_losses(client_timestamps: dict, server_timestamps: dict, timestamps: dict, streaming: bool) -> int:
+    # Client records without a server record, None if the timestamps are not available (streamed
+    # timestamps can only be joined by the evaluation)
+    if timestamps is not None:
+        return int(timestamps['client_only'])
+    if streaming or client_timestamps is None or server_timestamps is None:
+        return None
+
+    return int(join_timestamps(client_timestamps, server_timestamps)['client_only'])
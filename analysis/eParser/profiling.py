@@ -0,0 +1,247 @@
+import os
+import csv
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None   # not available on Windows
+
+# Profiling state of the current process (the worker processes are configured by the scheduler)
+profiling = {
+    'enabled': False,
+    'memory': False,
+}
+
+# Finished profile entries of the current process and the stages that are currently running
+profile_entries = list()
+running_stages = list()
+
+profile_columns = ['stage', 'step', 'scenario', 'pid', 'start', 'duration', 'peak_rss', 'peak_traced', 'records', 'bytes_read']
+
+
+def configure_profiling(enabled: bool, memory: bool = False) -> None:
+    '''
+    Enables or disables the profiling of the current process. If memory is set, the Python
+    allocations are traced with tracemalloc as well (slows down the execution noticeably).
+
+            Parameters:
+                    enabled (bool): Record the stages
+                    memory (bool): Trace the Python allocations (optional)
+
+            Returns:
+                    None
+    '''
+    profiling['enabled'] = enabled
+    profiling['memory'] = enabled and memory
+
+    if profiling['memory'] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not profiling['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def profiling_state() -> tuple:
+    '''
+    Returns the profiling settings of the current process (arguments of configure_profiling).
+
+            Returns:
+                    state (tuple): Tuple containing enabled and memory
+    '''
+    return profiling['enabled'], profiling['memory']
+
+
+@contextmanager
+def profile_stage(stage: str, scenario: str = None, step: str = None):
+    '''
+    Records the duration, the peak memory (RSS and, if enabled, traced Python allocations) of a
+    stage. The caller can add the number of processed records and the number of bytes read to the
+    yielded entry ('records', 'bytes_read'). On Linux the bytes read are measured (/proc/self/io)
+    and replace the value of the caller. Stages can be nested, the peaks of an inner stage are
+    included in the outer stage. Nothing is recorded if profiling is disabled.
+
+            Parameters:
+                    stage (str): Name of the stage (e.g. 'parse', 'evaluate', 'tables', 'graphs')
+                    scenario (str): Name of the test scenario or campaign (optional)
+                    step (str): Name of the step within the stage (optional)
+
+            Yields:
+                    entry (dict): Dictionary containing the profile entry
+    '''
+    entry = {'stage': stage, 'step': step, 'scenario': scenario, 'pid': os.getpid(), 'start': time.time(),
+             'duration': None, 'peak_rss': None, 'peak_traced': None, 'records': None, 'bytes_read': None}
+    if not profiling['enabled']:
+        yield entry
+        return
+
+    # The peaks are reset for the new stage, the peaks so far are kept by the outer stage
+    __update_peaks()
+    entry['peak_rss'] = __reset_peak_rss()
+    entry['peak_traced'] = __reset_peak_traced()
+
+    running_stages.append(entry)
+    bytes_read = __bytes_read()
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry['duration'] = time.perf_counter() - start
+        if bytes_read is not None:
+            entry['bytes_read'] = __bytes_read() - bytes_read
+        __update_peaks()
+        running_stages.pop()
+
+        if len(running_stages) > 0:
+            outer = running_stages[-1]
+            outer['peak_rss'] = __maximum(outer['peak_rss'], entry['peak_rss'])
+            outer['peak_traced'] = __maximum(outer['peak_traced'], entry['peak_traced'])
+
+        profile_entries.append(entry)
+
+
+def collect_profile() -> list:
+    '''
+    Returns the finished profile entries of the current process and removes them (used to send
+    the entries of a worker process back to the parent).
+
+            Returns:
+                    entries (list): List of profile entries
+    '''
+    entries = list(profile_entries)
+    profile_entries.clear()
+    return entries
+
+
+def add_profile(entries: list) -> None:
+    '''
+    Adds profile entries (e.g. collected in a worker process) to the profile of the current process.
+
+            Parameters:
+                    entries (list): List of profile entries
+
+            Returns:
+                    None
+    '''
+    profile_entries.extend(entries)
+
+
+def write_profile(output_folder: str) -> None:
+    '''
+    Writes the recorded profile entries to profile.json and profile.csv in the output folder.
+    Durations are given in seconds, memory and bytes in bytes.
+
+            Parameters:
+                    output_folder (str): Path to the output folder
+
+            Returns:
+                    None
+    '''
+    entries = sorted(profile_entries, key=lambda entry: entry['start'])
+
+    with open(os.path.join(output_folder, 'profile.json'), 'w', encoding='utf-8') as file:
+        json.dump({'memory': profiling['memory'], 'entries': entries}, file, indent=1)
+
+    with open(os.path.join(output_folder, 'profile.csv'), 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=profile_columns)
+        writer.writeheader()
+        writer.writerows(entries)
+
+
+def print_profile_summary() -> None:
+    '''
+    Prints a summary of the recorded profile entries (per stage and step: number of entries, total,
+    mean and maximum duration, maximum peak memory, records and bytes read).
+
+            Returns:
+                    None
+    '''
+    summary = dict()
+    for entry in profile_entries:
+        key = (entry['stage'], entry['step'] or '')
+        values = summary.setdefault(key, {'count': 0, 'total': 0.0, 'maximum': 0.0, 'peak_rss': None, 'peak_traced': None, 'records': 0, 'bytes_read': 0})
+        values['count'] += 1
+        values['total'] += entry['duration']
+        values['maximum'] = max(values['maximum'], entry['duration'])
+        values['peak_rss'] = __maximum(values['peak_rss'], entry['peak_rss'])
+        values['peak_traced'] = __maximum(values['peak_traced'], entry['peak_traced'])
+        values['records'] += entry['records'] or 0
+        values['bytes_read'] += entry['bytes_read'] or 0
+
+    print(f'{"Stage":<12}{"Step":<28}{"Count":>7}{"Total (s)":>12}{"Mean (s)":>11}{"Max (s)":>10}{"RSS (MiB)":>11}{"Traced (MiB)":>14}{"Records":>13}{"Read (MiB)":>12}')
+    for (stage, step), values in sorted(summary.items()):
+        peak_rss = f'{values["peak_rss"] / 1048576:.1f}' if values['peak_rss'] is not None else '-'
+        peak_traced = f'{values["peak_traced"] / 1048576:.1f}' if values['peak_traced'] is not None else '-'
+        print(f'{stage:<12}{step:<28}{values["count"]:>7}{values["total"]:>12.3f}{values["total"] / values["count"]:>11.3f}{values["maximum"]:>10.3f}'
+              f'{peak_rss:>11}{peak_traced:>14}{values["records"]:>13}{values["bytes_read"] / 1048576:>12.1f}')
+
+
+def __update_peaks() -> None:
+    # Adds the current peaks to the running stage
+    if len(running_stages) == 0:
+        return
+
+    entry = running_stages[-1]
+    entry['peak_rss'] = __maximum(entry['peak_rss'], __peak_rss())
+    if profiling['memory']:
+        entry['peak_traced'] = __maximum(entry['peak_traced'], tracemalloc.get_traced_memory()[1])
+
+
+def __reset_peak_rss() -> int:
+    # Linux allows to reset the peak RSS of the process (VmHWM), otherwise the peak since the start
+    # of the process is used
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+    return __peak_rss()
+
+
+def __peak_rss() -> int:
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+
+    # ru_maxrss is given in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+def __bytes_read() -> int:
+    # Number of bytes read by the process so far (Linux only)
+    try:
+        with open('/proc/self/io', 'r') as file:
+            for line in file:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return None
+
+
+def __reset_peak_traced() -> int:
+    if not profiling['memory']:
+        return None
+
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[1]
+
+
+def __maximum(first: int, second: int) -> int:
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return max(first, second)
@@ -0,0 +1,147 @@
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, wait
+from constants import worker_count
+from profiling import configure_profiling, profiling_state, collect_profile, add_profile
+
+
+def create_scheduler(jobs: int = None) -> dict:
+    '''
+    Creates a task scheduler with a fixed number of worker processes. The table and graph producers
+    submit their tasks to the scheduler instead of starting one process per task. At most twice
+    the number of workers are pending at once, submit_task blocks until a slot becomes free.
+    With a single worker the tasks are executed directly in the calling process. The workers use
+    the profiling settings of the calling process, their profile entries are sent back with the
+    results of the tasks.
+
+            Parameters:
+                    jobs (int): Number of worker processes (optional, 0 = automatic, see worker_count)
+
+            Returns:
+                    scheduler (dict): Dictionary containing the executor and the pending tasks
+    '''
+    workers = worker_count(jobs)
+
+    scheduler = {
+        'workers': workers,
+        'executor': None,
+        'slots': None,
+        'futures': [],
+    }
+    if workers > 1:
+        scheduler['executor'] = ProcessPoolExecutor(max_workers=workers, initializer=configure_profiling, initargs=profiling_state())
+        scheduler['slots'] = threading.BoundedSemaphore(2 * workers)
+
+    return scheduler
+
+
+def submit_task(scheduler: dict, function, *args) -> None:
+    '''
+    Submits a task to the scheduler. Without a scheduler (or with a single worker) the task is
+    executed directly. Errors of finished tasks are raised on the next submission, so a failing
+    producer does not go unnoticed until the end.
+
+            Parameters:
+                    scheduler (dict): Task scheduler (see create_scheduler, None = direct execution)
+                    function (callable): Function to execute (must be picklable)
+                    args: Arguments of the function
+
+            Returns:
+                    None
+    '''
+    if (scheduler is None) or (scheduler['executor'] is None):
+        function(*args)
+        return
+
+    __raise_task_errors(scheduler, [future for future in scheduler['futures'] if future.done()])
+
+    # Wait for a free slot (backpressure)
+    slots = scheduler['slots']
+    slots.acquire()
+    try:
+        future = scheduler['executor'].submit(_run_task, function, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    scheduler['futures'].append(future)
+
+
+def map_tasks(scheduler: dict, function, *iterables) -> list:
+    '''
+    Executes the function for each set of arguments on the workers of the scheduler and returns
+    the results in the order of the arguments. Errors are raised directly.
+
+            Parameters:
+                    scheduler (dict): Task scheduler (see create_scheduler, None = direct execution)
+                    function (callable): Function to execute (must be picklable)
+                    iterables: Iterables containing the arguments of the function
+
+            Returns:
+                    results (list): List of the return values
+    '''
+    if (scheduler is None) or (scheduler['executor'] is None):
+        return list(map(function, *iterables))
+
+    results = list()
+    for result, entries in scheduler['executor'].map(_run_task, repeat(function), *iterables):
+        add_profile(entries)
+        results.append(result)
+
+    return results
+
+
+def wait_for_tasks(scheduler: dict) -> None:
+    '''
+    Waits until all submitted tasks are finished. The first error of a failed task is raised
+    after all tasks are finished.
+
+            Parameters:
+                    scheduler (dict): Task scheduler (see create_scheduler, None = direct execution)
+
+            Returns:
+                    None
+    '''
+    if (scheduler is None) or (scheduler['executor'] is None):
+        return
+
+    wait(scheduler['futures'])
+    __raise_task_errors(scheduler, list(scheduler['futures']))
+
+
+def close_scheduler(scheduler: dict) -> None:
+    '''
+    Waits for all submitted tasks and shuts down the worker processes of the scheduler.
+
+            Parameters:
+                    scheduler (dict): Task scheduler (see create_scheduler, None = direct execution)
+
+            Returns:
+                    None
+    '''
+    if (scheduler is None) or (scheduler['executor'] is None):
+        return
+
+    try:
+        wait_for_tasks(scheduler)
+    finally:
+        scheduler['executor'].shutdown(wait=True, cancel_futures=True)
+        scheduler['executor'] = None
+
+
+def _run_task(function, *args) -> tuple:
+    # Executed in the worker process, returns the result and the profile entries of the task
+    result = function(*args)
+    return result, collect_profile()
+
+
+def __raise_task_errors(scheduler: dict, finished: list) -> None:
+    # Remove the finished tasks, collect their profile entries and raise the first error
+    for future in finished:
+        scheduler['futures'].remove(future)
+
+    for future in finished:
+        error = future.exception()
+        if error is not None:
+            raise error
+        add_profile(future.result()[1])
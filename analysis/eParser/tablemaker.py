@@ -1,25 +1,23 @@
 import csv
 import math
 import os
-from multiprocessing import Process
-import pandas as pd
-import openpyxl
-from openpyxl.worksheet.table import TableStyleInfo
-from openpyxl.styles import Alignment, Font
 from data_format import format_query
-from constants import tables, concurrent_execution
+from constants import tables
+from scheduler import submit_task
+from profiling import profile_stage
 
 
-def write_test_table(test_data: list, campaign_name: str, campaign_folder: str, processes: list=None) -> None:
+def write_test_table(test_data: list, campaign_name: str, campaign_folder: str, scheduler: dict=None) -> None:
     '''
     Creates a table with all test scenarios and their results. Analyzes the data and adds remarks
     if necessary. Checks the NIC and UDP statistics for losses and add hints. Saves the table as
-    a CSV file and as an Excel file (optional).
+    a CSV file and as an Excel file (optional). The loss columns are left empty for test scenarios
+    without known losses (neither in the test results nor from the timestamps).
 
             Parameters:
                     test_data (list): List of parsed test scenarios
                     campaign_folder (str): Path to the folder where the table should be saved
-                    processes (list): List of processes (optional, used for concurrent execution)
+                    scheduler (dict): Task scheduler (optional, used for concurrent execution)
 
             Returns:
                     None
@@ -28,15 +26,14 @@ def write_test_table(test_data: list, campaign_name: str, campaign_folder: str,
     if not os.path.exists(campaign_path):
         os.makedirs(campaign_path)
 
-    if concurrent_execution():
-        process = Process(target=__write_test_table, args=(test_data, campaign_name, campaign_path))
-        process.start()
-        processes.append(process)
-    else:
-        __write_test_table(test_data, campaign_name, campaign_path)
+    for test_scenario in test_data:
+        if 'losses' not in test_scenario[1]['report']:
+            print(f"Error: Losses of test scenario {test_scenario[0]['metadata']['t_uid']} are unknown, the loss columns are left empty!")
+
+    submit_task(scheduler, __write_test_table, test_data, campaign_name, campaign_path)
 
 
-def write_query_table(test_data: list, campaign_folder: str, processes: list=None) -> None:
+def write_query_table(test_data: list, campaign_folder: str, scheduler: dict=None) -> None:
     '''
     Creates a table with all query messages and their responses and timestamps. Saves the table as
     a CSV file and as an Excel file (optional).
@@ -44,7 +41,7 @@ def write_query_table(test_data: list, campaign_folder: str, processes: list=Non
             Parameters:
                     test_data (list): List of parsed test scenarios
                     campaign_folder (str): Path to the folder where the table should be saved
-                    processes (list): List of processes (optional, used for concurrent execution)
+                    scheduler (dict): Task scheduler (optional, used for concurrent execution)
 
             Returns:
                     None
@@ -54,21 +51,17 @@ def write_query_table(test_data: list, campaign_folder: str, processes: list=Non
         os.makedirs(scenario_path)
 
     for test_scenario in test_data:
-        if (test_scenario[3] is not None) and (test_scenario[3] != []):
+        if (test_scenario[3] is not None) and (test_scenario[3]['losses'].size > 0) and ('losses' in test_scenario[1]['report']):
             scenario_subpath = os.path.join(scenario_path, f"{test_scenario[0]['metadata']['t_uid']} (C {test_scenario[0]['connection']['client_ip']}) (S {test_scenario[0]['connection']['server_ip']})")
 
-            if concurrent_execution():
-                process = Process(target=__write_query_table, args=(test_scenario, scenario_subpath))
-                process.start()
-                processes.append(process)
-            else:
-                __write_query_table(test_scenario, scenario_subpath)
+            submit_task(scheduler, __write_query_table, test_scenario, scenario_subpath)
 
 
 def __write_test_table(test_data: list, campaign_name: str, output_path: str) -> None:
     filename = os.path.join(output_path, f"{campaign_name}_campaign_overview.csv")
 
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+    with profile_stage('tables', campaign_name, 'campaign_overview') as entry, open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        entry['records'] = len(test_data)
         writer = csv.writer(csvfile)
 
         # Write header
@@ -87,7 +80,9 @@ def __write_test_table(test_data: list, campaign_name: str, output_path: str) ->
             scenario_data = __get_scenario_data(scenario)
             writer.writerow(scenario_data)
 
-    __save_as_excel(filename, output_path, True)
+    with profile_stage('tables', campaign_name, 'excel') as entry:
+        entry['records'] = len(test_data)
+        __save_as_excel(filename, output_path, True)
 
 
 def __get_scenario_data(scenario: tuple) -> list:
@@ -125,9 +120,12 @@ def __get_scenario_data(scenario: tuple) -> list:
     scenario_data.append(scenario_client_results['status'])
 
     # LOSSES
-    losses = scenario_client_results['report']['losses']
-    losses_ratio = losses / scenario_client_results['report']['total']
-    losses_location = __get_losses_location(scenario_client_results, scenario_server_results)
+    if 'losses' in scenario_client_results['report']:
+        losses = scenario_client_results['report']['losses']
+        losses_ratio = losses / scenario_client_results['report']['total']
+        losses_location = __get_losses_location(scenario_client_results, scenario_server_results)
+    else:
+        losses, losses_ratio, losses_location = '', '', ''
 
     scenario_data.append(losses)
     scenario_data.append(losses_ratio)
@@ -197,29 +195,38 @@ def __write_query_table(test_scenario: dict, output_path: str) -> None:
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     filename = os.path.join(output_path, "query_overview.csv")
+    t_uid = test_scenario[0]['metadata']['t_uid']
 
     duration = test_scenario[1]['report']['duration']
     losses = test_scenario[1]['report']['losses']
     total  = test_scenario[1]['report']['total']
     query = format_query(test_scenario[3], duration, losses, total)
 
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+    with profile_stage('tables', t_uid, 'query_overview') as entry, open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        entry['records'] = query['losses'].size
         writer = csv.writer(csvfile)
 
         # Write header
         writer.writerow(['Timestamp', 'Packets [total]', 'Losses [Total]', 'Losses [Difference]'])
 
         # Write content
-        for report in query:
-            writer.writerow([report['timestamp'], report['total'], report['losses'], report['difference']])
+        writer.writerows(zip(query['timestamp'].tolist(), query['total'].tolist(), query['losses'].tolist(), query['difference'].tolist()))
 
     # Get the number of query messages
-    if len(query) < 1048576:
-        __save_as_excel(filename, output_path)
+    if query['losses'].size < 1048576:
+        with profile_stage('tables', t_uid, 'excel') as entry:
+            entry['records'] = query['losses'].size
+            __save_as_excel(filename, output_path)
 
 
 def __save_as_excel(csv_path: str, output_path: str, overview_file = False) -> None:
     if tables['excel']['generate']:
+        # The Excel backends are imported here, they are slow to load and only needed for this stage
+        import pandas as pd
+        import openpyxl
+        from openpyxl.worksheet.table import TableStyleInfo
+        from openpyxl.styles import Alignment, Font
+
         filename = os.path.join(output_path, f"{os.path.splitext(os.path.basename(csv_path))[0]}.xlsx")
 
         # Load the CSV data into a DataFrame
@@ -292,6 +299,8 @@ def __set_automatic_column_lenght(column: str, worksheet, padding=2) -> None:
 
 
 def __set_column_style(column: str, worksheet, font_name: str, bold: bool=False, number_format: str=None) -> None:
+    from openpyxl.styles import Font
+
     for cell in worksheet[column][1:]:
         if number_format is not None:
             cell.number_format = number_format
@@ -0,0 +1,50 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The modules of the eParser (and the synthetic data generator of the benchmarks and the parsing
+# module of the PerformanceDiagrammCreator) are imported like in eParser.py, without a package
+eparser_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, eparser_folder)
+sys.path.insert(0, os.path.join(eparser_folder, 'benchmarks'))
+sys.path.insert(0, os.path.join(eparser_folder, 'PerformanceDiagrammCreator'))
+
+from constants import parsing, evaluation
+from synthetic import write_test_folder
+
+
+@pytest.fixture
+def settings():
+    # Changes of the parsing and evaluation options are reverted after the test
+    saved = {'parsing': dict(parsing), 'evaluation': {key: dict(value) if isinstance(value, dict) else value for key, value in evaluation.items()}}
+    yield {'parsing': parsing, 'evaluation': evaluation}
+    parsing.clear()
+    parsing.update(saved['parsing'])
+    evaluation.clear()
+    evaluation.update(saved['evaluation'])
+
+
+@pytest.fixture
+def test_folder(tmp_path):
+    # Synthetic test folder with losses, bursts, reordering, query messages and all stages
+    write_test_folder(str(tmp_path), 'campaign', 'scenario', 't1', 2500, seed=1, loss=0.01, burst=2, reorder=0.01, queries=3, latency='FULL')
+    return {side: os.path.join(str(tmp_path), 'campaign', side, 'scenario', 't1') for side in ('client', 'server')}
+
+
+def assert_identical(first, second):
+    # Deep comparison of parsed results (NumPy arrays must also have the same dtype)
+    if isinstance(first, np.ndarray) or isinstance(second, np.ndarray):
+        assert isinstance(first, np.ndarray) and isinstance(second, np.ndarray)
+        assert first.dtype == second.dtype
+        np.testing.assert_array_equal(first, second)
+    elif isinstance(first, dict):
+        assert isinstance(second, dict) and first.keys() == second.keys()
+        for key in first:
+            assert_identical(first[key], second[key])
+    elif isinstance(first, (list, tuple)):
+        assert isinstance(second, (list, tuple)) and len(first) == len(second)
+        for a, b in zip(first, second):
+            assert_identical(a, b)
+    else:
+        assert first == second
@@ -0,0 +1,84 @@
+import os
+import tarfile
+import zipfile
+import py7zr
+import pytest
+import zstandard
+import archive
+from archive import list_folder, file_stat, open_file, remove_extracted_archives
+from synthetic import write_test_folder
+
+
+def pack_campaign(results_folder: str, extension: str) -> str:
+    # Packs the campaign folder (with the folder itself as root, like the raw reliability archives)
+    campaign_folder = os.path.join(results_folder, 'campaign')
+    filename = os.path.join(results_folder, f'packed{extension}')
+    if extension == '.zip':
+        with zipfile.ZipFile(filename, 'w') as zip_file:
+            for root, _, files in os.walk(campaign_folder):
+                for name in files:
+                    path = os.path.join(root, name)
+                    zip_file.write(path, os.path.relpath(path, results_folder))
+    elif extension == '.7z':
+        with py7zr.SevenZipFile(filename, 'w') as seven_zip:
+            seven_zip.writeall(campaign_folder, 'campaign')
+    else:
+        with open(filename, 'wb') as file, zstandard.ZstdCompressor().stream_writer(file) as writer, tarfile.open(fileobj=writer, mode='w|') as tar_file:
+            tar_file.add(campaign_folder, 'campaign')
+    return filename
+
+
+@pytest.fixture
+def results_folder(tmp_path, monkeypatch):
+    # Two test folders, the extractions are written to the temporary folder of the test
+    monkeypatch.setattr(archive, 'extraction_folder', str(tmp_path / 'extracted'))
+    monkeypatch.setattr(archive, 'archive_indexes', dict())
+    for index in range(2):
+        write_test_folder(str(tmp_path / 'results'), 'campaign', 'scenario', f't{index}', 1000, seed=index, queries=2)
+    return str(tmp_path / 'results')
+
+
+@pytest.mark.parametrize('extension', ['.zip', '.7z', '.tar.zst'])
+def test_members_equal_files(results_folder, extension, monkeypatch):
+    filename = pack_campaign(results_folder, extension)
+    if extension == '.7z':
+        # py7zr instead of the 7z command line tool
+        monkeypatch.setattr(archive.shutil, 'which', lambda name: None)
+
+    client_folder = os.path.join(results_folder, 'campaign', 'client', 'scenario')
+    assert list_folder(os.path.join(filename, 'campaign', 'client', 'scenario')) == sorted(os.listdir(client_folder))
+    for test_folder in os.listdir(client_folder):
+        for name in os.listdir(os.path.join(client_folder, test_folder)):
+            member = os.path.join(filename, 'campaign', 'client', 'scenario', test_folder, name)
+            path = os.path.join(client_folder, test_folder, name)
+            with open_file(member) as file, open(path, 'rb') as expected:
+                assert file.read() == expected.read()
+            assert file_stat(member)['size'] == os.path.getsize(path)
+
+    remove_extracted_archives()
+    assert not os.path.exists(archive.extraction_folder) or os.listdir(archive.extraction_folder) == []
+
+
+def test_tar_zst_decompressed_once(results_folder, monkeypatch):
+    filename = pack_campaign(results_folder, '.tar.zst')
+    opened = list()
+    open_tar_zst = getattr(archive, '__open_tar_zst')
+    def count(path):
+        opened.append(path)
+        return open_tar_zst(path)
+    monkeypatch.setattr(archive, '__open_tar_zst', count)
+
+    for test_folder in ('t0', 't1'):
+        for side in ('client', 'server'):
+            for name in list_folder(os.path.join(filename, 'campaign', side, 'scenario', test_folder)):
+                with open_file(os.path.join(filename, 'campaign', side, 'scenario', test_folder, name)) as file:
+                    assert len(file.read()) > 0
+    assert opened == [filename]
+
+    # A changed archive is extracted again, the previous extraction is removed
+    with open(filename, 'ab') as file:
+        file.write(bytes(1024))
+    os.utime(filename, ns=(0, 0))
+    assert list_folder(os.path.join(filename, 'campaign')) == ['client', 'server']
+    assert len(opened) == 2 and len(os.listdir(archive.extraction_folder)) == 1
+    remove_extracted_archives()
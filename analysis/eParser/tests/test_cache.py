@@ -0,0 +1,29 @@
+from conftest import assert_identical
+from parsing import parse_query_messages, parse_test_results
+from cache import parse_test_folder
+
+
+def test_query_downsampling(settings, test_folder):
+    for stride, max_reports in ((1, 0), (2, 0), (1, 2)):
+        _, reports, _ = parse_test_results(test_folder['client'], columnar=True, stride=stride, max_reports=max_reports)
+        assert_identical(reports, parse_query_messages(test_folder['client'], stride, max_reports))
+
+    assert parse_query_messages(test_folder['client'])['losses'].size == 3
+    assert parse_query_messages(test_folder['client'], 2)['losses'].size == 2
+
+
+def test_cache_query_settings(settings, test_folder, tmp_path):
+    cache_folder = str(tmp_path / 'cache')
+    expected = parse_test_folder(test_folder['client'])
+    assert_identical(parse_test_folder(test_folder['client'], cache_folder), expected)
+    assert_identical(parse_test_folder(test_folder['client'], cache_folder), expected)
+
+    # Entries of other downsampling settings are parsed again
+    settings['parsing'].update({'query_stride': 2})
+    _, _, reports, _ = parse_test_folder(test_folder['client'], cache_folder)
+    assert reports['losses'].size == 2
+    _, _, reports, _ = parse_test_folder(test_folder['client'], cache_folder)
+    assert reports['losses'].size == 2
+
+    settings['parsing'].update({'query_stride': 1})
+    assert_identical(parse_test_folder(test_folder['client'], cache_folder), expected)
@@ -0,0 +1,90 @@
+import os
+import csv
+import glob
+import sys
+import subprocess
+import pytest
+from conftest import eparser_folder
+from manifest import manifest_file
+from scheduler import create_scheduler, submit_task, close_scheduler
+from synthetic import write_test_folder
+
+
+def run_eparser(results_folder: str, output_folder: str, *arguments) -> subprocess.CompletedProcess:
+    command = [sys.executable, os.path.join(eparser_folder, 'eParser.py'), '-r', results_folder, '-o', output_folder, '--no-cache', *arguments]
+    return subprocess.run(command, cwd=eparser_folder, capture_output=True, text=True, timeout=600)
+
+
+def read_csv(filename: str) -> list:
+    with open(filename, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def test_results_without_losses(tmp_path):
+    # Current TestSuite versions do not write num_loss (no query messages), the losses are taken
+    # from the timestamps, with and without the evaluation
+    results_folder = str(tmp_path / 'results')
+    for index, (datagram_size, cycle_time) in enumerate(((80, 100000), (8900, 200000))):
+        write_test_folder(results_folder, 'campaign', 'scenario', f't{index}', 2000, cycle_time=cycle_time, datagram_size=datagram_size, seed=index, loss=0.01, burst=2)
+
+    output_folder = str(tmp_path / 'output')
+    process = run_eparser(results_folder, output_folder)
+    assert process.returncode == 0, process.stderr
+
+    campaign_folder = os.path.join(output_folder, 'campaign', 'scenario')
+    overview = read_csv(os.path.join(campaign_folder, 'performance_overview.csv'))
+    table = read_csv(os.path.join(campaign_folder, 'campaign', 'scenario_campaign_overview.csv'))
+    assert [row['Losses [total]'] for row in table] == [row['Client Only'] for row in overview]
+    assert all(int(row['Client Only']) > 0 for row in overview)
+    assert os.path.exists(os.path.join(campaign_folder, 'campaign', 'campaign-diagr1__cases_by_losses_and_datagram.png'))
+    assert os.path.exists(os.path.join(campaign_folder, 'datagram', 'datagramsize-80-diagr1__losses_by_cycle.png'))
+
+    process = run_eparser(results_folder, str(tmp_path / 'tables'), '--stages', 'parse,tables')
+    assert process.returncode == 0, process.stderr
+    assert read_csv(os.path.join(str(tmp_path / 'tables'), 'campaign', 'scenario', 'campaign', 'scenario_campaign_overview.csv')) == table
+
+
+def test_results_without_timestamps(tmp_path):
+    # Latency measurement disabled: no timestamp section, the losses are only known from num_loss
+    results_folder = str(tmp_path / 'results')
+    write_test_folder(results_folder, 'campaign', 'scenario', 't0', 2000, seed=0, loss=0.01, latency='DISABLED', queries=3)
+    write_test_folder(results_folder, 'campaign', 'scenario', 't1', 2000, seed=1, loss=0.01, latency='DISABLED')
+
+    for stages in ('parse,tables', 'parse,evaluate,tables', 'parse,evaluate,tables,graphs'):
+        output_folder = str(tmp_path / stages)
+        process = run_eparser(results_folder, output_folder, '--stages', stages, '--profile')
+        assert process.returncode == 0, process.stderr
+        assert 'Losses of test scenario t1 are unknown' in process.stdout
+
+        table = read_csv(os.path.join(output_folder, 'campaign', 'scenario', 'campaign', 'scenario_campaign_overview.csv'))
+        assert int(table[0]['Losses [total]']) > 0
+        assert table[1]['Losses [total]'] == ''
+
+        # The last query message is written at the end of the test, its interval is empty
+        if 'graphs' in stages:
+            assert len(glob.glob(os.path.join(output_folder, 'campaign', 'scenario', 'scenario', 't0 *', 'scenario-diagr4__packages_per_second.png'))) == 1
+
+
+def test_manifest_after_failed_producer(tmp_path, monkeypatch):
+    # A failed table or graph task is raised before the manifest is saved, so the test folders are
+    # processed again on the next incremental run
+    import eParser
+    results_folder = str(tmp_path / 'results')
+    write_test_folder(results_folder, 'campaign', 'scenario', 't0', 2000, seed=0, loss=0.01)
+    client_path, server_path = (os.path.join(results_folder, 'campaign', side, 'scenario') for side in ('client', 'server'))
+    output_path = str(tmp_path / 'output')
+    parse_campaign = getattr(eParser, '__parse_campaign')
+
+    scheduler = create_scheduler(2)
+    try:
+        missing = str(tmp_path / 'missing')
+        monkeypatch.setattr(eParser, 'write_query_table', lambda test_data, campaign_folder, scheduler: submit_task(scheduler, os.remove, missing))
+        with pytest.raises(FileNotFoundError):
+            parse_campaign('scenario', client_path, server_path, output_path, None, ['parse', 'tables'], scheduler, True)
+        assert not os.path.exists(os.path.join(output_path, 'scenario', manifest_file))
+
+        monkeypatch.undo()
+        assert parse_campaign('scenario', client_path, server_path, output_path, None, ['parse', 'tables'], scheduler, True)
+        assert os.path.exists(os.path.join(output_path, 'scenario', manifest_file))
+    finally:
+        close_scheduler(scheduler)
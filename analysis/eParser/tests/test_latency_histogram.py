@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pdc_parsing
+from performance_evaluation import create_latency_histogram, record_latency_histogram, merge_latency_histograms, latency_histogram_edges
+from performance_evaluation import latency_histogram_percentile, save_latency_histogram, load_latency_histogram
+
+
+def histogram_of(differences) -> dict:
+    histogram = create_latency_histogram()
+    record_latency_histogram(histogram, np.asarray(differences, dtype=np.int64))
+    return histogram
+
+
+def test_bucket_edges():
+    # Every bucket edge is recorded in its own bucket, the buckets cover all values without gaps
+    histogram = create_latency_histogram()
+    lower, upper = latency_histogram_edges(histogram)
+    indices = np.arange(histogram['counts'].size)
+
+    assert lower[0] == -(1 << histogram['highest_bits'])
+    np.testing.assert_array_equal(lower[1:], upper[:-1] + 1)
+    assert upper[-1] == (1 << histogram['highest_bits']) - 1
+    np.testing.assert_array_equal(lower, -upper[::-1] - 1)
+    for edges in (lower, upper):
+        np.testing.assert_array_equal(np.flatnonzero(histogram_of(edges)['counts']), indices)
+
+
+def test_bucket_values():
+    # Values are recorded in the bucket containing them, the relative error is below 2^-(bits - 1)
+    values = np.unique(np.random.default_rng(1).integers(-(1 << 40), 1 << 40, 10000))
+    histogram = create_latency_histogram()
+    lower, upper = latency_histogram_edges(histogram)
+    for value in np.concatenate((values, [-2, -1, 0, 1])):
+        index = int(np.flatnonzero(histogram_of([value])['counts'])[0])
+        assert lower[index] <= value <= upper[index]
+        assert upper[index] - lower[index] <= max(abs(value), 1) / (1 << (histogram['sub_bucket_bits'] - 1))
+
+    # Latencies beyond the highest trackable one are clamped
+    counts = histogram_of([-(1 << 50), 1 << 50])['counts']
+    assert counts[0] == 1 and counts[-1] == 1
+
+
+def test_merge_then_percentile(tmp_path):
+    generator = np.random.default_rng(2)
+    parts = [generator.integers(low, 5000000, size) for low, size in ((10000, 1000), (10000, 1), (-5000000, 5000))]
+    histograms = [histogram_of(part) for part in parts]
+    expected = histogram_of(np.concatenate(parts))
+
+    merged = merge_latency_histograms(histograms)
+    np.testing.assert_array_equal(merged['counts'], expected['counts'])
+
+    # The files are merged and evaluated by the PerformanceDiagrammCreator without the eParser
+    filenames = list()
+    for index, histogram in enumerate(histograms):
+        filenames.append(os.path.join(tmp_path, f'histogram_{index}.npz'))
+        save_latency_histogram(histogram, filenames[-1])
+    np.testing.assert_array_equal(load_latency_histogram(filenames[0])['counts'], histograms[0]['counts'])
+    pdc_merged = pdc_parsing.merge_latency_histograms([pdc_parsing.parse_latency_histogram(filename) for filename in filenames])
+
+    _, upper = latency_histogram_edges(expected)
+    values = np.sort(np.concatenate(parts))
+    for percentile in (0, 1, 50, 99, 99.9, 100):
+        value = latency_histogram_percentile(merged, percentile)
+        rank = max(int(np.ceil(percentile / 100 * values.size)), 1)
+        assert value == upper[np.flatnonzero(histogram_of([values[rank - 1]])['counts'])[0]]
+        assert pdc_parsing.latency_percentile(pdc_merged, percentile) == value / 1000000000
+
+
+def test_empty_percentile(tmp_path):
+    histogram = create_latency_histogram()
+    assert latency_histogram_percentile(histogram, 99) == -1
+
+    filename = os.path.join(tmp_path, 'histogram.npz')
+    save_latency_histogram(histogram, filename)
+    merged = pdc_parsing.merge_latency_histograms([pdc_parsing.parse_latency_histogram(filename)] * 2)
+    assert pdc_parsing.latency_percentile(merged, 99) == -1
+
+
+def test_negative_percentiles():
+    # Clock offset: most latencies are negative, the percentiles keep their sign
+    generator = np.random.default_rng(4)
+    differences = -50000 + generator.integers(0, 20000, 10000)
+    differences[:100] += 100000
+    histogram = histogram_of(differences)
+    lower, upper = latency_histogram_edges(histogram)
+
+    values = np.sort(differences)
+    for percentile in (1, 50, 99, 99.99):
+        value = latency_histogram_percentile(histogram, percentile)
+        exact = values[max(int(np.ceil(percentile / 100 * values.size)), 1) - 1]
+        assert value == upper[np.flatnonzero(histogram_of([exact])['counts'])[0]]
+        assert exact <= value <= exact + abs(exact) / (1 << (histogram['sub_bucket_bits'] - 1))
+    assert latency_histogram_percentile(histogram, 50) < 0
+    assert latency_histogram_percentile(histogram, 99.99) > 0
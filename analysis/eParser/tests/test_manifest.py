@@ -0,0 +1,63 @@
+import os
+import manifest   # test_folder_changed is called through the module, pytest would collect it otherwise
+from constants import test_description_file, test_results_file
+from file_management import file_fingerprint
+from manifest import content_fingerprints
+from cache import parse_test_folder
+
+
+def count_hashes(monkeypatch) -> list:
+    # Records the files whose content hash is calculated for the manifest
+    hashed = list()
+    def fingerprint(path, content_hash=True):
+        if content_hash:
+            hashed.append(path)
+        return file_fingerprint(path, content_hash)
+    monkeypatch.setattr(manifest, 'file_fingerprint', fingerprint)
+    return hashed
+
+
+def input_files(test_folder: dict) -> dict:
+    paths = [os.path.join(test_folder['client'], filename) for filename in (test_description_file, test_results_file)]
+    return {path: file_fingerprint(path, content_hash=False) for path in paths}
+
+
+def test_fingerprints_of_cache(settings, test_folder, tmp_path, monkeypatch):
+    hashed = count_hashes(monkeypatch)
+    files = input_files(test_folder)
+    cache_folder = str(tmp_path / 'cache')
+    parse_test_folder(test_folder['client'], cache_folder)
+
+    fingerprints = content_fingerprints(files, cache_folder)
+
+    assert hashed == []
+    assert fingerprints == {path: file_fingerprint(path) for path in files}
+    assert not manifest.test_folder_changed({'test_folders': {'t1': {'files': fingerprints}}}, 't1', list(files))
+
+
+def test_fingerprints_without_cache(settings, test_folder, tmp_path, monkeypatch):
+    hashed = count_hashes(monkeypatch)
+    files = input_files(test_folder)
+
+    # Without a (matching) cache entry every file is hashed once
+    for cache_folder in (None, str(tmp_path / 'cache')):
+        hashed.clear()
+        fingerprints = content_fingerprints(files, cache_folder)
+        assert sorted(hashed) == sorted(files)
+        assert fingerprints == {path: file_fingerprint(path) for path in files}
+
+
+def test_fingerprints_changed_while_processing(settings, test_folder, tmp_path, monkeypatch):
+    hashed = count_hashes(monkeypatch)
+    files = input_files(test_folder)
+    path = os.path.join(test_folder['client'], test_results_file)
+    with open(path, 'ab') as file:
+        file.write(b'\n')
+    os.utime(path, ns=(files[path]['mtime'] + 1000000000, files[path]['mtime'] + 1000000000))
+
+    fingerprints = content_fingerprints(files, None)
+
+    assert path not in hashed
+    assert fingerprints[path] == files[path]
+    assert fingerprints[path]['sha256'] is None
+    assert manifest.test_folder_changed({'test_folders': {'t1': {'files': fingerprints}}}, 't1', list(files))
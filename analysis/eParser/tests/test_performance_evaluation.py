@@ -0,0 +1,367 @@
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from performance_evaluation import evaluate_performance, evaluate_performance_stream, join_timestamps, latency_windows
+from performance_evaluation import create_reordering_accumulator, update_reordering_accumulator, finish_reordering_accumulator
+from performance_evaluation import create_loss_accumulator, update_loss_accumulator, finish_loss_accumulator, save_loss_bursts, merge_loss_bursts
+from performance_evaluation import estimate_clock_correction, clock_correction, latency_histogram_edges
+from performance_evaluation import create_latency_accumulator, update_latency_accumulator, finish_latency_accumulator, latency_statistics
+
+
+def scenario(client: dict, server: dict, client_chunk: int = 0, server_chunk: int = 0) -> list:
+    # Test scenario (description, client results, server results, client and server timestamps),
+    # the timestamps are split into chunks for the streaming evaluation if a chunk size is given
+    description = {'metadata': {'t_uid': 't1'}, 'connection': {'datagram_size': 80, 'cycle_time': 100000}}
+    results = {'report': {'duration': 1, 'total': len(client['sequence'])}}
+    return [description, results, results, chunks(client, client_chunk), chunks(server, server_chunk)]
+
+
+def chunks(values: dict, size: int):
+    # Columnar timestamps or a list of columnar chunks (see iterate_timestamp_messages)
+    columns = {key: np.asarray(value, dtype=np.int64) for key, value in values.items()}
+    if size == 0:
+        return columns
+    return [{key: value[start:start + size] for key, value in columns.items()} for start in range(0, columns['sequence'].size, size)]
+
+
+def read_performance_file(output_folder: str) -> ET.Element:
+    return ET.parse(os.path.join(output_folder, 'performance.xml')).getroot()
+
+
+def test_latency_windows():
+    origin = 1000000000
+    client = origin + np.array([0, 5, 12, 15, 18, 35], dtype=np.int64)
+    differences = np.array([4, 2, 7, 1, 9, 3], dtype=np.int64)
+    lost = origin + np.array([3, 21, 22], dtype=np.int64)
+
+    windows = latency_windows(client, differences, lost, origin, 10)
+
+    np.testing.assert_array_equal(windows['count'], [2, 3, 0, 1])
+    np.testing.assert_array_equal(windows['lost'], [1, 0, 2, 0])
+    np.testing.assert_array_equal(windows['mean'], [3, 17 / 3, np.nan, 3])
+    np.testing.assert_array_equal(windows['max'], [4, 9, np.nan, 3])
+    np.testing.assert_array_equal(windows['p99'], [4, 9, np.nan, 3])
+
+
+def test_latency_windows_limited(settings):
+    # A single timestamp far in the future must not allocate a window per nanosecond
+    settings['evaluation']['windows']['max_windows'] = 100
+    client = np.array([0, 1, 2, 10 ** 15], dtype=np.int64)
+    windows = latency_windows(client, np.array([1, 2, 3, 4], dtype=np.int64), np.empty(0, dtype=np.int64), 0, 1)
+
+    assert windows['count'].size == 100
+    assert windows['count'].sum() == 3
+
+
+def test_windows_of_reordered_client(tmp_path):
+    # The first record in file order is not the earliest one, all windows start at the earliest
+    # send timestamp
+    client = {'sequence': [1, 0, 2, 3, 4], 'timestamp': [2000000000, 1990000000, 2010000000, 2020000000, 2030000000]}
+    server = {'sequence': [0, 1, 2, 4], 'timestamp': [1990001000, 2000001000, 2010001000, 2030001000]}
+    output_folder = str(tmp_path)
+
+    timestamps = evaluate_performance(scenario(client, server), output_folder)
+
+    assert timestamps['matched'] == 4
+    with np.load(os.path.join(output_folder, 'latency_windows.npz')) as data:
+        assert int(data['origin']) == 1990000000
+        np.testing.assert_array_equal(data['10ms__count'], [1, 1, 1, 0, 1])
+        np.testing.assert_array_equal(data['10ms__lost'], [0, 0, 0, 1, 0])
+
+
+def test_join_after_loss(tmp_path):
+    # Sequence numbers 2 and 5 are lost, the latency of every record depends on its sequence number
+    # and must not be taken from the record at the same position
+    client = {'sequence': list(range(8)), 'timestamp': [1000000 * index for index in range(8)]}
+    received = [0, 1, 3, 4, 6, 7]
+    server = {'sequence': received, 'timestamp': [1000000 * index + 1000 + 10 * index for index in received]}
+
+    join = join_timestamps(*scenario(client, server)[3:])
+    np.testing.assert_array_equal(join['sequence'], received)
+    np.testing.assert_array_equal(join['client_index'], received)
+    np.testing.assert_array_equal(join['server_index'], range(6))
+    assert join['client_only'] == 2
+    assert join['server_only'] == 0
+
+    output_folder = str(tmp_path / 'ihwk_1')
+    timestamps = evaluate_performance(scenario(client, server), output_folder)
+
+    assert timestamps['matched'] == 6
+    assert timestamps['client_only'] == 2
+    assert timestamps['minimum_difference'] == 1000 / 1000000000
+    assert timestamps['maximum_difference'] == 1070 / 1000000000
+    records = ET.parse(os.path.join(output_folder, 'timediffs.xml')).getroot()
+    latencies = {int(record.find('sequence').text): float(record.find('difference').text) for record in records}
+    assert latencies == {index: (1000 + 10 * index) / 1000000000 for index in received}
+
+    stream = evaluate_performance_stream(scenario(client, server, 3, 2), str(tmp_path / 'stream'))
+    for key in ('matched', 'client_only', 'server_only', 'minimum_difference', 'maximum_difference'):
+        assert stream[key] == timestamps[key]
+
+
+def test_join_duplicates():
+    # Duplicated sequence numbers are matched once with their first occurrence
+    client = {'sequence': [0, 1, 1, 2, 3], 'timestamp': [0, 10, 11, 20, 30]}
+    server = {'sequence': [0, 1, 2, 2, 3], 'timestamp': [5, 16, 27, 28, 38]}
+
+    client, server = scenario(client, server)[3:]
+    join = join_timestamps(client, server)
+
+    np.testing.assert_array_equal(join['sequence'], [0, 1, 2, 3])
+    np.testing.assert_array_equal(server['timestamp'][join['server_index']] - client['timestamp'][join['client_index']], [5, 6, 7, 8])
+    assert join['client_only'] == 0
+    assert join['server_only'] == 0
+
+
+def test_join_server_only(tmp_path):
+    # Records only received by the server (e.g. of an earlier test) are counted, but not matched
+    client = {'sequence': [10, 11, 12], 'timestamp': [100, 200, 300]}
+    server = {'sequence': [3, 10, 11, 12, 99], 'timestamp': [50, 150, 260, 370, 400]}
+
+    join = join_timestamps(*scenario(client, server)[3:])
+    np.testing.assert_array_equal(join['sequence'], [10, 11, 12])
+    np.testing.assert_array_equal(join['server_index'], [1, 2, 3])
+    assert join['client_only'] == 0
+    assert join['server_only'] == 2
+
+    timestamps = evaluate_performance(scenario(client, server), str(tmp_path))
+    assert timestamps['server_only'] == 2
+    assert timestamps['minimum_difference'] == 50 / 1000000000
+    assert timestamps['maximum_difference'] == 70 / 1000000000
+
+
+def test_join_without_matches(tmp_path):
+    client = {'sequence': [0, 1, 2], 'timestamp': [0, 10, 20]}
+    server = {'sequence': [5, 6], 'timestamp': [55, 65]}
+
+    join = join_timestamps(*scenario(client, server)[3:])
+    assert join['sequence'].size == 0
+    assert join['client_only'] == 3
+    assert join['server_only'] == 2
+
+    assert evaluate_performance(scenario(client, server), str(tmp_path / 'batch')) is None
+    assert evaluate_performance_stream(scenario(client, server, 2, 2), str(tmp_path / 'stream')) is None
+
+
+def reordering(sequence: list, chunk_size: int) -> tuple:
+    accumulator = create_reordering_accumulator()
+    for chunk in chunks({'sequence': sequence}, chunk_size):
+        update_reordering_accumulator(accumulator, chunk['sequence'])
+    return finish_reordering_accumulator(accumulator), accumulator['displacements']
+
+
+def test_reordering_metrics():
+    # Extents (RFC 4737): 1 of 1 and 4, 2 of 5 (first earlier datagram with a higher sequence
+    # number is 6). Displacements (RFC 5236): 2 and 6 arrive early by 1 and 2 positions, 1, 4 and 5
+    # late by 1 position
+    sequence = [0, 2, 1, 3, 6, 4, 5, 7]
+
+    # Batch (single chunk) and chunks across the reordered datagrams (the context of the previous
+    # and the next chunk is carried over)
+    for chunk_size in (len(sequence), 3, 2):
+        statistics, displacements = reordering(sequence, chunk_size)
+
+        assert statistics == {'received': 8, 'reordered': 3, 'reordered_ratio': 3 / 8, 'maximum_extent': 2, 'mean_extent': 4 / 3,
+                              'displaced': 5, 'maximum_displacement': 2, 'mean_displacement': 6 / 5}
+        threshold = displacements.size // 2
+        assert {index - threshold: count for index, count in enumerate(displacements.tolist()) if count > 0} == {-2: 1, -1: 1, 0: 3, 1: 3}
+
+
+def test_reordering_chunks_identical():
+    # Datagrams swapped with one of their next neighbours stay within the context of the chunks
+    generator = np.random.default_rng(1)
+    sequence = np.arange(5000)
+    for index in np.flatnonzero(generator.random(sequence.size - 3) < 0.05):
+        offset = int(generator.integers(1, 4))
+        sequence[[index, index + offset]] = sequence[[index + offset, index]]
+
+    expected = reordering(sequence, sequence.size)
+    assert expected[0]['reordered'] > 0
+    for chunk_size in (7, 100, 1000):
+        statistics, displacements = reordering(sequence, chunk_size)
+        assert statistics == expected[0]
+        np.testing.assert_array_equal(displacements, expected[1])
+
+
+def test_displacement_histogram_buckets(tmp_path, capsys):
+    # Only the non-empty buckets are written, the reordered datagrams are reported in one line
+    client = {'sequence': list(range(8)), 'timestamp': [1000 * index for index in range(8)]}
+    server = {'sequence': [0, 2, 1, 3, 6, 4, 5, 7], 'timestamp': [1000 * index + 100 for index in range(8)]}
+
+    for data, folder in ((scenario(client, server), 'batch'), (scenario(client, server, 3, 3), 'stream')):
+        evaluate = evaluate_performance if folder == 'batch' else evaluate_performance_stream
+        evaluate(data, str(tmp_path / folder))
+        assert capsys.readouterr().out == 'Error: Sequence numbers are not in the same order (3 reordered datagrams)!\n'
+
+        xml_reordering = read_performance_file(str(tmp_path / folder)).find('reordering')
+        assert xml_reordering.find('reordered').text == '3'
+        histogram = {element.tag: int(element.text) for element in xml_reordering.find('displacement_histogram')}
+        assert histogram == {'early_2': 1, 'early_1': 1, 'in_place': 3, 'late_1': 3}
+
+
+def histogram_values(histogram: dict) -> dict:
+    # Counts of the non-empty buckets by their lowest value (exact for small burst lengths)
+    lower, _ = latency_histogram_edges(histogram)
+    return {int(lower[index]): int(histogram['counts'][index]) for index in np.flatnonzero(histogram['counts'])}
+
+
+def loss_bursts(sequence: list, chunk_size: int, origin: int = None) -> tuple:
+    accumulator = create_loss_accumulator(origin)
+    for chunk in chunks({'sequence': sequence, 'timestamp': [100 * value for value in sequence]}, chunk_size):
+        update_loss_accumulator(accumulator, chunk['sequence'], chunk['timestamp'])
+    return finish_loss_accumulator(accumulator), accumulator
+
+
+def test_loss_bursts():
+    # Bursts 2-4, 7 and 10-11, the chunks end inside and at the end of the bursts
+    sequence = [2, 3, 4, 7, 10, 11]
+    for chunk_size in range(1, len(sequence) + 1):
+        statistics, accumulator = loss_bursts(sequence, chunk_size, 100)
+
+        assert statistics == {'lost': 6, 'bursts': 3, 'longest_burst': 3, 'mean_burst_length': 2.0, 'longest_burst_time': 100 / 1000000000}
+        np.testing.assert_array_equal(accumulator['sequence'], [2, 7, 10])
+        np.testing.assert_array_equal(accumulator['length'], [3, 1, 2])
+        np.testing.assert_array_equal(accumulator['timestamp'], [200, 700, 1000])
+        assert histogram_values(accumulator['histogram']) == {1: 1, 2: 1, 3: 1}
+
+    # Unordered chunk and a run of a single datagram per chunk
+    statistics, accumulator = loss_bursts([11, 10, 12, 13, 14, 16], 3)
+    np.testing.assert_array_equal(accumulator['length'], [5, 1])
+    statistics, accumulator = loss_bursts(list(range(1000)), 1)
+    assert statistics['bursts'] == 1 and statistics['longest_burst'] == 1000
+    assert statistics['longest_burst_time'] == 0
+
+    statistics, accumulator = loss_bursts([], 1)
+    assert statistics == {'lost': 0, 'bursts': 0, 'longest_burst': 0, 'mean_burst_length': 0.0, 'longest_burst_time': -1}
+    assert accumulator['length'].size == 0
+
+
+def test_merge_loss_bursts(tmp_path):
+    filenames = list()
+    for index, sequence in enumerate(([2, 3, 4, 7, 10, 11], [5, 6, 7, 8, 9, 20, 30], [])):
+        _, accumulator = loss_bursts(sequence, 2)
+        filenames.append(str(tmp_path / f'loss_bursts_{index}.npz'))
+        save_loss_bursts(accumulator, filenames[-1])
+
+    statistics, histogram = merge_loss_bursts(filenames)
+
+    assert statistics == {'lost': 13, 'bursts': 6, 'longest_burst': 5, 'mean_burst_length': 13 / 6}
+    assert histogram_values(histogram) == {1: 3, 2: 1, 3: 1, 5: 1}
+
+
+def test_loss_bursts_stream(tmp_path):
+    # Loss bursts across the chunks of the streaming evaluation are identical to the batch ones
+    client = {'sequence': list(range(20)), 'timestamp': [1000 + 100 * index for index in range(20)]}
+    received = [index for index in range(20) if index not in (3, 4, 5, 6, 9, 15, 16, 19)]
+    server = {'sequence': received, 'timestamp': [1050 + 100 * index for index in received]}
+
+    evaluate_performance(scenario(client, server), str(tmp_path / 'batch'))
+    evaluate_performance_stream(scenario(client, server, 4, 3), str(tmp_path / 'stream'))
+
+    results = list()
+    for folder in ('batch', 'stream'):
+        xml_losses = read_performance_file(str(tmp_path / folder)).find('loss_bursts')
+        with np.load(str(tmp_path / folder / 'loss_bursts.npz')) as data:
+            results.append(({element.tag: element.text for element in xml_losses}, {key: data[key].tolist() for key in data.files}))
+
+    losses, data = results[0]
+    assert losses['lost'] == '8' and losses['bursts'] == '4' and losses['longest_burst'] == '4'
+    assert data['sequence'] == [3, 9, 15, 19]
+    assert data['length'] == [4, 1, 2, 1]
+    assert data['origin'] == 1000
+    assert results[1] == results[0]
+
+
+def drifting_clocks(offset: int, drift: float, count: int = 100000) -> tuple:
+    # Send times every 100 us, 50 us minimum latency plus an exponential queueing delay, the server
+    # clock is ahead by offset and runs faster by drift
+    generator = np.random.default_rng(3)
+    client = 1700000000000000000 + 100000 * np.arange(count, dtype=np.int64)
+    latencies = 50000 + generator.exponential(200000, count).astype(np.int64)
+    server = client + latencies + offset + np.rint(drift * (client - client[0])).astype(np.int64)
+    return client, server, latencies
+
+
+def test_clock_correction(settings):
+    settings['evaluation']['clock_correction'].update({'windows': 64, 'minimum_latency': 50000})
+    client, server, latencies = drifting_clocks(-3000000000, 20e-6)
+
+    # Single outliers below the lower envelope (e.g. a clock step) do not move the line
+    differences = server - client
+    differences[[5000, 60000]] -= 10000000
+
+    clock = estimate_clock_correction(client, differences)
+
+    assert clock['origin'] == client[0]
+    assert clock['windows'] == 64
+    assert abs(clock['drift'] - 20e-6) < 1e-7
+    assert abs(clock['offset'] - (-3000000000 + 50000)) < 2000
+
+    corrected = server - client - clock_correction(clock, client)
+    assert np.abs(corrected - latencies).max() < 2000
+
+
+def test_clock_correction_short(settings):
+    # All records in a single window, no drift can be estimated
+    settings['evaluation']['clock_correction']['windows'] = 4
+    assert estimate_clock_correction(np.array([5, 5, 5], dtype=np.int64), np.array([10, 20, 30], dtype=np.int64)) is None
+
+    clock = estimate_clock_correction(np.array([0, 100], dtype=np.int64), np.array([1000, 1200], dtype=np.int64))
+    assert clock['drift'] == 2.0 and clock['offset'] == 1000.0
+
+
+def test_clock_correction_performance_file(settings, tmp_path):
+    settings['evaluation']['clock_correction'].update({'enabled': True, 'windows': 64, 'minimum_latency': 50000})
+    client, server, latencies = drifting_clocks(250000000, -5e-6)
+    data = scenario({'sequence': np.arange(client.size), 'timestamp': client}, {'sequence': np.arange(client.size), 'timestamp': server})
+
+    timestamps = evaluate_performance(data, str(tmp_path))
+
+    xml_clock = read_performance_file(str(tmp_path)).find('clock_correction')
+    assert abs(float(xml_clock.find('drift_ppm').text) + 5) < 0.01
+    assert abs(float(xml_clock.find('offset').text) - 0.25005) < 0.000002
+    assert abs(timestamps['minimum_difference'] - latencies.min() / 1000000000) < 0.000002
+    assert abs(timestamps['average_difference'] - latencies.mean() / 1000000000) < 0.000002
+
+
+def test_stream_equals_batch_with_offset(tmp_path):
+    # Server clock behind the client clock: mostly negative latencies (the mean as well)
+    generator = np.random.default_rng(6)
+    count = 20000
+    client = 1000000000 + 100000 * np.arange(count, dtype=np.int64)
+    server = client - 50000 + generator.integers(0, 30000, count) + np.where(generator.random(count) < 0.01, 200000, 0)
+    received = np.flatnonzero(generator.random(count) > 0.01)
+    data = ({'sequence': np.arange(count), 'timestamp': client}, {'sequence': received, 'timestamp': server[received]})
+
+    batch = evaluate_performance(scenario(*data), str(tmp_path / 'batch'))
+    stream = evaluate_performance_stream(scenario(*data, 3000, 1700), str(tmp_path / 'stream'))
+
+    assert batch['average_difference'] < 0
+    assert batch['jitter'] > 0
+    for key, value in batch.items():
+        if key == 'jitter':
+            assert abs(stream[key] - value) < value * 0.001
+        else:
+            assert stream[key] == pytest.approx(value, rel=1e-12)
+    percentiles = [{element.tag: element.text for element in read_performance_file(str(tmp_path / folder)).find('percentiles')} for folder in ('batch', 'stream')]
+    assert len(percentiles[0]) > 0
+    assert percentiles[1] == percentiles[0]
+    assert float(percentiles[0]['p50']) < 0
+
+
+def test_latency_accumulator_beyond_histogram():
+    # All latencies beyond the trackable range are counted in the outer buckets
+    for offset in (-(1 << 41), 1 << 41):
+        differences = offset + np.random.default_rng(7).integers(-60000, 20000, 10000)
+        accumulator = create_latency_accumulator()
+        for chunk in np.array_split(differences, 3):
+            update_latency_accumulator(accumulator, chunk)
+
+        expected = latency_statistics(differences)
+        assert abs(finish_latency_accumulator(accumulator)['jitter'] - expected['jitter']) < expected['jitter'] * 0.01
+
+    # Equal latencies have no jitter
+    accumulator = create_latency_accumulator()
+    update_latency_accumulator(accumulator, np.full(5, -7, dtype=np.int64))
+    assert finish_latency_accumulator(accumulator)['jitter'] == 0
@@ -0,0 +1,80 @@
+import os
+import pytest
+from conftest import assert_identical
+from constants import test_results_file, missing_timestamp
+from xml_backend import iterparse, lxml_etree, ScanError
+from parsing import parse_description_file, parse_query_messages, parse_test_results, iterate_timestamp_messages
+
+block_size = 16777216
+backends = [('stdlib', True, block_size), ('stdlib', True, 4096),
+            pytest.param('lxml', False, block_size, marks=pytest.mark.skipif(lxml_etree is None, reason='lxml is not installed')),
+            pytest.param('lxml', True, block_size, marks=pytest.mark.skipif(lxml_etree is None, reason='lxml is not installed')),
+            pytest.param('lxml', True, 4096, marks=pytest.mark.skipif(lxml_etree is None, reason='lxml is not installed'))]
+
+
+def parse_all(path: str) -> list:
+    return [
+        parse_description_file(path),
+        parse_query_messages(path),
+        parse_test_results(path),
+        parse_test_results(path, columnar=True),
+        parse_test_results(path, timestamps=False),
+        list(iterate_timestamp_messages(path, 1000)),
+        list(iterate_timestamp_messages(path, 1000, columnar=True)),
+        list(iterate_timestamp_messages(path, columnar=True)),
+    ]
+
+
+def reference(settings, path: str) -> list:
+    settings['parsing'].update({'backend': 'stdlib', 'scanner': False, 'block_size': block_size})
+    return parse_all(path)
+
+
+@pytest.mark.parametrize('backend, scanner, block', backends)
+@pytest.mark.parametrize('side', ['client', 'server'])
+def test_backends_identical(settings, test_folder, side, backend, scanner, block):
+    expected = reference(settings, test_folder[side])
+
+    settings['parsing'].update({'backend': backend, 'scanner': scanner, 'block_size': block})
+    assert_identical(parse_all(test_folder[side]), expected)
+
+
+def test_columns_contain_stages(settings, test_folder):
+    _, query, client = parse_test_results(test_folder['client'], columnar=True)
+    _, _, server = parse_test_results(test_folder['server'], columnar=True)
+
+    assert query['losses'].size > 0
+    assert set(client.keys()) == {'sequence', 'timestamp', 'snt_prog'}
+    assert set(server.keys()) == {'sequence', 'timestamp', 'rec_sw', 'rec_prog'}
+    assert (client['timestamp'] == client['snt_prog']).all()
+    assert (server['timestamp'] == server['rec_sw']).all()
+
+
+def test_scan_error_fallback(settings, test_folder):
+    # A record without the rec_sw stage does not match the layout of the first record, the scanner
+    # raises a ScanError and the file is parsed again with the XML parser
+    filename = os.path.join(test_folder['server'], test_results_file)
+    with open(filename, 'rb') as file:
+        data = file.read()
+    records = data.split(b'<record>')
+    middle = len(records) // 2
+    start = records[middle].index(b'<rec_sw>')
+    end = records[middle].index(b'</rec_sw>') + len(b'</rec_sw>')
+    records[middle] = records[middle][:start] + records[middle][end:]
+    with open(filename, 'wb') as file:
+        file.write(b'<record>'.join(records))
+
+    settings['parsing'].update({'scanner': True})
+    with pytest.raises(ScanError):
+        for _ in iterparse(filename, records='columns'):
+            pass
+
+    expected = reference(settings, test_folder['server'])
+    for backend in ['stdlib'] + (['lxml'] if lxml_etree is not None else []):
+        settings['parsing'].update({'backend': backend, 'scanner': True, 'block_size': 4096})
+        result = parse_all(test_folder['server'])
+        assert_identical(result, expected)
+
+    columns = result[3][2]
+    assert (columns['rec_sw'] == missing_timestamp).sum() == 1
+    assert (columns['rec_prog'] != missing_timestamp).all()
@@ -0,0 +1,205 @@
+import re
+from contextlib import nullcontext
+import xml.etree.ElementTree as ET
+import numpy as np
+from constants import parsing, timestamp_stages
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None   # optional, the parser of the standard library is used instead
+
+# Timestamp record as written by the TestSuite: the sequence number followed by the timestamps of
+# the stages (snt_prog on the client, rec_sw and/or rec_prog on the server). The layout of the first
+# record is used to build the pattern of all records (see __record_pattern).
+record_layout = re.compile(rb'<record>\s*<sequence>[^<]*</sequence>((?:\s*<[A-Za-z_][\w.-]*>\s*<tv_sec>[^<]*</tv_sec>\s*'
+                           rb'<tv_nsec>[^<]*</tv_nsec>\s*</[A-Za-z_][\w.-]*>)+)\s*</record>')
+stage_name = re.compile(rb'<([A-Za-z_][\w.-]*)>\s*<tv_sec>')
+
+# Patterns of the record layouts by stage names
+record_patterns = dict()
+
+# Start of the timestamp records (<timestamp> of the <custom> section followed by a record)
+records_start = re.compile(rb'<timestamp>\s*(?=<record[\s/>])')
+
+
+class ScanError(ValueError):
+    '''
+    Raised if the byte scanner finds timestamp records it cannot read. The caller parses the file
+    again with the XML parser.
+    '''
+
+
+def xml_backend() -> str:
+    '''
+    Returns the XML parser that is used for the elements ('lxml' or 'stdlib'). With the 'auto'
+    option (see constants.parsing) lxml is used if it is installed. If lxml is selected but not
+    installed, the parser of the standard library is used.
+
+            Returns:
+                    backend (str): Name of the XML parser
+    '''
+    if parsing['backend'] in ('auto', 'lxml') and lxml_etree is not None:
+        return 'lxml'
+    return 'stdlib'
+
+
+def parse(xml_file):
+    '''
+    Parses the complete XML file with the selected XML parser (see xml_backend).
+
+            Parameters:
+                    xml_file (str/file object): Path to the XML file or binary file object
+
+            Returns:
+                    tree (ElementTree): Element tree of the XML file
+    '''
+    return __element_module().parse(xml_file)
+
+
+def iterparse(xml_file, events: tuple = ('start', 'end'), records: str = None):
+    '''
+    Parses the XML file incrementally with the selected XML parser (see xml_backend) and yields
+    (event, element) pairs like ElementTree.iterparse.
+
+    The timestamp records (<custom><timestamp><record>) are the largest part of a test results file.
+    If records is set and the scanner is enabled (see constants.parsing), they are not passed to
+    the XML parser but read by a byte scanner. With records = 'columns' the records are yielded as
+    ('records', columns) pairs instead of elements, the columns are a dictionary of int64 NumPy
+    arrays with the keys 'sequence', 'timestamp' (nanoseconds, first stage) and one key per stage
+    (see constants.timestamp_stages) in file order. All records must have the layout of the first
+    record. With
+    records = 'skip' they are dropped. A ScanError is raised if a record does not match the
+    format of the TestSuite; the caller has to parse the file again without the scanner then.
+
+            Parameters:
+                    xml_file (str/file object): Path to the XML file or binary file object
+                    events (tuple): Events of the XML parser (optional)
+                    records (str): None, 'columns' or 'skip' (optional)
+
+            Yields:
+                    event (str): Event ('start', 'end' or 'records')
+                    element (Element/dict): Element or columns of the timestamp records
+    '''
+    if records is None or not parsing['scanner']:
+        yield from __element_module().iterparse(xml_file, events=events)
+        return
+
+    yield from __scan(xml_file, events, records == 'columns')
+
+
+def __element_module():
+    return lxml_etree if xml_backend() == 'lxml' else ET
+
+
+def __scan(xml_file, events: tuple, columns: bool):
+    # The file is read in blocks. Outside of the timestamp records, the blocks are fed to a pull
+    # parser. Inside, the complete records of a block are read with the record pattern and only the
+    # incomplete last record is kept for the next block.
+    parser = __element_module().XMLPullParser(events=events)
+    layout = None
+    inside = False
+    finished = False
+    data = b''
+
+    with open(xml_file, 'rb') if isinstance(xml_file, str) else nullcontext(xml_file) as file:
+        while True:
+            block = file.read(parsing['block_size'])
+            data += block
+
+            if not inside and not finished:
+                match = records_start.search(data)
+                if match is None:
+                    # Keep a <timestamp> tag at the end of the block, its records may follow
+                    split = data.rfind(b'<timestamp')
+                    if split == -1 or len(data) - split > 4096:
+                        split = max(len(data) - 16, 0)
+                    if not block:
+                        split = len(data)
+
+                    parser.feed(data[:split])
+                    data = data[split:]
+                    yield from parser.read_events()
+                    if not block:
+                        break
+                    continue
+
+                parser.feed(data[:match.end()])
+                data = data[match.end():]
+                yield from parser.read_events()
+                inside = True
+
+            if inside:
+                end = data.find(b'</timestamp>')
+                if end != -1:
+                    split = end
+                elif block:
+                    split = data.rfind(b'</record>')
+                    split = split + len(b'</record>') if split != -1 else 0
+                else:
+                    # Truncated file, the XML parser reports the error
+                    parser.feed(data)
+                    parser.close()
+                    break
+
+                if columns and split > 0:
+                    chunk, layout = __scan_records(data[:split], layout)
+                    if chunk is not None:
+                        yield 'records', chunk
+
+                data = data[split:]
+                if end != -1:
+                    inside = False
+                    finished = True
+
+            if finished:
+                parser.feed(data)
+                data = b''
+                yield from parser.read_events()
+
+            if not block:
+                break
+
+    parser.close()
+    yield from parser.read_events()
+
+
+def __scan_records(segment: bytes, layout: tuple) -> tuple:
+    # Every record has to match the layout of the first record, otherwise the file is not written by
+    # the TestSuite
+    if layout is None:
+        match = record_layout.search(segment)
+        if match is None:
+            if segment.count(b'<record') > 0:
+                raise ScanError('Timestamp records do not match the format of the TestSuite.')
+            return None, None
+        layout = tuple(name.decode('ascii') for name in stage_name.findall(match.group(1)))
+
+    matches = __record_pattern(layout).findall(segment)
+    if len(matches) != segment.count(b'<record'):
+        raise ScanError('Timestamp records do not match the format of the TestSuite.')
+    if len(matches) == 0:
+        return None, layout
+
+    # Sequence number and seconds and nanoseconds of every stage (one row per record, the groups
+    # are converted from bytes by NumPy)
+    values = np.array(matches, dtype=np.int64).reshape(-1, 1 + 2 * len(layout))
+
+    chunk = {
+        'sequence': values[:, 0].copy(),
+        'timestamp': values[:, 1] * 1000000000 + values[:, 2],
+    }
+    for index, stage in enumerate(layout):
+        if stage in timestamp_stages and stage not in chunk:
+            chunk[stage] = values[:, 1 + 2 * index] * 1000000000 + values[:, 2 + 2 * index]
+
+    return chunk, layout
+
+
+def __record_pattern(layout: tuple):
+    if layout not in record_patterns:
+        stages = b''.join(rb'\s*<' + re.escape(stage.encode('ascii')) + rb'>\s*<tv_sec>\s*(-?\d+)\s*</tv_sec>\s*<tv_nsec>\s*(-?\d+)\s*</tv_nsec>\s*</'
+                          + re.escape(stage.encode('ascii')) + rb'>' for stage in layout)
+        record_patterns[layout] = re.compile(rb'<record>\s*<sequence>\s*(-?\d+)\s*</sequence>' + stages + rb'\s*</record>')
+
+    return record_patterns[layout]